@@ -0,0 +1,31 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def _model_fields(value: Any) -> Any:
+    # Field values of a pydantic model; nested models come back here
+    if isinstance(value, BaseModel):
+        return value.__dict__
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dump_model(content: Any) -> bytes:
+    """Serialize pydantic models (and anything orjson handles) to JSON."""
+    return orjson.dumps(
+        content, default=_model_fields, option=orjson.OPT_SERIALIZE_NUMPY
+    )
+
+
+class ModelResponse(ORJSONResponse):
+    """JSON response that serializes pydantic models directly with orjson.
+
+    Returning it from an endpoint skips FastAPI's ``response_model`` validation
+    and encoding, so the content must already be a valid model; the route's
+    ``response_model`` still documents the schema.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dump_model(content)
@@ -1,18 +1,492 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import logging
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Any, Callable, Coroutine, Dict, Optional
 
-from app.models.acceleration import AccelerationData
-from app.models.analysis import AnalysisRequest, AnalysisResponse
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response
+from fastapi.routing import APIRoute
+from pydantic import AnyHttpUrl, ValidationError
+from starlette.websockets import WebSocketState
+
+from app.api.responses import ModelResponse, dump_model
+from app.core.config import settings
+from app.core.executors import BoundedExecutor, ExecutorSaturatedError
+from app.core.instrumentation import collect_stages, record_stages, registry, time_stage
+from app.models.acceleration import AccelerationChunk, AccelerationData
+from app.models.analysis import (
+    AnalysisRequest,
+    AnalysisResponse,
+    BatchAnalysisRequest,
+    BatchAnalysisResponse,
+)
+from app.models.jobs import AnalysisJob
+from app.models.streaming import StreamingSessionRequest, StreamingSessionStatus
+from app.models.trends import TrendsResponse
+from app.services.aggregates import AggregateStore, database_path
 from app.services.analysis import AnalysisService
+from app.services.cache import ResultCache, create_result_cache
+from app.services.classifier import DEFAULT_MODEL_PATH, load_activity_classifier
+from app.services.jobs import CallbackURLError, JobManager, create_job_store
+from app.services.streaming import (
+    LiveSession,
+    SessionFullError,
+    SessionNotFoundError,
+    StreamingSession,
+    StreamingSessionStore,
+)
+from app.utils import binary
+
+logger = logging.getLogger(__name__)
+
+
+class LimitedBodyRequest(Request):
+    """Request whose body is read through ``read_body``."""
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            self._body = await read_body(self, settings.MAX_REQUEST_BYTES)
+        return self._body
+
+
+class LimitedBodyRoute(APIRoute):
+    """Route that holds the bodies FastAPI parses to ``MAX_REQUEST_BYTES``.
+
+    The size middleware only sees a declared Content-Length; chunked uploads
+    are limited here while they are read.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def limited_handler(request: Request) -> Response:
+            return await handler(LimitedBodyRequest(request.scope, request.receive))
+
+        return limited_handler
+
+
+router = APIRouter(route_class=LimitedBodyRoute)
+# Loaded once per process, before the first request
+activity_classifier = (
+    load_activity_classifier(settings.ACTIVITY_MODEL_PATH or DEFAULT_MODEL_PATH)
+    if settings.ACTIVITY_CLASSIFIER_ENABLED
+    else None
+)
+analysis_service = AnalysisService(
+    cache=create_result_cache(
+        settings.RESULT_CACHE_BACKEND,
+        max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+        path=settings.RESULT_CACHE_PATH,
+    ),
+    aggregates=(
+        AggregateStore(database_path(settings.DATABASE_URL))
+        if settings.AGGREGATES_ENABLED
+        else None
+    ),
+    resample_rate_hz=settings.ANALYSIS_RESAMPLE_RATE_HZ,
+    memory_budget_bytes=settings.ANALYSIS_MEMORY_BUDGET_BYTES,
+    classifier=activity_classifier,
+    epoch_seconds=settings.ACTIVITY_EPOCH_SECONDS,
+)
+analysis_executor = BoundedExecutor(
+    settings.ANALYSIS_EXECUTOR,
+    max_workers=settings.ANALYSIS_MAX_WORKERS,
+    max_queue=settings.ANALYSIS_MAX_QUEUE,
+)
+analysis_jobs = JobManager(
+    analysis_service,
+    create_job_store(
+        settings.JOB_STORE_BACKEND,
+        path=settings.JOB_STORE_PATH,
+        ttl_seconds=settings.JOB_TTL_SECONDS,
+    ),
+    max_workers=settings.JOB_MAX_WORKERS,
+    max_queue=settings.JOB_MAX_QUEUE,
+    callback_timeout_seconds=settings.JOB_CALLBACK_TIMEOUT_SECONDS,
+    callback_retries=settings.JOB_CALLBACK_RETRIES,
+    analysis_executor=analysis_executor,
+    callback_hosts=settings.JOB_CALLBACK_ALLOWED_HOSTS,
+)
+streaming_sessions = StreamingSessionStore(
+    ttl_seconds=settings.STREAM_SESSION_TTL_SECONDS,
+    max_sessions=settings.STREAM_MAX_SESSIONS,
+    classifier=activity_classifier,
+    epoch_seconds=settings.ACTIVITY_EPOCH_SECONDS,
+    aggregates=analysis_service.aggregates,
+    max_session_samples=settings.STREAM_MAX_SESSION_SAMPLES,
+)
+
+registry.register_callback(
+    "analysis_executor_in_flight",
+    "Analysis jobs running on the worker pool.",
+    "gauge",
+    lambda: analysis_executor.stats()["in_flight"],
+)
+registry.register_callback(
+    "analysis_executor_queued",
+    "Analysis jobs waiting for a worker.",
+    "gauge",
+    lambda: analysis_executor.stats()["queued"],
+)
+registry.register_callback(
+    "analysis_jobs_pending",
+    "Background analysis jobs queued or running.",
+    "gauge",
+    lambda: analysis_jobs.stats()["pending"],
+)
+if analysis_service.cache is not None:
+    result_cache: ResultCache = analysis_service.cache
+    registry.register_callback(
+        "analysis_result_cache_hits_total",
+        "Analysis requests served from the result cache.",
+        "counter",
+        lambda: result_cache.hits,
+    )
+    registry.register_callback(
+        "analysis_result_cache_misses_total",
+        "Analysis requests not found in the result cache.",
+        "counter",
+        lambda: result_cache.misses,
+    )
+
+
+def saturated_error() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Analysis queue is full, retry later",
+        headers={"Retry-After": "1"},
+    )
+
+
+def too_large_error(detail: str) -> HTTPException:
+    return HTTPException(status_code=413, detail=detail)
+
+
+def check_sample_count(sample_count: int) -> None:
+    if settings.MAX_REQUEST_SAMPLES and sample_count > settings.MAX_REQUEST_SAMPLES:
+        raise too_large_error(
+            f"Request has {sample_count} samples, "
+            f"the limit is {settings.MAX_REQUEST_SAMPLES}"
+        )
+
+
+@router.post(
+    "/analyze",
+    response_model=AnalysisResponse,
+    responses={202: {"model": AnalysisJob, "description": "Analysis job queued"}},
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"$ref": "#/components/schemas/AnalysisRequest"}
+                },
+                binary.CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+            },
+        }
+    },
+)
+async def analyze_data(
+    raw_request: Request,
+    run_async: bool = Query(False, alias="async"),
+    callback_url: Optional[AnyHttpUrl] = None,
+) -> ModelResponse:
+    """Analyze accelerometer data and return insights and recommendations.
+
+    Accepts a JSON ``AnalysisRequest`` or the compact binary sample format.
+    With ``async=true`` the analysis runs as a background job: the job is
+    returned right away (202) and its result is fetched from ``/jobs/{job_id}``
+    or POSTed to ``callback_url`` when it finishes.
+    """
+    with time_stage("validation"):
+        request = await parse_analysis_request(raw_request)
+    check_sample_count(request.acceleration_data.sample_count)
+
+    if run_async:
+        try:
+            job = await run_in_threadpool(
+                analysis_jobs.submit,
+                request,
+                str(callback_url) if callback_url else None,
+            )
+        except ExecutorSaturatedError:
+            raise saturated_error()
+        except CallbackURLError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        return ModelResponse(
+            job, status_code=202, headers={"Location": f"/jobs/{job.job_id}"}
+        )
+
+    try:
+        response = await analyze_on_pool(request)
+    except ExecutorSaturatedError:
+        raise saturated_error()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing data: {str(e)}")
+
+    # The response is already validated, serialize it once without re-validation
+    with time_stage("serialization"):
+        return ModelResponse(response)
+
+
+async def analyze_on_pool(request: AnalysisRequest) -> AnalysisResponse:
+    """Run the signal stages on the analysis pool around a cache lookup here.
+
+    Worker processes have no result cache and no rendered metrics, so the
+    cache is looked up and filled, and the stage timings recorded, in this
+    process whichever executor runs the analysis.
+    """
+    lookup = await run_in_threadpool(analysis_service.lookup, request)
+    if lookup.response is not None:
+        return lookup.response
+    analyzed, stages = await analysis_executor.run(
+        analysis_service.analyze_signal_timed, request, lookup
+    )
+    record_stages(stages)
+    if isinstance(analyzed, AnalysisResponse):
+        return analyzed
+    responses = await run_in_threadpool(analysis_service.respond, [analyzed])
+    return responses[0]
+
+
+async def parse_analysis_request(raw_request: Request) -> AnalysisRequest:
+    """Parse the request body according to its content type."""
+    body = await read_body(raw_request, settings.MAX_REQUEST_BYTES)
+    content_type = raw_request.headers.get("content-type", "")
+
+    try:
+        if content_type.split(";")[0].strip() == binary.CONTENT_TYPE:
+            return binary.decode_analysis_request(body, settings.MAX_REQUEST_SAMPLES)
+        return AnalysisRequest.parse_raw(body)
+    except binary.SampleLimitError as e:
+        raise too_large_error(str(e))
+    except binary.BinaryFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValidationError as e:
+        raise RequestValidationError(e.raw_errors)
+
 
-router = APIRouter()
-analysis_service = AnalysisService()
+async def read_body(raw_request: Request, max_bytes: int) -> bytes:
+    """Read the request body, refusing it as soon as it exceeds ``max_bytes``.
 
+    Bodies without a Content-Length (chunked uploads) are checked as they
+    arrive, so an oversized upload is never fully buffered.
+    """
+    chunks = []
+    size = 0
+    async for chunk in raw_request.stream():
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise too_large_error(f"Request body exceeds {max_bytes} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
 
-@router.post("/analyze", response_model=AnalysisResponse)
-async def analyze_data(request: AnalysisRequest):
-    """Analyze accelerometer data and return insights and recommendations."""
+
+@router.post("/analyze/batch", response_model=BatchAnalysisResponse)
+async def analyze_batch(batch: BatchAnalysisRequest) -> ModelResponse:
+    """Analyze many sessions in one call; failures are reported per item.
+
+    A batch takes one queue slot; its items share the analysis pool.
+    """
+    check_sample_count(
+        sum(request.acceleration_data.sample_count for request in batch.requests)
+    )
+    try:
+        with analysis_executor.admit():
+            results = await run_in_threadpool(
+                analysis_service.analyze_batch,
+                batch.requests,
+                analysis_executor.executor,
+            )
+    except ExecutorSaturatedError:
+        raise saturated_error()
+    return ModelResponse(BatchAnalysisResponse.construct(results=results))
+
+
+@router.get("/jobs/{job_id}", response_model=AnalysisJob)
+async def get_job(job_id: str) -> ModelResponse:
+    """Status of a background analysis job, with its result once it succeeded."""
+    job = await run_in_threadpool(analysis_jobs.store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    return ModelResponse(job)
+
+
+@router.get("/stats")
+async def get_stats() -> Dict[str, Any]:
+    """Load gauges for the analysis worker pool and result cache counters."""
+    stats = {
+        "analysis_executor": analysis_executor.stats(),
+        "analysis_jobs": analysis_jobs.stats(),
+    }
+    if analysis_service.cache is not None:
+        stats["result_cache"] = analysis_service.cache.stats()
+    return stats
+
+
+@router.get("/users/{user_id}/trends", response_model=TrendsResponse)
+async def get_trends(
+    user_id: str,
+    granularity: str = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> ModelResponse:
+    """Activity trends of a user from the stored rollups, without raw samples.
+
+    Returns the ``minute``, ``hour`` or ``day`` buckets starting in
+    ``[start, end)``.
+    """
+    if analysis_service.aggregates is None:
+        raise HTTPException(status_code=404, detail="Trend aggregates are disabled")
     try:
-        response = analysis_service.analyze(request)
-        return response
+        buckets = analysis_service.aggregates.trends(user_id, granularity, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return ModelResponse(
+        TrendsResponse.construct(
+            user_id=user_id, granularity=granularity, buckets=buckets
+        )
+    )
+
+
+@router.post("/stream", response_model=StreamingSessionStatus)
+async def open_stream(request: StreamingSessionRequest) -> StreamingSessionStatus:
+    """Open a streaming session that accepts samples in chunks."""
+    try:
+        return streaming_sessions.create(request)
+    except OverflowError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@router.post("/stream/{session_id}/chunks", response_model=StreamingSessionStatus)
+async def append_stream_chunk(
+    session_id: str, chunk: AccelerationChunk
+) -> StreamingSessionStatus:
+    """Append a chunk of samples to a streaming session."""
+    check_sample_count(chunk.sample_count)
+    try:
+        return await run_in_threadpool(streaming_sessions.append, session_id, chunk)
+    except SessionNotFoundError:
+        raise HTTPException(status_code=404, detail="Streaming session not found")
+    except SessionFullError as e:
+        raise too_large_error(str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing data: {str(e)}")
+
+
+@router.post("/stream/{session_id}/finish", response_model=AnalysisResponse)
+async def finish_stream(session_id: str) -> ModelResponse:
+    """Close a streaming session and return its analysis."""
+    try:
+        response = await run_in_threadpool(streaming_sessions.finish, session_id)
+    except SessionNotFoundError:
+        raise HTTPException(status_code=404, detail="Streaming session not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing data: {str(e)}")
+    return ModelResponse(response)
+
+
+def _locked(session: StreamingSession, method: Callable, *args: Any) -> Any:
+    with session.lock:
+        return method(*args)
+
+
+@router.websocket("/stream/live")
+async def live_stream(websocket: WebSocket) -> None:
+    """Analyze samples as they arrive and push incremental results.
+
+    The first message opens the session (a ``StreamingSessionRequest``), the
+    following ones are ``AccelerationChunk`` objects. A ``LiveAnalysisUpdate``
+    is sent every ``STREAM_LIVE_UPDATE_SECONDS``, or after every chunk when
+    that is 0. Live sessions count toward ``STREAM_MAX_SESSIONS``.
+    """
+    await websocket.accept()
+    try:
+        request = StreamingSessionRequest.parse_raw(await websocket.receive_text())
+    except ValidationError as e:
+        await websocket.send_json({"detail": e.errors()})
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    with ExitStack() as stack:
+        try:
+            session = stack.enter_context(
+                streaming_sessions.live(request, settings.STREAM_LIVE_WINDOW_SECONDS)
+            )
+        except OverflowError as e:
+            await websocket.send_json({"detail": str(e)})
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return
+        await _serve_live_session(websocket, session)
+
+
+async def _serve_live_session(websocket: WebSocket, session: LiveSession) -> None:
+    cadence = settings.STREAM_LIVE_UPDATE_SECONDS
+
+    async def send_update() -> None:
+        update = await run_in_threadpool(_locked, session, session.update)
+        await websocket.send_text(dump_model(update).decode())
+
+    async def send_updates() -> None:
+        while True:
+            await asyncio.sleep(cadence)
+            await send_update()
+
+    pusher = asyncio.ensure_future(send_updates()) if cadence > 0 else None
+
+    async def receive() -> str:
+        if pusher is None:
+            return await websocket.receive_text()
+        # A failed pusher ends the connection instead of silently stopping updates
+        receiving = asyncio.ensure_future(websocket.receive_text())
+        await asyncio.wait({receiving, pusher}, return_when=asyncio.FIRST_COMPLETED)
+        if not receiving.done():
+            receiving.cancel()
+            pusher.result()
+        return receiving.result()
+
+    try:
+        while True:
+            message = await receive()
+            try:
+                chunk = AccelerationChunk.parse_raw(message)
+            except ValidationError as e:
+                await websocket.send_json({"detail": e.errors()})
+                continue
+            try:
+                check_sample_count(chunk.sample_count)
+            except HTTPException as e:
+                await websocket.send_json({"detail": e.detail})
+                continue
+            await run_in_threadpool(_locked, session, session.append, chunk)
+            if pusher is None:
+                await send_update()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.exception("Live session %s failed", session.session_id)
+        if websocket.client_state == WebSocketState.CONNECTED:
+            try:
+                await websocket.send_json({"detail": f"Error analyzing data: {e}"})
+                await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+            except Exception:
+                # The failure was the client going away while an update was sent
+                logger.debug("Live session %s disconnected", session.session_id)
+    finally:
+        if pusher is not None:
+            pusher.cancel()
+            # Collect the pusher's outcome; a failure was raised by receive()
+            await asyncio.gather(pusher, return_exceptions=True)
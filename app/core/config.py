@@ -1,7 +1,7 @@
 import os
-from typing import List
+from typing import Any, Dict, List
 
-from pydantic import AnyHttpUrl, BaseSettings
+from pydantic import AnyHttpUrl, BaseSettings, root_validator
 
 
 class Settings(BaseSettings):
@@ -14,12 +14,104 @@ class Settings(BaseSettings):
 
     ALLOWED_ORIGINS: List[AnyHttpUrl] = []
 
-    # Database config for potential future use
+    # Worker pool for analysis: "thread" or "process", 0 workers = CPU count.
+    # Requests beyond the running and queued limit get a 503.
+    ANALYSIS_EXECUTOR: str = "thread"
+    ANALYSIS_MAX_WORKERS: int = 0
+    ANALYSIS_MAX_QUEUE: int = 64
+
+    # Result cache for repeated payloads: "none", "memory" or "disk" (SQLite).
+    # It is used in the server process, also with the process executor; use
+    # "disk" so that several server workers share one cache.
+    RESULT_CACHE_BACKEND: str = "memory"
+    RESULT_CACHE_MAX_ENTRIES: int = 1024
+    RESULT_CACHE_TTL_SECONDS: float = 3600.0
+    RESULT_CACHE_PATH: str = "result_cache.sqlite3"
+
+    # Larger requests are refused with a 413; 0 disables a limit
+    MAX_REQUEST_BYTES: int = 256 * 1024 * 1024
+    MAX_REQUEST_SAMPLES: int = 20_000_000
+
+    # Storage dtype of sample axes: "float32" (half the memory; sensors have
+    # 16-bit resolution) or "float64". Analysis computes in float64 either way
+    # and metrics agree within the tolerance documented in the README
+    SAMPLE_DTYPE: str = "float32"
+
+    # Working memory per analysis: longer recordings are analyzed in blocks
+    # that fit it, with the same results. 0 analyzes every recording at once
+    ANALYSIS_MEMORY_BUDGET_BYTES: int = 0
+
+    # Decimate recordings sampled faster than this rate before analysis;
+    # 0 analyzes every sample at the recorded rate
+    ANALYSIS_RESAMPLE_RATE_HZ: float = 0.0
+
+    # Label 10 s windows as sedentary/light/moderate/vigorous with a joblib
+    # scikit-learn model; empty ACTIVITY_MODEL_PATH uses the bundled
+    # app/services/trained/activity_classifier.joblib
+    ACTIVITY_CLASSIFIER_ENABLED: bool = True
+    ACTIVITY_MODEL_PATH: str = ""
+
+    # Load SciPy, scikit-learn and the activity model in the background after
+    # startup instead of on the first request that needs them
+    WARM_UP_ON_STARTUP: bool = True
+
+    # Epoch lengths summarized in the activity metrics, computed in the same
+    # rolling pass as the activity window
+    ACTIVITY_EPOCH_SECONDS: List[float] = [5.0, 15.0, 60.0]
+
+    # JSON rule table for insights and recommendations; empty uses the
+    # bundled app/services/rules/insights.json
+    INSIGHT_RULES_PATH: str = ""
+
+    # Background jobs for /analyze?async=true: "memory" or "sqlite" (JOB_STORE_PATH),
+    # which keeps results and resumes unfinished jobs after a restart
+    JOB_STORE_BACKEND: str = "memory"
+    JOB_STORE_PATH: str = "jobs.sqlite3"
+    JOB_TTL_SECONDS: float = 86400.0
+    JOB_MAX_WORKERS: int = 2
+    JOB_MAX_QUEUE: int = 256
+    JOB_CALLBACK_TIMEOUT_SECONDS: float = 10.0
+    JOB_CALLBACK_RETRIES: int = 3
+    # Hosts callback_url may point to; when empty, any host resolving only to
+    # public addresses (never private, loopback or link-local ones)
+    JOB_CALLBACK_ALLOWED_HOSTS: List[str] = []
+    # Requeue unfinished jobs at startup; with several server workers only
+    # the first one does (see gunicorn.conf.py)
+    JOB_RESUME_ON_STARTUP: bool = True
+
+    # Streaming sessions expire after this many idle seconds
+    STREAM_SESSION_TTL_SECONDS: float = 900.0
+    STREAM_MAX_SESSIONS: int = 1000
+    # Samples one HTTP streaming session may receive in total (0: no limit);
+    # every chunk is also held to MAX_REQUEST_SAMPLES
+    STREAM_MAX_SESSION_SAMPLES: int = 100_000_000
+    # Live analysis over /stream/live: seconds between pushed updates (0 sends
+    # one after every chunk) and length of the recent window they summarize
+    STREAM_LIVE_UPDATE_SECONDS: float = 1.0
+    STREAM_LIVE_WINDOW_SECONDS: float = 60.0
+
+    # Per-user trend rollups, stored in DATABASE_URL ("sqlite:///path");
+    # kept in memory when it is empty, which the process executor does not
+    # support (each worker process would write to its own copy)
+    AGGREGATES_ENABLED: bool = True
     DATABASE_URL: str = ""
 
     class Config:
         env_file = ".env"
         case_sensitive = True
 
+    @root_validator(skip_on_failure=True)
+    def check_shared_aggregates(cls, values: Dict[str, Any]) -> Dict[str, Any]:
+        if (
+            values["ANALYSIS_EXECUTOR"] == "process"
+            and values["AGGREGATES_ENABLED"]
+            and not values["DATABASE_URL"]
+        ):
+            raise ValueError(
+                "ANALYSIS_EXECUTOR=process needs a DATABASE_URL for trend rollups "
+                "(or AGGREGATES_ENABLED=false)"
+            )
+        return values
+
 
 settings = Settings()
@@ -0,0 +1,93 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, TypeVar
+
+EXECUTOR_KINDS = ("thread", "process")
+
+T = TypeVar("T")
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when a bounded executor has no room for more work."""
+
+
+def create_executor(kind: str = "thread", max_workers: int = 0) -> Executor:
+    """Create a thread or process pool; ``max_workers=0`` means one per CPU."""
+    if kind not in EXECUTOR_KINDS:
+        raise ValueError(
+            f"Unknown executor kind {kind!r}, expected one of {EXECUTOR_KINDS}"
+        )
+
+    workers = max_workers or os.cpu_count() or 1
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=workers, mp_context=process_context())
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis")
+
+
+def process_context() -> multiprocessing.context.BaseContext:
+    """Start method for process pools that does not fork the server.
+
+    Workers are started on the first submitted job, while other threads (the
+    warm-up, request threads importing a library) may hold locks; a forked
+    child inherits them held and can hang. Forkserver children fork from a
+    clean single-threaded process instead.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+
+
+class BoundedExecutor:
+    """Runs blocking work off the event loop with a cap on queued work.
+
+    At most ``max_workers`` jobs run at once and at most ``max_queue`` more wait
+    for a worker; beyond that ``ExecutorSaturatedError`` is raised immediately so
+    callers can shed load instead of piling up requests.
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: int = 0, max_queue: int = 64):
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.executor = create_executor(kind, self.max_workers)
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def admit(self, check: bool = True) -> Iterator[None]:
+        """Reserve a slot for one job, or raise if the queue is full.
+
+        ``check=False`` always admits, for callers that bound their own queue.
+        """
+        with self._lock:
+            if check and self._pending >= self.max_workers + self.max_queue:
+                raise ExecutorSaturatedError("Analysis queue is full")
+            self._pending += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run ``fn(*args)`` on the pool and await its result."""
+        with self.admit():
+            return await asyncio.wrap_future(self.executor.submit(fn, *args))
+
+    def stats(self) -> Dict[str, int]:
+        """Current load, for sizing workers per node."""
+        pending = self._pending
+        return {
+            "in_flight": min(pending, self.max_workers),
+            "queued": max(0, pending - self.max_workers),
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+        }
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,202 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+SAMPLE_COUNT_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+# Stage name and seconds
+StageTimings = List[Tuple[str, float]]
+
+T = TypeVar("T")
+
+
+class Histogram:
+    """Fixed-bucket histogram; observing costs a bisect and a short lock."""
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """Cumulative bucket counts (last one is +Inf) and the sum."""
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total
+
+
+class MetricsRegistry:
+    """Histograms and callback gauges rendered in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._families: Dict[str, Tuple[str, Sequence[float]]] = {}
+        self._histograms: Dict[Tuple[str, LabelSet], Histogram] = {}
+        self._callbacks: Dict[str, Tuple[str, str, Callable[[], float]]] = {}
+        self._lock = threading.Lock()
+
+    def register_histogram(
+        self, name: str, description: str, buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        self._families[name] = (description, buckets)
+
+    def register_callback(
+        self, name: str, description: str, kind: str, callback: Callable[[], float]
+    ) -> None:
+        """Register a gauge or counter whose value is read at render time."""
+        self._callbacks[name] = (description, kind, callback)
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(
+                    key, Histogram(self._families[name][1])
+                )
+        histogram.observe(value)
+
+    @contextmanager
+    def time(self, name: str, **labels: str) -> Iterator[None]:
+        """Observe the wall time of the block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        for name, (description, buckets) in self._families.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} histogram")
+            for (family, labels), histogram in list(self._histograms.items()):
+                if family != name:
+                    continue
+                cumulative, total = histogram.snapshot()
+                bounds = [_format_value(bound) for bound in histogram.buckets]
+                for bound, count in zip(bounds + ["+Inf"], cumulative):
+                    bucket_labels = _format_labels(labels + (("le", bound),))
+                    lines.append(f"{name}_bucket{bucket_labels} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative[-1]}")
+
+        for name, (description, kind, callback) in self._callbacks.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {_format_value(callback())}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _format_labels(labels: LabelSet) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+STAGE_SECONDS = "analysis_stage_seconds"
+SAMPLE_COUNT = "analysis_samples"
+HTTP_REQUEST_SECONDS = "http_request_duration_seconds"
+
+registry = MetricsRegistry()
+registry.register_histogram(STAGE_SECONDS, "Time spent in each analysis stage.")
+registry.register_histogram(
+    SAMPLE_COUNT, "Samples per analyzed payload.", SAMPLE_COUNT_BUCKETS
+)
+registry.register_histogram(HTTP_REQUEST_SECONDS, "HTTP request latency by route.")
+
+
+# Set by collect_stages: stages are timed into this list instead of the registry
+_collected_stages: ContextVar[Optional[StageTimings]] = ContextVar(
+    "collected_stages", default=None
+)
+
+
+def time_stage(stage: str) -> ContextManager[None]:
+    """Time an analysis stage.
+
+    Inside ``collect_stages`` the timing is handed back to its caller instead.
+    """
+    collected = _collected_stages.get()
+    if collected is None:
+        return registry.time(STAGE_SECONDS, stage=stage)
+    return _collect_stage(collected, stage)
+
+
+@contextmanager
+def _collect_stage(collected: StageTimings, stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        collected.append((stage, time.perf_counter() - start))
+
+
+def collect_stages(fn: Callable[..., T], *args: Any) -> Tuple[T, StageTimings]:
+    """Call ``fn(*args)`` and return its result with the stages it timed.
+
+    Process-pool workers have their own registry, which is never rendered;
+    work sent to them runs through this and the server records the timings
+    with ``record_stages``.
+    """
+    collected: StageTimings = []
+    token = _collected_stages.set(collected)
+    try:
+        return fn(*args), collected
+    finally:
+        _collected_stages.reset(token)
+
+
+def record_stages(timings: StageTimings) -> None:
+    """Record stage timings returned by ``collect_stages``."""
+    for stage, seconds in timings:
+        registry.observe(STAGE_SECONDS, seconds, stage=stage)
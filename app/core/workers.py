@@ -0,0 +1,48 @@
+"""Process model of the production server (see ``gunicorn.conf.py``).
+
+Nothing here imports NumPy: thread counts of the BLAS and OpenMP pools are
+read from the environment when NumPy is first imported, so they must be set
+before the application is loaded.
+"""
+import os
+from typing import MutableMapping, Optional
+
+# Thread pool sizes read by OpenBLAS, MKL, BLIS, Accelerate, OpenMP and numexpr
+BLAS_THREAD_VARIABLES = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on, which a container can restrict."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def worker_count(workers: int = 0) -> int:
+    """Server worker processes; 0 means one per available CPU."""
+    return workers if workers > 0 else available_cpus()
+
+
+def threads_per_worker(workers: int) -> int:
+    """CPUs left to each worker when ``workers`` processes share the machine."""
+    return max(1, available_cpus() // max(workers, 1))
+
+
+def pin_blas_threads(
+    threads: int, environ: Optional[MutableMapping[str, str]] = None
+) -> None:
+    """Cap the native thread pools of every worker at ``threads``.
+
+    Without a cap each worker starts one BLAS thread per CPU, and N workers
+    oversubscribe the machine N times. Values already set are kept.
+    """
+    environ = os.environ if environ is None else environ
+    for variable in BLAS_THREAD_VARIABLES:
+        environ.setdefault(variable, str(threads))
@@ -1,8 +1,16 @@
-from fastapi import FastAPI
+import time
+from typing import Awaitable, Callable, Dict
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Match
 
+from app.api.routes import activity_classifier, analysis_executor, analysis_jobs
 from app.api.routes import router as api_router
 from app.core.config import settings
+from app.core.instrumentation import HTTP_REQUEST_SECONDS, registry
+from app.services.warmup import start_warm_up
 
 
 def create_application() -> FastAPI:
@@ -22,14 +30,80 @@ def create_application() -> FastAPI:
         allow_headers=["*"],
     )
 
+    @application.middleware("http")
+    async def reject_large_requests(
+        request: Request, call_next: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        # Refuse declared oversized bodies before anything reads them
+        length = request.headers.get("content-length", "")
+        limit = settings.MAX_REQUEST_BYTES
+        if limit and length.isdigit() and int(length) > limit:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"Request body exceeds {limit} bytes"},
+            )
+        return await call_next(request)
+
+    @application.middleware("http")
+    async def record_request_latency(
+        request: Request, call_next: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        start = time.perf_counter()
+        response = await call_next(request)
+        # Label by route template, not raw path, to keep cardinality bounded
+        registry.observe(
+            HTTP_REQUEST_SECONDS,
+            time.perf_counter() - start,
+            method=request.method,
+            route=route_label(request),
+            status=str(response.status_code),
+        )
+        return response
+
     # Include routers
     application.include_router(api_router)
 
+    @application.on_event("startup")
+    def resume_jobs() -> None:
+        if settings.JOB_RESUME_ON_STARTUP:
+            analysis_jobs.resume()
+
+    @application.on_event("startup")
+    def warm_up() -> None:
+        # Runs while the server already answers /health
+        if settings.WARM_UP_ON_STARTUP:
+            start_warm_up(activity_classifier)
+
+    @application.on_event("shutdown")
+    def shutdown_executor() -> None:
+        analysis_executor.shutdown()
+        analysis_jobs.shutdown()
+
     @application.get("/health")
-    def health_check():
+    def health_check() -> Dict[str, str]:
         return {"status": "healthy", "service": settings.PROJECT_NAME}
 
+    @application.get("/metrics", response_class=PlainTextResponse)
+    def metrics() -> PlainTextResponse:
+        """Prometheus metrics for the analysis pipeline."""
+        return PlainTextResponse(
+            registry.render(), media_type="text/plain; version=0.0.4"
+        )
+
     return application
 
 
+def route_label(request: Request) -> str:
+    """Path template of the route that served a request, "unmatched" for 404s."""
+    route = request.scope.get("route")
+    if route is None:
+        # Only API routes put themselves in the scope; match the others (the
+        # OpenAPI schema, the docs) again
+        for candidate in request.app.router.routes:
+            if candidate.matches(request.scope)[0] != Match.NONE:
+                route = candidate
+                break
+    return getattr(route, "path", "unmatched")
+
+
 app = create_application()
@@ -1,8 +1,126 @@
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
 from uuid import UUID
 
-from pydantic import BaseModel
+import numpy as np
+from pydantic import BaseModel, Field, root_validator
+from pydantic.datetime_parse import parse_datetime
+
+from app.core.config import settings
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Storage dtypes of the x/y/z columns, chosen by Settings.SAMPLE_DTYPE
+SAMPLE_DTYPES = ("float32", "float64")
+
+
+def sample_dtype() -> np.dtype:
+    """Dtype that sample axes are stored in; analysis always computes in float64."""
+    if settings.SAMPLE_DTYPE not in SAMPLE_DTYPES:
+        raise ValueError(
+            f"Unsupported SAMPLE_DTYPE {settings.SAMPLE_DTYPE!r}, "
+            f"expected one of {SAMPLE_DTYPES}"
+        )
+    return np.dtype(settings.SAMPLE_DTYPE)
+
+
+def datetime_to_ns(value: datetime) -> int:
+    """Convert a datetime to epoch nanoseconds, treating naive values as UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def ns_to_datetime(value: int) -> datetime:
+    """Convert epoch nanoseconds to a timezone-aware UTC datetime."""
+    return _EPOCH + timedelta(microseconds=int(value) // 1000)
+
+
+class FloatArray(np.ndarray):
+    """One-dimensional float column validated in bulk from a list of numbers."""
+
+    @classmethod
+    def __get_validators__(cls) -> Any:
+        yield cls.validate
+
+    @classmethod
+    def __modify_schema__(cls, field_schema: Dict[str, Any]) -> None:
+        field_schema.update(type="array", items={"type": "number"})
+
+    @classmethod
+    def validate(cls, value: Any) -> "FloatArray":
+        dtype = sample_dtype()
+        # Float arrays (e.g. views of a binary upload) are kept without copying,
+        # unless they are wider than the storage dtype
+        if isinstance(value, np.ndarray) and value.dtype.kind == "f":
+            array = value if value.itemsize <= dtype.itemsize else value.astype(dtype)
+        else:
+            try:
+                array = np.asarray(value, dtype=dtype)
+            except (TypeError, ValueError):
+                raise ValueError("must be an array of numbers")
+        if array.ndim != 1:
+            raise ValueError("must be a one-dimensional array")
+        if not np.isfinite(array).all():
+            raise ValueError("must contain only finite numbers")
+        return array.view(cls)
+
+
+class TimestampArray(np.ndarray):
+    """One-dimensional datetime64[ns] column validated in bulk.
+
+    Accepts epoch milliseconds, ISO 8601 strings or a datetime64 array.
+    """
+
+    @classmethod
+    def __get_validators__(cls) -> Any:
+        yield cls.validate
+
+    @classmethod
+    def __modify_schema__(cls, field_schema: Dict[str, Any]) -> None:
+        field_schema.update(
+            type="array",
+            items={
+                "anyOf": [{"type": "number"}, {"type": "string", "format": "date-time"}]
+            },
+        )
+
+    @classmethod
+    def validate(cls, value: Any) -> "TimestampArray":
+        array = np.asarray(value)
+        if array.ndim != 1:
+            raise ValueError("must be a one-dimensional array")
+
+        if array.dtype.kind == "M":
+            nanoseconds = array.astype("datetime64[ns]", copy=False).view(np.int64)
+        elif array.size == 0 or array.dtype.kind in "iu":
+            nanoseconds = array.astype(np.int64) * 1_000_000
+        elif array.dtype.kind == "f":
+            if not np.isfinite(array).all():
+                raise ValueError("must contain only finite numbers")
+            nanoseconds = np.rint(array * 1e6).astype(np.int64)
+        else:
+            # Only ISO 8601 strings need pandas, which is slow to import
+            import pandas as pd
+
+            try:
+                parsed = pd.to_datetime(array, utc=True)
+            except (TypeError, ValueError):
+                raise ValueError("must be epoch milliseconds or ISO 8601 strings")
+            if parsed.isna().any():
+                raise ValueError("must not contain missing timestamps")
+            nanoseconds = parsed.asi8
+
+        return nanoseconds.view("datetime64[ns]").view(cls)
+
+
+class SampleArrays(NamedTuple):
+    """Columnar view of accelerometer samples."""
+
+    timestamps: np.ndarray  # int64 epoch nanoseconds
+    x: np.ndarray
+    y: np.ndarray
+    z: np.ndarray
 
 
 class AccelerationSample(BaseModel):
@@ -14,17 +132,221 @@ class AccelerationSample(BaseModel):
     z: float
 
 
-class AccelerationData(BaseModel):
-    """Model for a collection of accelerometer data samples."""
+class SampleList(Sequence):
+    """The ``samples`` of a request, stored as columns.
+
+    Validated in bulk from a list of sample dicts or models without building
+    a model per sample; indexing builds ``AccelerationSample`` models on
+    demand. Holds about 20 bytes per sample with float32 axes.
+    """
+
+    __slots__ = ("arrays",)
+
+    def __init__(self, arrays: SampleArrays) -> None:
+        self.arrays = arrays
+
+    def __len__(self) -> int:
+        return len(self.arrays.x)
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return SampleList(SampleArrays(*(column[index] for column in self.arrays)))
+        timestamp, x, y, z = (column[index] for column in self.arrays)
+        return AccelerationSample(
+            timestamp=ns_to_datetime(timestamp), x=float(x), y=float(y), z=float(z)
+        )
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, SampleList):
+            return all(map(np.array_equal, self.arrays, other.arrays))
+        return isinstance(other, list) and list(self) == other
+
+    def __repr__(self) -> str:
+        return f"SampleList({len(self)} samples)"
+
+    @classmethod
+    def __get_validators__(cls) -> Any:
+        yield cls.validate
+
+    @classmethod
+    def __modify_schema__(cls, field_schema: Dict[str, Any]) -> None:
+        field_schema.update(type="array", items=AccelerationSample.schema())
+
+    @classmethod
+    def validate(cls, value: Any) -> "SampleList":
+        if isinstance(value, SampleList):
+            return value
+        if not isinstance(value, (list, tuple)):
+            raise ValueError("must be a list of samples")
+        try:
+            fields = [
+                (item.timestamp, item.x, item.y, item.z)
+                if isinstance(item, AccelerationSample)
+                else (item["timestamp"], item["x"], item["y"], item["z"])
+                for item in value
+            ]
+        except (KeyError, TypeError):
+            raise ValueError("every sample needs timestamp, x, y and z")
+        timestamps, x, y, z = zip(*fields) if fields else ((), (), (), ())
+        return cls(
+            SampleArrays(
+                timestamps=_parse_timestamps(timestamps),
+                x=np.asarray(FloatArray.validate(x)),
+                y=np.asarray(FloatArray.validate(y)),
+                z=np.asarray(FloatArray.validate(z)),
+            )
+        )
+
+    @classmethod
+    def empty(cls) -> "SampleList":
+        return cls(
+            SampleArrays(
+                timestamps=np.empty(0, dtype=np.int64),
+                x=np.empty(0, dtype=sample_dtype()),
+                y=np.empty(0, dtype=sample_dtype()),
+                z=np.empty(0, dtype=sample_dtype()),
+            )
+        )
+
+
+def _parse_timestamps(values: Iterable[Any]) -> np.ndarray:
+    # Same parsing as a datetime field, without a model per sample
+    return np.fromiter(
+        (datetime_to_ns(parse_datetime(value)) for value in values), dtype=np.int64
+    )
+
+
+# Nested models don't inherit json_encoders in pydantic v1, so every model that
+# can (transitively) hold columnar samples lists these in its Config.
+ARRAY_JSON_ENCODERS: Dict[Any, Callable[[Any], Any]] = {
+    FloatArray: lambda array: np.asarray(array).tolist(),
+    TimestampArray: lambda array: (np.asarray(array).view(np.int64) / 1e6).tolist(),
+    SampleList: lambda samples: [sample.dict() for sample in samples],
+}
+
+
+class AccelerationChunk(BaseModel):
+    """Model for a batch of accelerometer samples without session metadata.
+
+    Samples are sent either as a list of ``samples`` or as parallel ``x``/``y``/``z``
+    columns with optional ``timestamps``.
+    """
+
+    samples: SampleList = Field(default_factory=SampleList.empty)
+    timestamps: Optional[TimestampArray] = None
+    x: Optional[FloatArray] = None
+    y: Optional[FloatArray] = None
+    z: Optional[FloatArray] = None
+
+    class Config:
+        json_encoders = ARRAY_JSON_ENCODERS
+
+    @root_validator(skip_on_failure=True)
+    def check_sample_columns(cls, values: Dict[str, Any]) -> Dict[str, Any]:
+        columns = [values.get(axis) for axis in ("x", "y", "z")]
+        timestamps = values.get("timestamps")
+
+        if all(column is None for column in columns):
+            if timestamps is not None:
+                raise ValueError("timestamps require x, y and z columns")
+            return values
+
+        if any(column is None for column in columns):
+            raise ValueError("x, y and z columns must be provided together")
+        if values.get("samples"):
+            raise ValueError("provide either samples or x/y/z columns, not both")
+
+        sample_count = len(values["x"])
+        if any(len(values[axis]) != sample_count for axis in ("y", "z")):
+            raise ValueError("x, y and z columns must have the same length")
+        if timestamps is not None and len(timestamps) != sample_count:
+            raise ValueError("timestamps must have the same length as x, y and z")
+
+        return values
+
+    @property
+    def sample_count(self) -> int:
+        return len(self.x) if self.x is not None else len(self.samples)
+
+    def columns_to_arrays(
+        self, start_time: datetime, sampling_rate_hz: float, offset: int = 0
+    ) -> SampleArrays:
+        """Return the samples as NumPy columns, whichever shape they were sent in.
+
+        Missing columnar timestamps are derived as sample ``offset + i`` of a
+        recording starting at ``start_time``.
+        """
+        if self.x is not None:
+            if self.timestamps is not None:
+                timestamps = np.asarray(self.timestamps).view(np.int64)
+            else:
+                indices = np.arange(offset, offset + len(self.x))
+                offsets = np.rint(indices * (1e9 / sampling_rate_hz))
+                timestamps = datetime_to_ns(start_time) + offsets.astype(np.int64)
+            return SampleArrays(
+                timestamps=timestamps,
+                x=np.asarray(self.x),
+                y=np.asarray(self.y),
+                z=np.asarray(self.z),
+            )
+
+        return self.samples.arrays
+
+
+class AccelerationData(AccelerationChunk):
+    """Model for a collection of accelerometer data samples.
+
+    Columnar timestamps are optional; when omitted they are derived from
+    ``start_time`` and ``sampling_rate_hz``.
+    """
 
     data_type: str
     device_info: Dict[str, Any]
     sampling_rate_hz: int
     start_time: datetime
-    samples: List[AccelerationSample]
     metadata: Optional[Dict[str, Any]] = None
     id: Optional[str] = None
 
+    @root_validator(skip_on_failure=True)
+    def check_sampling_rate(cls, values: Dict[str, Any]) -> Dict[str, Any]:
+        derives_timestamps = (
+            values.get("x") is not None and values["timestamps"] is None
+        )
+        if derives_timestamps and values["sampling_rate_hz"] <= 0:
+            raise ValueError("sampling_rate_hz must be positive to derive timestamps")
+        return values
+
+    def to_arrays(self) -> SampleArrays:
+        """Return the samples as NumPy columns, whichever shape they were sent in."""
+        return self.columns_to_arrays(self.start_time, self.sampling_rate_hz)
+
+
+class EpochMetrics(BaseModel):
+    """Activity summary over back-to-back epochs of one length."""
+
+    epoch_seconds: float
+    epoch_count: int
+    active_epochs: int
+    active_minutes: float
+    # Highest epoch mean intensity, on the avg_intensity scale
+    peak_intensity: float
+    avg_variance: float
+    avg_peak_magnitude: float
+
+
+class GapSummary(BaseModel):
+    """Sampling gaps and timestamp irregularities of a recording."""
+
+    gap_count: int
+    gap_seconds: float
+    longest_gap_seconds: float
+    # Samples received out of order (sorted) or with a repeated timestamp (dropped)
+    reordered_samples: int
+    duplicate_samples: int
+    # Standard deviation of the intervals between samples, outside gaps
+    jitter_ms: float
+    observed_rate_hz: float
+
 
 class ActivityMetrics(BaseModel):
     """Model for activity metrics calculated from accelerometer data."""
@@ -34,6 +356,14 @@ class ActivityMetrics(BaseModel):
     movement_consistency: float
     active_minutes: float
     total_duration: float
+    # Minutes per activity level, when an activity classifier is configured
+    sedentary_minutes: float = 0.0
+    light_minutes: float = 0.0
+    moderate_minutes: float = 0.0
+    vigorous_minutes: float = 0.0
+    # One summary per configured epoch length
+    epochs: List[EpochMetrics] = []
+    gaps: Optional[GapSummary] = None
 
 
 class InactivityPeriod(BaseModel):
@@ -44,8 +374,20 @@ class InactivityPeriod(BaseModel):
     duration: float  # in seconds
 
 
+class ActivityBout(BaseModel):
+    """Model for a bout of walking or running detected from steps."""
+
+    activity: str  # 'walking' or 'running'
+    start_time: datetime
+    end_time: datetime
+    duration: float  # in seconds, first to last step
+    step_count: int
+    cadence: float  # steps per minute
+
+
 class ActivityPatterns(BaseModel):
     """Model for activity patterns detected in accelerometer data."""
 
     inactivity_periods: List[InactivityPeriod]
-    activity_patterns: List[str] = []
+    activity_patterns: List[ActivityBout] = []
+    step_count: int = 0  # steps within bouts
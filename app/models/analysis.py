@@ -3,7 +3,12 @@ from uuid import UUID
 
 from pydantic import BaseModel
 
-from app.models.acceleration import AccelerationData, ActivityMetrics
+from app.models.acceleration import (
+    ARRAY_JSON_ENCODERS,
+    AccelerationData,
+    ActivityMetrics,
+    ActivityPatterns,
+)
 
 
 class Insight(BaseModel):
@@ -13,6 +18,7 @@ class Insight(BaseModel):
     insight_type: str
     message: str
     priority: str  # 'high', 'medium', or 'low'
+    rule_id: Optional[str] = None  # the insight rule that produced it
 
 
 class Recommendation(BaseModel):
@@ -23,6 +29,7 @@ class Recommendation(BaseModel):
     title: str
     message: str
     priority: str  # 'high', 'medium', or 'low'
+    rule_id: Optional[str] = None  # the recommendation rule that produced it
 
 
 class AnalysisRequest(BaseModel):
@@ -31,8 +38,12 @@ class AnalysisRequest(BaseModel):
     acceleration_data: AccelerationData
     include_insights: bool = True
     include_recommendations: bool = True
+    include_patterns: bool = False
     user_id: str
 
+    class Config:
+        json_encoders = ARRAY_JSON_ENCODERS
+
 
 class AnalysisResponse(BaseModel):
     """Model for a response containing analysis results."""
@@ -42,3 +53,22 @@ class AnalysisResponse(BaseModel):
     insights: List[Insight] = []
     recommendations: List[Recommendation] = []
     metrics: Optional[ActivityMetrics] = None
+    patterns: Optional[ActivityPatterns] = None
+
+
+class BatchAnalysisRequest(BaseModel):
+    """Model for a request to analyze many sessions in one call."""
+
+    requests: List[AnalysisRequest]
+
+    class Config:
+        json_encoders = ARRAY_JSON_ENCODERS
+
+
+class BatchAnalysisResponse(BaseModel):
+    """Model for batch analysis results, in request order.
+
+    Items that fail have status "error" and an explanatory message.
+    """
+
+    results: List[AnalysisResponse]
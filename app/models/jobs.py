@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.models.analysis import AnalysisResponse
+
+# Job lifecycle: queued -> running -> succeeded | failed
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_FINISHED = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+class AnalysisJob(BaseModel):
+    """Model for an analysis running in the background."""
+
+    job_id: str
+    status: str  # 'queued', 'running', 'succeeded' or 'failed'
+    created_at: datetime
+    updated_at: datetime
+    callback_url: Optional[str] = None
+    callback_status: Optional[str] = None  # 'delivered' or 'failed'
+    result: Optional[AnalysisResponse] = None
+    error: Optional[str] = None
@@ -0,0 +1,44 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, validator
+
+from app.models.acceleration import ActivityMetrics, InactivityPeriod
+
+
+class StreamingSessionRequest(BaseModel):
+    """Model for a request to open a streaming analysis session."""
+
+    data_type: str
+    device_info: Dict[str, Any]
+    sampling_rate_hz: int
+    start_time: datetime
+    metadata: Optional[Dict[str, Any]] = None
+    id: Optional[str] = None
+    include_insights: bool = True
+    include_recommendations: bool = True
+    include_patterns: bool = False
+    user_id: str
+
+    @validator("sampling_rate_hz")
+    def check_sampling_rate(cls, value: int) -> int:
+        if value <= 0:
+            raise ValueError("sampling_rate_hz must be positive")
+        return value
+
+
+class StreamingSessionStatus(BaseModel):
+    """Model for the state of a streaming analysis session."""
+
+    session_id: str
+    samples_received: int
+
+
+class LiveAnalysisUpdate(BaseModel):
+    """Model for the incremental results pushed on a live analysis connection."""
+
+    session_id: str
+    samples_received: int
+    metrics: ActivityMetrics  # everything received so far
+    window_metrics: ActivityMetrics  # the most recent samples only
+    inactivity_periods: List[InactivityPeriod] = []  # closed since the last update
@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import List
+
+from pydantic import BaseModel
+
+from app.models.acceleration import ActivityMetrics
+
+
+class TrendBucket(BaseModel):
+    """Model for the aggregated activity of one user in one time bucket."""
+
+    bucket_start: datetime
+    session_count: int
+    sample_count: int
+    metrics: ActivityMetrics
+    inactivity_count: int
+    inactivity_minutes: float
+
+
+class TrendsResponse(BaseModel):
+    """Model for a user's activity trends over a time range."""
+
+    user_id: str
+    granularity: str  # 'minute', 'hour' or 'day'
+    buckets: List[TrendBucket] = []
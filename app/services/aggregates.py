@@ -0,0 +1,210 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.models.acceleration import ActivityPatterns, datetime_to_ns, ns_to_datetime
+from app.models.trends import TrendBucket
+from app.utils.metrics import active_mask, summarize_activity
+from app.utils.rollups import GRANULARITIES, Rollup, coarsen, rollup_session
+from app.utils.signal import SignalFrame
+
+ROLLUP_COLUMNS = (
+    "sample_count",
+    "recorded_seconds",
+    "magnitude_sum",
+    "magnitude_sq_sum",
+    "active_seconds",
+    "inactivity_count",
+    "inactivity_seconds",
+)
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sessions ("
+    "user_id TEXT NOT NULL, session_key TEXT NOT NULL, recorded_at REAL NOT NULL, "
+    "PRIMARY KEY (user_id, session_key))",
+    "CREATE TABLE IF NOT EXISTS rollups ("
+    "user_id TEXT NOT NULL, granularity TEXT NOT NULL, bucket_start INTEGER NOT NULL, "
+    "session_count INTEGER NOT NULL, max_magnitude REAL NOT NULL, "
+    + ", ".join(f"{column} REAL NOT NULL" for column in ROLLUP_COLUMNS)
+    + ", PRIMARY KEY (user_id, granularity, bucket_start))",
+)
+
+# Sums add up and the peak is kept when a bucket already has data
+_UPSERT = (
+    "INSERT INTO rollups (user_id, granularity, bucket_start, session_count, "
+    f"max_magnitude, {', '.join(ROLLUP_COLUMNS)}) "
+    f"VALUES (?, ?, ?, 1, ?, {', '.join('?' for _ in ROLLUP_COLUMNS)}) "
+    "ON CONFLICT (user_id, granularity, bucket_start) DO UPDATE SET "
+    "session_count = session_count + 1, "
+    "max_magnitude = MAX(max_magnitude, excluded.max_magnitude), "
+    + ", ".join(f"{column} = {column} + excluded.{column}" for column in ROLLUP_COLUMNS)
+)
+
+
+def database_path(database_url: str) -> str:
+    """SQLite file path from a ``sqlite:///`` URL; in-memory when unset."""
+    if not database_url:
+        return ":memory:"
+    if not database_url.startswith("sqlite:///"):
+        raise ValueError(f"Unsupported DATABASE_URL {database_url!r}, expected sqlite")
+    return database_url[len("sqlite:///") :]
+
+
+class AggregateStore:
+    """Per-user minute, hour and day rollups of analyzed sessions in SQLite.
+
+    Each session is folded into the rollups once, when it is recorded, so
+    trend queries read a handful of rows instead of raw samples. Sessions are
+    deduplicated per user by a session key.
+
+    The store is picklable so services can be sent to process pools; an
+    in-memory database is not shared with the workers, use a file instead.
+    """
+
+    def __init__(self, path: str = ":memory:") -> None:
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connect lazily so the store can be created before workers fork
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            for statement in _SCHEMA:
+                self._connection.execute(statement)
+        return self._connection
+
+    def has_session(self, user_id: str, session_key: str) -> bool:
+        """Whether a session was already recorded for this user."""
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT 1 FROM sessions WHERE user_id = ? AND session_key = ?",
+                    (user_id, session_key),
+                )
+                .fetchone()
+            )
+        return row is not None
+
+    def record_session(
+        self,
+        user_id: str,
+        session_key: str,
+        frame: SignalFrame,
+        patterns: ActivityPatterns,
+    ) -> bool:
+        """Fold an analyzed session into the user's rollups.
+
+        Returns False when the session was already recorded for this user.
+        """
+        if len(frame) == 0:
+            return False
+        minutes = rollup_session(frame, active_mask(frame), patterns.inactivity_periods)
+        return self.record_rollup(user_id, session_key, minutes)
+
+    def record_rollup(self, user_id: str, session_key: str, minutes: Rollup) -> bool:
+        """Fold a session's minute rollup into the user's rollups.
+
+        Returns False when the session was already recorded for this user.
+        """
+        if len(minutes) == 0:
+            return False
+
+        rows = []
+        for granularity, bucket_seconds in GRANULARITIES.items():
+            rollup = (
+                minutes
+                if bucket_seconds == GRANULARITIES["minute"]
+                else coarsen(minutes, bucket_seconds)
+            )
+            rows.extend(self._rows(user_id, granularity, rollup))
+
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                inserted = connection.execute(
+                    "INSERT OR IGNORE INTO sessions VALUES (?, ?, ?)",
+                    (user_id, session_key, time.time()),
+                ).rowcount
+                if inserted:
+                    connection.executemany(_UPSERT, rows)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return bool(inserted)
+
+    @staticmethod
+    def _rows(user_id: str, granularity: str, rollup: Rollup) -> List[tuple]:
+        columns = [rollup.bucket_start.tolist(), rollup.max_magnitude.tolist()]
+        columns += [getattr(rollup, column).tolist() for column in ROLLUP_COLUMNS]
+        return [(user_id, granularity, *values) for values in zip(*columns)]
+
+    def trends(
+        self,
+        user_id: str,
+        granularity: str = "day",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[TrendBucket]:
+        """Rollup buckets of a user starting in ``[start, end)``, oldest first."""
+        if granularity not in GRANULARITIES:
+            raise ValueError(
+                f"Unknown granularity {granularity!r}, "
+                f"expected one of {tuple(GRANULARITIES)}"
+            )
+
+        start_seconds = datetime_to_ns(start) // 10**9 if start else -(2**62)
+        end_seconds = datetime_to_ns(end) // 10**9 if end else 2**62
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute(
+                    "SELECT bucket_start, session_count, max_magnitude, "
+                    f"{', '.join(ROLLUP_COLUMNS)} FROM rollups "
+                    "WHERE user_id = ? AND granularity = ? "
+                    "AND bucket_start >= ? AND bucket_start < ? "
+                    "ORDER BY bucket_start",
+                    (user_id, granularity, start_seconds, end_seconds),
+                )
+                .fetchall()
+            )
+        return [self._bucket(row) for row in rows]
+
+    @staticmethod
+    def _bucket(row: tuple) -> TrendBucket:
+        bucket_start, session_count, max_magnitude, *sums = row
+        values = dict(zip(ROLLUP_COLUMNS, sums))
+        count = values["sample_count"]
+        mean = values["magnitude_sum"] / count
+        variance = (
+            max(0.0, (values["magnitude_sq_sum"] - count * mean**2) / (count - 1))
+            if count > 1
+            else 0.0
+        )
+        return TrendBucket(
+            bucket_start=ns_to_datetime(bucket_start * 10**9),
+            session_count=session_count,
+            sample_count=int(count),
+            metrics=summarize_activity(
+                avg_magnitude=mean,
+                max_magnitude=max_magnitude,
+                magnitude_variance=variance,
+                duration_seconds=values["recorded_seconds"],
+                active_seconds=values["active_seconds"],
+            ),
+            inactivity_count=int(values["inactivity_count"]),
+            inactivity_minutes=values["inactivity_seconds"] / 60.0,
+        )
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"path": self.path}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)  # type: ignore[misc]
@@ -1,31 +1,480 @@
-from app.models.acceleration import ActivityMetrics
+import os
+from concurrent.futures import Executor
+from itertools import repeat
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from app.core.instrumentation import (
+    SAMPLE_COUNT,
+    StageTimings,
+    collect_stages,
+    record_stages,
+    registry,
+    time_stage,
+)
+from app.models.acceleration import AccelerationData, ActivityMetrics, ActivityPatterns
 from app.models.analysis import AnalysisRequest, AnalysisResponse
-from app.services.insights import generate_insights, generate_recommendations
+from app.services.aggregates import AggregateStore
+from app.services.cache import ResultCache, analysis_cache_key, arrays_digest
+from app.services.classifier import (
+    ActivityClassifier,
+    LevelAccumulator,
+    with_level_minutes,
+)
+from app.services.insights import feature_matrix, rule_engine, with_new_ids
 from app.utils.metrics import calculate_activity_metrics
 from app.utils.patterns import detect_activity_patterns
+from app.utils.ragged import (
+    ragged_activity_metrics,
+    ragged_activity_patterns,
+    ragged_from_sessions,
+)
+from app.utils.rollups import Rollup, combine_blocks, rollup_session
+from app.utils.signal import (
+    OrderedSamples,
+    decimate_frame,
+    iter_frame_blocks,
+    order_samples,
+    ordered_frame,
+)
+from app.utils.streaming import ActivityAccumulator
+
+# Peak working memory of the analysis per sample, on top of the sample columns;
+# tracemalloc measures about 40 bytes for whole recordings and 49 in blocks
+ANALYSIS_BYTES_PER_SAMPLE = 56
+# Smallest block analyzed in memory-budget mode
+MIN_BLOCK_SAMPLES = 4096
+
+
+class AnalyzedSession(NamedTuple):
+    """Metrics and patterns of a session whose response is not built yet."""
+
+    metrics: ActivityMetrics
+    patterns: ActivityPatterns
+    include_insights: bool = True
+    include_recommendations: bool = True
+    include_patterns: bool = False
+    cache_key: Optional[str] = None
+
+
+class CacheLookup(NamedTuple):
+    """Result cache lookup of a request, made before its signal stages run."""
+
+    response: Optional[AnalysisResponse] = None
+    digest: Optional[str] = None
+    cache_key: Optional[str] = None
+
+
+def build_responses(sessions: Sequence[AnalyzedSession]) -> List[AnalysisResponse]:
+    """Assemble analysis responses, evaluating the rule tables in one pass."""
+    features = feature_matrix(
+        [session.metrics for session in sessions],
+        [session.patterns for session in sessions],
+    )
+
+    # Initialize responses
+    responses = [
+        AnalysisResponse(
+            status="success",
+            metrics=session.metrics,
+            patterns=session.patterns if session.include_patterns else None,
+        )
+        for session in sessions
+    ]
+
+    # Generate insights if requested
+    wanted = [i for i, session in enumerate(sessions) if session.include_insights]
+    if wanted:
+        with time_stage("insights"):
+            insight_table = rule_engine.insights
+            matched = insight_table.evaluate_many(features[wanted])
+            for row, index in enumerate(wanted):
+                responses[index].insights = insight_table.build(
+                    matched[row], features[index]
+                )
+
+    # Generate recommendations if requested
+    wanted = [
+        i for i, session in enumerate(sessions) if session.include_recommendations
+    ]
+    if wanted:
+        with time_stage("recommendations"):
+            recommendation_table = rule_engine.recommendations
+            matched = recommendation_table.evaluate_many(features[wanted])
+            for row, index in enumerate(wanted):
+                responses[index].recommendations = recommendation_table.build(
+                    matched[row], features[index]
+                )
+
+    return responses
+
+
+def build_response(
+    metrics: ActivityMetrics,
+    patterns: ActivityPatterns,
+    include_insights: bool = True,
+    include_recommendations: bool = True,
+    include_patterns: bool = False,
+) -> AnalysisResponse:
+    """Assemble an analysis response from metrics and patterns."""
+    session = AnalyzedSession(
+        metrics, patterns, include_insights, include_recommendations, include_patterns
+    )
+    return build_responses([session])[0]
+
+
+def analyze_sessions(
+    sessions: Sequence[AccelerationData],
+    include_insights: bool = True,
+    include_recommendations: bool = True,
+    include_patterns: bool = False,
+    classifier: Optional[ActivityClassifier] = None,
+    epoch_seconds: Sequence[float] = (),
+) -> List[AnalysisResponse]:
+    """Analyze many sessions in one vectorized pass, e.g. to re-score history.
+
+    The result cache and trend rollups are not involved.
+    """
+    ragged = ragged_from_sessions(sessions)
+    metrics = ragged_activity_metrics(ragged, epoch_seconds)
+    if classifier is not None:
+        offsets = ragged.offsets.tolist()
+        levels = classifier.level_minutes_many(
+            [
+                ragged.magnitude[start:end]
+                for start, end in zip(offsets[:-1], offsets[1:])
+            ],
+            ragged.sampling_rate_hz.tolist(),
+        )
+        metrics = [with_level_minutes(*pair) for pair in zip(metrics, levels)]
+    return build_responses(
+        [
+            AnalyzedSession(
+                metrics,
+                patterns,
+                include_insights,
+                include_recommendations,
+                include_patterns,
+            )
+            for metrics, patterns in zip(metrics, ragged_activity_patterns(ragged))
+        ]
+    )
+
+
+def error_response(error: Exception) -> AnalysisResponse:
+    return AnalysisResponse(status="error", message=f"Error analyzing data: {error}")
 
 
 class AnalysisService:
-    """Service for analyzing accelerometer data."""
+    """Service for analyzing accelerometer data.
+
+    With ``resample_rate_hz`` set, faster recordings are decimated to about
+    that rate before metrics and patterns run. With ``memory_budget_bytes``
+    set, recordings whose working memory would exceed the budget are analyzed
+    in fixed-size blocks, carrying the rolling-window and inactivity-run state
+    across block edges, with the same results. With a ``classifier``, metrics
+    include the minutes spent at each activity level, and ``epoch_seconds``
+    adds a summary per epoch length.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[ResultCache] = None,
+        aggregates: Optional[AggregateStore] = None,
+        resample_rate_hz: float = 0.0,
+        memory_budget_bytes: int = 0,
+        classifier: Optional[ActivityClassifier] = None,
+        epoch_seconds: Sequence[float] = (),
+    ) -> None:
+        self.cache = cache
+        self.aggregates = aggregates
+        self.resample_rate_hz = resample_rate_hz
+        self.memory_budget_bytes = memory_budget_bytes
+        self.classifier = classifier
+        self.epoch_seconds = tuple(epoch_seconds)
 
-    def analyze(self, request: AnalysisRequest) -> AnalysisResponse:
-        """Analyze accelerometer data and generate insights and recommendations."""
+    def block_samples(self, sample_count: int) -> int:
+        """Block size for a recording in memory-budget mode, 0 to analyze it whole."""
+        if not self.memory_budget_bytes:
+            return 0
+        block = max(
+            MIN_BLOCK_SAMPLES, self.memory_budget_bytes // ANALYSIS_BYTES_PER_SAMPLE
+        )
+        return block if sample_count > block else 0
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Copies sent to worker processes have no cache: it is looked up and
+        # filled in the process that owns it (see lookup and respond)
+        return {**self.__dict__, "cache": None}
+
+    def analyze(
+        self, request: AnalysisRequest, executor: Optional[Executor] = None
+    ) -> AnalysisResponse:
+        """Analyze accelerometer data and generate insights and recommendations.
+
+        Responses are served from the result cache when the same samples were
+        analyzed with the same options before, unless they are new to the
+        user's trend rollups, which every session is added to once. Signal
+        stages run on ``executor`` when given; the cache is used here either
+        way.
+        """
+        lookup = self.lookup(request)
+        if lookup.response is not None:
+            return lookup.response
+        if executor is None:
+            analyzed = self.analyze_signal(request, lookup)
+        else:
+            analyzed, stages = executor.submit(
+                self.analyze_signal_timed, request, lookup
+            ).result()
+            record_stages(stages)
+        if isinstance(analyzed, AnalysisResponse):
+            return analyzed
+        return self.respond([analyzed])[0]
+
+    def lookup(self, request: AnalysisRequest) -> CacheLookup:
+        """Look up a request in the result cache.
+
+        Returns the cached response when there is one, otherwise the sample
+        digest and cache key for ``analyze_signal``.
+        """
+        data = request.acceleration_data
+        registry.observe(SAMPLE_COUNT, data.sample_count)
+        if self.cache is None and (self.aggregates is None or data.id):
+            return CacheLookup()
+        digest = arrays_digest(data.to_arrays(), data.sampling_rate_hz)
+        if self.cache is None:
+            return CacheLookup(digest=digest)
+
+        # Sessions are recorded once per user, by id or else by content
+        session_key = data.id or digest
+        with time_stage("cache_lookup"):
+            cache_key = analysis_cache_key(request, None, digest)
+            cached = self.cache.get(cache_key)
+        # The cache is shared between users: a session new to this user
+        # is analyzed again so that it reaches their trends
+        if cached is not None and (
+            self.aggregates is None
+            or self.aggregates.has_session(request.user_id, session_key)
+        ):
+            cached = cached.copy(
+                update={
+                    "insights": with_new_ids(cached.insights),
+                    "recommendations": with_new_ids(cached.recommendations),
+                }
+            )
+            return CacheLookup(cached, digest, cache_key)
+        return CacheLookup(None, digest, cache_key)
+
+    def analyze_signal(
+        self, request: AnalysisRequest, lookup: Optional[CacheLookup] = None
+    ) -> Union[AnalysisResponse, AnalyzedSession]:
+        """Run the signal stages of an analysis.
+
+        Returns the cached response when there is one, otherwise the metrics
+        and patterns for ``respond``. A ``lookup`` made by the caller, e.g. in
+        the server process while this runs in a worker process, is used
+        instead of looking the request up again.
+        """
+        if lookup is None:
+            lookup = self.lookup(request)
+        if lookup.response is not None:
+            return lookup.response
+        data = request.acceleration_data
+        arrays = data.to_arrays()
+        session_key = data.id or lookup.digest
+
+        # Sort out-of-order samples and drop repeated timestamps
+        with time_stage("timestamps"):
+            ordered = order_samples(arrays)
+        del arrays
+
+        block_samples = self.block_samples(data.sample_count)
+        if block_samples:
+            metrics, patterns = self._analyze_blocks(
+                request, ordered, block_samples, session_key
+            )
+        else:
+            metrics, patterns = self._analyze_frame(request, ordered, session_key)
+
+        return AnalyzedSession(
+            metrics,
+            patterns,
+            include_insights=request.include_insights,
+            include_recommendations=request.include_recommendations,
+            include_patterns=request.include_patterns,
+            cache_key=lookup.cache_key,
+        )
+
+    def _analyze_frame(
+        self,
+        request: AnalysisRequest,
+        ordered: OrderedSamples,
+        session_key: Optional[str],
+    ) -> Tuple[ActivityMetrics, ActivityPatterns]:
+        """Metrics and patterns from one signal frame of the whole recording."""
+        data = request.acceleration_data
+        # Build the shared signal frame once for all stages
+        with time_stage("signal_frame"):
+            frame = ordered_frame(ordered, data.sampling_rate_hz)
+
+        if self.resample_rate_hz:
+            with time_stage("resample"):
+                frame = decimate_frame(frame, self.resample_rate_hz)
 
         # Calculate metrics
-        metrics = calculate_activity_metrics(request.acceleration_data)
+        with time_stage("metrics"):
+            metrics = calculate_activity_metrics(data, frame, self.epoch_seconds)
+
+        if self.classifier is not None:
+            metrics = with_level_minutes(
+                metrics,
+                self.classifier.level_minutes(frame.magnitude, frame.sampling_rate_hz),
+            )
 
         # Detect patterns
-        patterns = detect_activity_patterns(request.acceleration_data)
+        with time_stage("patterns"):
+            patterns = detect_activity_patterns(data, frame)
+
+        if self.aggregates is not None and session_key is not None:
+            with time_stage("aggregates"):
+                self.aggregates.record_session(
+                    request.user_id, session_key, frame, patterns
+                )
+        return metrics, patterns
+
+    def _analyze_blocks(
+        self,
+        request: AnalysisRequest,
+        ordered: OrderedSamples,
+        block_samples: int,
+        session_key: Optional[str],
+    ) -> Tuple[ActivityMetrics, ActivityPatterns]:
+        """Metrics and patterns computed block by block in bounded memory."""
+        data = request.acceleration_data
+        accumulator: Optional[ActivityAccumulator] = None
+        levels: Optional[LevelAccumulator] = None
+        rollups: List[Rollup] = []
+
+        with time_stage("blocks"):
+            for frame in iter_frame_blocks(
+                ordered.arrays,
+                data.sampling_rate_hz,
+                block_samples,
+                self.resample_rate_hz,
+            ):
+                if accumulator is None:
+                    frame.reordered_samples = int(ordered.reordered_samples.sum())
+                    frame.duplicate_samples = int(ordered.duplicate_samples.sum())
+                    accumulator = ActivityAccumulator(
+                        frame.sampling_rate_hz, self.epoch_seconds
+                    )
+                    if self.classifier is not None:
+                        levels = LevelAccumulator(
+                            self.classifier, frame.sampling_rate_hz
+                        )
+                active = accumulator.update(frame)
+                if levels is not None:
+                    levels.update(frame.magnitude)
+                # Inactivity periods may span blocks, they are added at the end
+                if self.aggregates is not None:
+                    rollups.append(rollup_session(frame, active, []))
+                del frame, active
+
+        if accumulator is None:
+            raise ValueError("no samples to analyze")
+        metrics, patterns = accumulator.metrics(), accumulator.patterns()
+        if levels is not None:
+            metrics = with_level_minutes(metrics, levels.minutes())
+        if self.aggregates is not None and session_key is not None:
+            with time_stage("aggregates"):
+                self.aggregates.record_rollup(
+                    request.user_id,
+                    session_key,
+                    combine_blocks(rollups, patterns.inactivity_periods),
+                )
+        return metrics, patterns
+
+    def analyze_signal_timed(
+        self,
+        request: AnalysisRequest,
+        lookup: Optional[CacheLookup] = None,
+        safely: bool = False,
+    ) -> Tuple[Union[AnalysisResponse, AnalyzedSession], StageTimings]:
+        """Run the signal stages and return them with the stage timings.
+
+        ``safely`` turns failures into error responses. Worker processes hand
+        the timings back so the caller can ``record_stages`` them.
+        """
+        analyze = self.analyze_signal_safely if safely else self.analyze_signal
+        return collect_stages(analyze, request, lookup)
+
+    def respond(self, sessions: List[AnalyzedSession]) -> List[AnalysisResponse]:
+        """Build the responses of analyzed sessions and store them in the cache."""
+        responses = build_responses(sessions)
+        for session, response in zip(sessions, responses):
+            if self.cache is not None and session.cache_key is not None:
+                self.cache.set(session.cache_key, response)
+        return responses
+
+    def analyze_safely(self, request: AnalysisRequest) -> AnalysisResponse:
+        """Analyze a request, turning failures into an error response."""
+        try:
+            return self.analyze(request)
+        except Exception as e:
+            return error_response(e)
+
+    def analyze_signal_safely(
+        self, request: AnalysisRequest, lookup: Optional[CacheLookup] = None
+    ) -> Union[AnalysisResponse, AnalyzedSession]:
+        """Run the signal stages, turning failures into an error response."""
+        try:
+            return self.analyze_signal(request, lookup)
+        except Exception as e:
+            return error_response(e)
 
-        # Initialize response
-        response = AnalysisResponse(status="success", metrics=metrics)
+    def lookup_safely(self, request: AnalysisRequest) -> CacheLookup:
+        """Look a request up, turning failures into an error response."""
+        try:
+            return self.lookup(request)
+        except Exception as e:
+            return CacheLookup(error_response(e))
 
-        # Generate insights if requested
-        if request.include_insights:
-            response.insights = generate_insights(metrics, patterns)
+    def analyze_batch(
+        self, requests: List[AnalysisRequest], executor: Optional[Executor] = None
+    ) -> List[AnalysisResponse]:
+        """Analyze many requests, in order, reporting failures per item.
 
-        # Generate recommendations if requested
-        if request.include_recommendations:
-            response.recommendations = generate_recommendations(metrics, patterns)
+        Signal stages run on ``executor`` when given, otherwise sequentially;
+        the rule tables are then evaluated for the whole batch at once.
+        """
+        if executor is None:
+            analyzed = [self.analyze_signal_safely(request) for request in requests]
+        else:
+            # Only requests missing from the cache go to the workers
+            lookups = [self.lookup_safely(request) for request in requests]
+            misses = [i for i, lookup in enumerate(lookups) if lookup.response is None]
+            # Larger chunks amortize inter-process overhead for short sessions
+            chunksize = max(1, len(misses) // (4 * (os.cpu_count() or 1)))
+            results = executor.map(
+                self.analyze_signal_timed,
+                [requests[i] for i in misses],
+                [lookups[i] for i in misses],
+                repeat(True),
+                chunksize=chunksize,
+            )
+            signals = []
+            for result, stages in results:
+                record_stages(stages)
+                signals.append(result)
+            remaining = iter(signals)
+            analyzed = [
+                next(remaining) if lookup.response is None else lookup.response
+                for lookup in lookups
+            ]
 
-        return response
+        pending = [item for item in analyzed if isinstance(item, AnalyzedSession)]
+        responses = iter(self.respond(pending))
+        return [
+            next(responses) if isinstance(item, AnalyzedSession) else item
+            for item in analyzed
+        ]
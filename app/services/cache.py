@@ -0,0 +1,206 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.models.acceleration import SampleArrays
+from app.models.analysis import AnalysisRequest, AnalysisResponse
+from app.utils.signal import SignalFrame
+
+CACHE_BACKENDS = ("none", "memory", "disk")
+
+
+def arrays_digest(arrays: SampleArrays, sampling_rate_hz: float) -> str:
+    """Content hash of sample columns and their sampling rate."""
+    digest = hashlib.blake2b(digest_size=20)
+    for column in arrays:
+        # Hash the column buffers in place rather than copying them to bytes
+        digest.update(np.ascontiguousarray(column).view(np.uint8).data)
+    digest.update(repr(sampling_rate_hz).encode())
+    return digest.hexdigest()
+
+
+def samples_digest(frame: SignalFrame) -> str:
+    """Content hash of the samples and sampling rate of a signal frame."""
+    arrays = SampleArrays(frame.timestamps, frame.x, frame.y, frame.z)
+    return arrays_digest(arrays, frame.sampling_rate_hz)
+
+
+def analysis_cache_key(
+    request: AnalysisRequest,
+    frame: Optional[SignalFrame],
+    digest: Optional[str] = None,
+) -> str:
+    """Content hash of the samples and every option that affects the response.
+
+    A precomputed ``samples_digest`` of the frame can be passed instead of it.
+    """
+    if digest is None:
+        if frame is None:
+            raise ValueError("a frame or its digest is required")
+        digest = samples_digest(frame)
+    options = (
+        digest,
+        request.include_insights,
+        request.include_recommendations,
+        request.include_patterns,
+    )
+    return hashlib.blake2b(repr(options).encode(), digest_size=20).hexdigest()
+
+
+class ResultCache:
+    """Base class for analysis result caches with hit/miss counters.
+
+    Caches are picklable so services can be sent to process pools; the
+    in-memory contents and lock are not carried over.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[AnalysisResponse]:
+        with self._lock:
+            response = self._get(key)
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return response
+
+    def set(self, key: str, response: AnalysisResponse) -> None:
+        with self._lock:
+            self._set(key, response)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def _get(self, key: str) -> Optional[AnalysisResponse]:
+        raise NotImplementedError
+
+    def _set(self, key: str, response: AnalysisResponse) -> None:
+        raise NotImplementedError
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"max_entries": self.max_entries, "ttl_seconds": self.ttl_seconds}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)  # type: ignore[misc]
+
+
+class MemoryResultCache(ResultCache):
+    """LRU cache in process memory with size and TTL eviction."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0) -> None:
+        super().__init__(max_entries, ttl_seconds)
+        self._entries: "OrderedDict[str, Tuple[float, AnalysisResponse]]" = (
+            OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, key: str) -> Optional[AnalysisResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def _set(self, key: str, response: AnalysisResponse) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class DiskResultCache(ResultCache):
+    """Cache in a SQLite file, shared by every process that opens the same path."""
+
+    def __init__(
+        self,
+        path: str = "result_cache.sqlite3",
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600.0,
+    ) -> None:
+        super().__init__(max_entries, ttl_seconds)
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def __len__(self) -> int:
+        return int(
+            self._connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connect lazily so the cache can be created before workers fork
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, expires_at REAL NOT NULL, response TEXT NOT NULL)"
+            )
+        return self._connection
+
+    def _get(self, key: str) -> Optional[AnalysisResponse]:
+        row = (
+            self._connect()
+            .execute(
+                "SELECT response FROM results WHERE key = ? AND expires_at >= ?",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+        return AnalysisResponse.parse_raw(row[0]) if row else None
+
+    def _set(self, key: str, response: AnalysisResponse) -> None:
+        connection = self._connect()
+        now = time.time()
+        connection.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+            (key, now + self.ttl_seconds, response.json()),
+        )
+        connection.execute("DELETE FROM results WHERE expires_at < ?", (now,))
+        connection.execute(
+            "DELETE FROM results WHERE key NOT IN "
+            "(SELECT key FROM results ORDER BY expires_at DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {**super().__getstate__(), "path": self.path}
+
+
+def create_result_cache(
+    backend: str = "memory",
+    max_entries: int = 1024,
+    ttl_seconds: float = 3600.0,
+    path: str = "result_cache.sqlite3",
+) -> Optional[ResultCache]:
+    """Create the configured cache backend, or None when caching is disabled."""
+    if backend not in CACHE_BACKENDS:
+        raise ValueError(
+            f"Unknown cache backend {backend!r}, expected one of {CACHE_BACKENDS}"
+        )
+
+    if backend == "memory":
+        return MemoryResultCache(max_entries, ttl_seconds)
+    if backend == "disk":
+        return DiskResultCache(path, max_entries, ttl_seconds)
+    return None
@@ -0,0 +1,240 @@
+"""Activity level classification of magnitude windows.
+
+A scikit-learn model labels every feature window (see ``app.utils.features``)
+as sedentary, light, moderate or vigorous activity, and the labels are added
+up into minutes per level in ``ActivityMetrics``. A small model trained on
+synthetic gait is bundled so this works offline; retrain it with
+``python -m app.services.classifier``.
+"""
+import argparse
+import functools
+import os
+import threading
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from app.core.instrumentation import time_stage
+from app.models.acceleration import ActivityMetrics
+from app.utils.features import (
+    feature_window_samples,
+    split_windows,
+    window_features,
+    window_view,
+)
+from app.utils.signal import effective_rate_hz
+
+ACTIVITY_LEVELS = ("sedentary", "light", "moderate", "vigorous")
+LEVEL_FIELDS = tuple(f"{level}_minutes" for level in ACTIVITY_LEVELS)
+
+DEFAULT_MODEL_PATH = os.path.join(
+    os.path.dirname(__file__), "trained", "activity_classifier.joblib"
+)
+
+
+class ActivityClassifier:
+    """A fitted model predicting ``ACTIVITY_LEVELS`` indices from features.
+
+    Without a ``model`` the file at ``path`` is loaded on first use, which
+    keeps joblib and scikit-learn out of startup. Pickles by model path, so
+    process pool workers load it once each instead of receiving the model
+    with every task.
+    """
+
+    def __init__(self, model: Any = None, path: str = DEFAULT_MODEL_PATH) -> None:
+        self._model = model
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __reduce__(self) -> tuple:
+        return load_activity_classifier, (self.path,)
+
+    @property
+    def model(self) -> Any:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = _load_model(self.path)
+        return self._model
+
+    def warm_up(self) -> None:
+        """Load the model now rather than on the first prediction."""
+        self.model
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Activity level index of every feature row."""
+        if len(features) == 0:
+            return np.empty(0, dtype=np.intp)
+        with time_stage("classification"):
+            labels: np.ndarray = self.model.predict(features)
+        return labels
+
+    def level_counts(
+        self, magnitude: np.ndarray, sampling_rate_hz: float
+    ) -> np.ndarray:
+        """Windows per activity level in a magnitude signal."""
+        rate = effective_rate_hz(sampling_rate_hz)
+        windows = window_view(magnitude, feature_window_samples(rate))
+        with time_stage("features"):
+            features = window_features(windows, rate)
+        return _count_levels(self.predict(features))
+
+    def level_minutes(
+        self, magnitude: np.ndarray, sampling_rate_hz: float
+    ) -> Dict[str, float]:
+        """Minutes per activity level in a magnitude signal."""
+        rate = effective_rate_hz(sampling_rate_hz)
+        return level_minutes(self.level_counts(magnitude, rate), rate)
+
+    def level_minutes_many(
+        self, magnitudes: Sequence[np.ndarray], sampling_rates_hz: Sequence[float]
+    ) -> List[Dict[str, float]]:
+        """Minutes per activity level of many signals, with one model call."""
+        rates = [effective_rate_hz(rate) for rate in sampling_rates_hz]
+        with time_stage("features"):
+            features = [
+                window_features(
+                    window_view(magnitude, feature_window_samples(rate)), rate
+                )
+                for magnitude, rate in zip(magnitudes, rates)
+            ]
+        counts = [len(rows) for rows in features]
+        labels = self.predict(
+            np.concatenate(features) if features else np.empty((0, 0))
+        )
+        bounds = np.insert(np.cumsum(counts), 0, 0).tolist()
+        return [
+            level_minutes(_count_levels(labels[start:end]), rate)
+            for start, end, rate in zip(bounds[:-1], bounds[1:], rates)
+        ]
+
+
+class LevelAccumulator:
+    """Minutes per activity level of a recording fed in chunks.
+
+    Samples of an unfinished window are carried to the next chunk, so the
+    result matches classifying the whole recording.
+    """
+
+    def __init__(self, classifier: ActivityClassifier, sampling_rate_hz: float):
+        self.classifier = classifier
+        self.sampling_rate_hz = effective_rate_hz(sampling_rate_hz)
+        self._window = feature_window_samples(self.sampling_rate_hz)
+        self._carry = np.empty(0)
+        self._counts = np.zeros(len(ACTIVITY_LEVELS), dtype=np.int64)
+
+    def update(self, magnitude: np.ndarray) -> None:
+        windows, self._carry = split_windows(magnitude, self._window, self._carry)
+        with time_stage("features"):
+            features = window_features(windows, self.sampling_rate_hz)
+        self._counts += _count_levels(self.classifier.predict(features))
+
+    def minutes(self) -> Dict[str, float]:
+        return level_minutes(self._counts, self.sampling_rate_hz)
+
+
+def _count_levels(labels: np.ndarray) -> np.ndarray:
+    return np.bincount(
+        np.asarray(labels, dtype=np.intp), minlength=len(ACTIVITY_LEVELS)
+    )
+
+
+def level_minutes(counts: np.ndarray, sampling_rate_hz: float) -> Dict[str, float]:
+    """``ActivityMetrics`` level fields from window counts per level.
+
+    ``sampling_rate_hz`` must be positive (see ``effective_rate_hz``).
+    """
+    window_minutes = feature_window_samples(sampling_rate_hz) / sampling_rate_hz / 60
+    return {
+        field: float(count) * window_minutes
+        for field, count in zip(LEVEL_FIELDS, counts.tolist())
+    }
+
+
+def with_level_minutes(
+    metrics: ActivityMetrics, minutes: Dict[str, float]
+) -> ActivityMetrics:
+    return metrics.copy(update=minutes)
+
+
+def load_activity_classifier(path: str = DEFAULT_MODEL_PATH) -> ActivityClassifier:
+    """Classifier of a joblib model file, one per process and path.
+
+    The file is read on first use or ``warm_up``; a missing file fails here.
+    """
+    return _load_activity_classifier(os.path.abspath(path))
+
+
+@functools.lru_cache(maxsize=None)
+def _load_activity_classifier(path: str) -> ActivityClassifier:
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Activity model not found: {path}")
+    return ActivityClassifier(path=path)
+
+
+def _load_model(path: str) -> Any:
+    import joblib
+
+    with time_stage("model_load"):
+        return joblib.load(path)
+
+
+def synthetic_training_set(windows_per_level: int = 2000, seed: int = 0) -> tuple:
+    """Features and level labels of synthetic gait windows at several rates.
+
+    Each level draws a vertical amplitude (g) and cadence (Hz) range; the
+    bundled generator's walking and running fall in moderate and vigorous.
+    """
+    rng = np.random.default_rng(seed)
+    ranges = {
+        "sedentary": ((0.0, 0.04), (0.2, 3.0)),
+        "light": ((0.05, 0.2), (0.8, 1.8)),
+        "moderate": ((0.2, 0.55), (1.4, 2.3)),
+        "vigorous": ((0.55, 1.3), (2.3, 3.4)),
+    }
+    features, labels = [], []
+    for rate_hz in (10, 25, 50, 100):
+        window = feature_window_samples(rate_hz)
+        t = np.arange(window) / rate_hz
+        for label, level in enumerate(ACTIVITY_LEVELS):
+            (low_a, high_a), (low_f, high_f) = ranges[level]
+            count = windows_per_level // 4
+            amplitude = rng.uniform(low_a, high_a, size=(count, 1))
+            cadence = rng.uniform(low_f, high_f, size=(count, 1))
+            phase = 2 * np.pi * cadence * t + rng.uniform(0, 2 * np.pi, (count, 1))
+            noise = rng.uniform(0.005, 0.03, size=(count, 1))
+
+            x = 0.4 * amplitude * np.sin(phase / 2)
+            x += noise * rng.standard_normal((count, window))
+            z = 1.0 + amplitude * np.sin(phase)
+            z += noise * rng.standard_normal((count, window))
+            magnitude = np.sqrt(x * x + z * z)
+
+            features.append(window_features(magnitude, rate_hz))
+            labels.append(np.full(count, label))
+    return np.concatenate(features), np.concatenate(labels)
+
+
+def train_activity_classifier(seed: int = 0) -> Any:
+    """Fit the small random forest that is bundled with the service."""
+    from sklearn.ensemble import RandomForestClassifier
+
+    features, labels = synthetic_training_set(seed=seed)
+    model = RandomForestClassifier(n_estimators=20, max_depth=6, random_state=seed)
+    return model.fit(features, labels)
+
+
+def main() -> None:
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Train the bundled activity model")
+    parser.add_argument("--output", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    joblib.dump(train_activity_classifier(args.seed), args.output, compress=3)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,166 +1,233 @@
-from typing import List
+import json
+import operator
+import os
+import string
+from typing import Any, Dict, Generic, List, Sequence, Type, TypeVar
 from uuid import uuid4
 
+import numpy as np
+from pydantic import ValidationError
+
+from app.core.config import settings
 from app.models.acceleration import ActivityMetrics, ActivityPatterns
 from app.models.analysis import Insight, Recommendation
 
-
-def generate_insights(
-    metrics: ActivityMetrics, patterns: ActivityPatterns
-) -> List[Insight]:
-    """Generate insights based on activity metrics and patterns."""
-    insights = []
-
-    # Activity level insights
-    if metrics.avg_intensity < 0.2:
-        insights.append(
-            Insight(
-                insight_type="activity_level",
-                message="Your activity level has been quite low during this session. Adding more movement to your day can boost your energy levels.",
-                priority="medium",
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), "rules", "insights.json")
+
+# Values rules can test, in feature matrix column order
+FEATURES = (
+    "avg_intensity",
+    "peak_intensity",
+    "movement_consistency",
+    "active_minutes",
+    "total_duration",
+    "inactivity_count",
+)
+# Features formatted as whole numbers in messages
+INTEGER_FEATURES = frozenset({"inactivity_count"})
+
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+PRIORITIES = ("high", "medium", "low")
+
+AdviceT = TypeVar("AdviceT", Insight, Recommendation)
+
+
+def feature_matrix(
+    metrics: Sequence[ActivityMetrics], patterns: Sequence[ActivityPatterns]
+) -> np.ndarray:
+    """One row of rule features per analyzed session."""
+    return np.array(
+        [
+            [getattr(m, name) for name in FEATURES[:-1]] + [len(p.inactivity_periods)]
+            for m, p in zip(metrics, patterns)
+        ],
+        dtype=np.float64,
+    ).reshape(-1, len(FEATURES))
+
+
+def _has_placeholders(template: str) -> bool:
+    return any(field for _, field, _, _ in string.Formatter().parse(template))
+
+
+class RuleTable(Generic[AdviceT]):
+    """A declarative rule table compiled into a vectorized evaluator.
+
+    Each rule has an ``id``, a ``type``, a ``priority``, a ``message`` template
+    (and a ``title`` for recommendations) and ``when``, a list of
+    ``[feature, operator, threshold]`` conditions that must all hold. Rules of
+    the same ``group`` (the type by default) are exclusive: only the first
+    matching one, in table order, applies. Messages may reference features,
+    e.g. ``{inactivity_count}``.
+
+    Rule fields are validated against the response model when the table is
+    compiled; every response object gets a new ``id`` and the ``rule_id`` of
+    its rule.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]], model: Type[AdviceT]) -> None:
+        self.rules = rules
+        self.model: Type[AdviceT] = model
+        self._type_field = "insight_type" if model is Insight else "recommendation_type"
+        self._fields = [self._check_fields(rule) for rule in rules]
+
+        conditions = [
+            (index,) + self._check_condition(rule, condition)
+            for index, rule in enumerate(rules)
+            for condition in self._check_rule(rule)
+        ]
+        # Conditions are evaluated column-wise, then counted per rule
+        self._feature_index = np.array([c[1] for c in conditions], dtype=np.intp)
+        self._operators = [c[2] for c in conditions]
+        self._thresholds = np.array([c[3] for c in conditions], dtype=np.float64)
+        self._membership = np.zeros((len(conditions), len(rules)), dtype=np.int64)
+        self._membership[np.arange(len(conditions)), [c[0] for c in conditions]] = 1
+        self._required = self._membership.sum(axis=0)
+
+        groups: Dict[str, List[int]] = {}
+        for index, rule in enumerate(rules):
+            groups.setdefault(rule.get("group", rule["type"]), []).append(index)
+        self._groups = [np.array(indices) for indices in groups.values()]
+
+        # Messages without placeholders are used as is
+        self._templates = [
+            None if _has_placeholders(rule["message"]) else rule["message"]
+            for rule in rules
+        ]
+
+    def _check_rule(self, rule: Dict[str, Any]) -> List[Any]:
+        required = ["id", "type", "priority", "message", "when"]
+        if self.model is Recommendation:
+            required.append("title")
+        missing = [key for key in required if key not in rule]
+        if missing:
+            raise ValueError(f"Rule {rule.get('id')!r} is missing {missing}")
+        return list(rule["when"])
+
+    def _check_fields(self, rule: Dict[str, Any]) -> Dict[str, Any]:
+        self._check_rule(rule)
+        fields = {
+            "rule_id": rule["id"],
+            self._type_field: rule["type"],
+            "message": rule["message"],
+            "priority": rule["priority"],
+        }
+        if self.model is Recommendation:
+            fields["title"] = rule["title"]
+        try:
+            advice = self.model(**fields)
+        except ValidationError as e:
+            raise ValueError(f"Rule {rule['id']!r} has invalid fields: {e}")
+        if advice.priority not in PRIORITIES:
+            raise ValueError(
+                f"Rule {rule['id']!r} has priority {advice.priority!r}, "
+                f"expected one of {PRIORITIES}"
             )
-        )
-    elif metrics.avg_intensity > 0.7:
-        insights.append(
-            Insight(
-                insight_type="activity_level",
-                message="Great job! You had high activity levels during this session.",
-                priority="high",
-            )
-        )
-    elif metrics.avg_intensity > 0.3:
-        insights.append(
-            Insight(
-                insight_type="activity_level",
-                message="You had a good level of activity during this session.",
-                priority="medium",
-            )
-        )
-    else:
-        # Add a default insight for any activity level not covered above
-        insights.append(
-            Insight(
-                insight_type="activity_level",
-                message="I've analyzed your movement patterns. Consider adding more varied movements to your routine.",
-                priority="low",
+        return advice.dict(exclude={"id"})
+
+    @staticmethod
+    def _check_condition(rule: Dict[str, Any], condition: Sequence[Any]) -> tuple:
+        try:
+            feature, op, threshold = condition
+            return FEATURES.index(feature), OPERATORS[op], float(threshold)
+        except (TypeError, ValueError, KeyError):
+            raise ValueError(
+                f"Rule {rule['id']!r} has an invalid condition {condition!r}, "
+                f"expected [feature, operator, number] with a feature in {FEATURES} "
+                f"and an operator in {tuple(OPERATORS)}"
             )
-        )
 
-    # Inactivity insights
-    if patterns.inactivity_periods:
-        insights.append(
-            Insight(
-                insight_type="inactivity",
-                message=f"I noticed {len(patterns.inactivity_periods)} periods of inactivity. Taking movement breaks can help maintain your energy and focus.",
-                priority="high" if len(patterns.inactivity_periods) > 3 else "medium",
-            )
-        )
+    def evaluate_many(self, features: np.ndarray) -> np.ndarray:
+        """Which rules apply to each row of a feature matrix, in one pass.
 
-    # Movement consistency insights
-    if metrics.movement_consistency > 0.7 and metrics.total_duration > 5.0:
-        insights.append(
-            Insight(
-                insight_type="consistency",
-                message="Your movement was very consistent during this session. This is great for maintaining steady energy.",
-                priority="medium",
-            )
+        Returns a boolean matrix with one row per session and one column per rule.
+        """
+        values = features[:, self._feature_index]
+        satisfied = np.empty(values.shape, dtype=bool)
+        for column, (compare, threshold) in enumerate(
+            zip(self._operators, self._thresholds)
+        ):
+            satisfied[:, column] = compare(values[:, column], threshold)
+
+        matched: np.ndarray = (
+            satisfied.astype(np.int64) @ self._membership == self._required
         )
-    elif metrics.movement_consistency < 0.3 and metrics.total_duration > 5.0:
-        insights.append(
-            Insight(
-                insight_type="consistency",
-                message="Your movement patterns showed high variability. This could indicate sporadic activity.",
-                priority="low",
-            )
+
+        # Keep only the first match of each exclusive group
+        for group in self._groups:
+            group_matched = matched[:, group]
+            first = group_matched & (np.cumsum(group_matched, axis=1) == 1)
+            matched[:, group] = first
+        return matched
+
+    def build(self, matched: np.ndarray, features: np.ndarray) -> List[AdviceT]:
+        """Response objects for one session's matched rules."""
+        advice = []
+        for index in np.flatnonzero(matched).tolist():
+            fields = dict(self._fields[index], id=str(uuid4()))
+            if self._templates[index] is None:
+                fields["message"] = fields["message"].format(
+                    **self._feature_values(features)
+                )
+            # Fields were validated when the table was compiled
+            advice.append(self.model.construct(**fields))
+        return advice
+
+    @staticmethod
+    def _feature_values(features: np.ndarray) -> Dict[str, Any]:
+        return {
+            name: int(value) if name in INTEGER_FEATURES else value
+            for name, value in zip(FEATURES, features.tolist())
+        }
+
+    def generate_many(self, features: np.ndarray) -> List[List[AdviceT]]:
+        """Response objects for every row of a feature matrix."""
+        matched = self.evaluate_many(features)
+        return [self.build(row, values) for row, values in zip(matched, features)]
+
+
+def with_new_ids(advice: Sequence[AdviceT]) -> List[AdviceT]:
+    """Copies of response objects with new ids, e.g. for a cached response."""
+    return [item.copy(update={"id": str(uuid4())}) for item in advice]
+
+
+class RuleEngine:
+    """Compiled insight and recommendation rule tables."""
+
+    def __init__(self, config: Dict[str, List[Dict[str, Any]]]) -> None:
+        self.insights = RuleTable(config.get("insights", []), Insight)
+        self.recommendations = RuleTable(
+            config.get("recommendations", []), Recommendation
         )
 
-    # Add IDs to insights
-    for insight in insights:
-        insight.id = str(uuid4())
+    @classmethod
+    def from_file(cls, path: str) -> "RuleEngine":
+        with open(path, encoding="utf-8") as file:
+            return cls(json.load(file))
+
+
+# Compiled once at import; set INSIGHT_RULES_PATH to use another rule file
+rule_engine = RuleEngine.from_file(settings.INSIGHT_RULES_PATH or DEFAULT_RULES_PATH)
 
-    return insights
+
+def generate_insights(
+    metrics: ActivityMetrics, patterns: ActivityPatterns
+) -> List[Insight]:
+    """Generate insights based on activity metrics and patterns."""
+    features = feature_matrix([metrics], [patterns])
+    return rule_engine.insights.generate_many(features)[0]
 
 
 def generate_recommendations(
     metrics: ActivityMetrics, patterns: ActivityPatterns
 ) -> List[Recommendation]:
     """Generate recommendations based on activity metrics and patterns."""
-    recommendations = []
-
-    # Activity level recommendations
-    if metrics.avg_intensity < 0.2:
-        recommendations.append(
-            Recommendation(
-                recommendation_type="activity_level",
-                title="Increase Your Movement",
-                message="Try to incorporate more movement throughout your day. Even small actions like standing up and stretching can make a difference.",
-                priority="high",
-            )
-        )
-    elif metrics.avg_intensity > 0.7:
-        recommendations.append(
-            Recommendation(
-                recommendation_type="activity_level",
-                title="Great Activity Level",
-                message="You're maintaining a good activity level. Keep up the great work!",
-                priority="low",
-            )
-        )
-    else:
-        # Add a default recommendation if no activity level triggers
-        recommendations.append(
-            Recommendation(
-                recommendation_type="activity_level",
-                title="Optimize Your Movement Patterns",
-                message="Consider adding variety to your movement patterns for better overall health.",
-                priority="medium",
-            )
-        )
-
-    # Inactivity recommendations
-    if patterns.inactivity_periods:
-        recommendations.append(
-            Recommendation(
-                recommendation_type="inactivity",
-                title="Break Up Sitting Periods",
-                message="I noticed periods of inactivity. Try setting a timer to remind you to move every 30 minutes.",
-                priority="high",
-            )
-        )
-
-    # Consistency recommendations
-    if metrics.movement_consistency < 0.3 and metrics.total_duration > 5.0:
-        recommendations.append(
-            Recommendation(
-                recommendation_type="consistency",
-                title="Find Steady Rhythms",
-                message="Your movement patterns show high variability. Finding more consistent, rhythmic movements might help you maintain energy throughout the day.",
-                priority="medium",
-            )
-        )
-
-    # Daily activity goals
-    if metrics.active_minutes < 5.0 and metrics.total_duration > 10.0:
-        recommendations.append(
-            Recommendation(
-                recommendation_type="daily_goal",
-                title="Set a Small Movement Goal",
-                message="Try to include at least 10 minutes of active movement in your next session.",
-                priority="medium",
-            )
-        )
-    elif metrics.active_minutes > 20.0:
-        recommendations.append(
-            Recommendation(
-                recommendation_type="daily_goal",
-                title="You're Meeting Activity Goals",
-                message="You've reached over 20 minutes of active movement. Keep maintaining this healthy pattern!",
-                priority="low",
-            )
-        )
-
-    # Add IDs to recommendations
-    for recommendation in recommendations:
-        recommendation.id = str(uuid4())
-
-    return recommendations
+    features = feature_matrix([metrics], [patterns])
+    return rule_engine.recommendations.generate_many(features)[0]
@@ -0,0 +1,393 @@
+import ipaddress
+import logging
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+from uuid import uuid4
+
+from app.core.executors import BoundedExecutor, ExecutorSaturatedError
+from app.models.acceleration import sample_dtype
+from app.models.analysis import AnalysisRequest
+from app.models.jobs import (
+    JOB_FAILED,
+    JOB_FINISHED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    AnalysisJob,
+)
+from app.services.analysis import AnalysisService
+from app.utils.binary import decode_analysis_request, encode_analysis_request
+
+logger = logging.getLogger(__name__)
+
+JOB_STORE_BACKENDS = ("memory", "sqlite")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class CallbackURLError(ValueError):
+    """Raised when results must not be sent to a callback URL."""
+
+
+def check_callback_url(url: str, allowed_hosts: Sequence[str] = ()) -> None:
+    """Refuse callback URLs that could reach internal services.
+
+    With ``allowed_hosts`` only those hosts are accepted. Otherwise the host
+    must resolve to public addresses only, not to private, loopback,
+    link-local or reserved ones.
+    """
+    parts = urlsplit(url)
+    host = parts.hostname
+    if parts.scheme not in ("http", "https") or not host:
+        raise CallbackURLError(f"Callback URL {url!r} is not an http(s) URL")
+    if allowed_hosts:
+        if host.lower() not in {allowed.lower() for allowed in allowed_hosts}:
+            raise CallbackURLError(f"Callback host {host!r} is not allowed")
+        return
+
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parts.port)}
+    except (socket.gaierror, UnicodeError):
+        raise CallbackURLError(f"Callback host {host!r} cannot be resolved")
+    for value in addresses:
+        address = ipaddress.ip_address(value.split("%")[0])
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise CallbackURLError(
+                f"Callback host {host!r} resolves to non-public address {address}"
+            )
+
+
+class JobStore:
+    """Base class for job state backends.
+
+    The request of a job is kept until it finishes, so unfinished jobs can be
+    resumed; finished jobs expire ``ttl_seconds`` after their last update.
+    """
+
+    def __init__(self, ttl_seconds: float = 86400.0) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+    def add(self, job: AnalysisJob, request: AnalysisRequest) -> None:
+        with self._lock:
+            self._expire()
+            self._add(job, request)
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        with self._lock:
+            return self._get(job_id)
+
+    def save(self, job: AnalysisJob) -> None:
+        """Store a job's new state, dropping its request once it finished."""
+        with self._lock:
+            self._save(job)
+
+    def unfinished(self) -> List[Tuple[AnalysisJob, AnalysisRequest]]:
+        """Queued and running jobs with their requests, oldest first."""
+        with self._lock:
+            return self._unfinished()
+
+    def _add(self, job: AnalysisJob, request: AnalysisRequest) -> None:
+        raise NotImplementedError
+
+    def _get(self, job_id: str) -> Optional[AnalysisJob]:
+        raise NotImplementedError
+
+    def _save(self, job: AnalysisJob) -> None:
+        raise NotImplementedError
+
+    def _unfinished(self) -> List[Tuple[AnalysisJob, AnalysisRequest]]:
+        raise NotImplementedError
+
+    def _expire(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryJobStore(JobStore):
+    """Jobs in process memory; they are lost on restart."""
+
+    def __init__(self, ttl_seconds: float = 86400.0) -> None:
+        super().__init__(ttl_seconds)
+        self._jobs: Dict[str, AnalysisJob] = {}
+        self._requests: Dict[str, AnalysisRequest] = {}
+
+    def _add(self, job: AnalysisJob, request: AnalysisRequest) -> None:
+        self._jobs[job.job_id] = job.copy()
+        self._requests[job.job_id] = request
+
+    def _get(self, job_id: str) -> Optional[AnalysisJob]:
+        job = self._jobs.get(job_id)
+        return job.copy() if job else None
+
+    def _save(self, job: AnalysisJob) -> None:
+        self._jobs[job.job_id] = job.copy()
+        if job.status in JOB_FINISHED:
+            self._requests.pop(job.job_id, None)
+
+    def _unfinished(self) -> List[Tuple[AnalysisJob, AnalysisRequest]]:
+        return [
+            (self._jobs[job_id].copy(), request)
+            for job_id, request in self._requests.items()
+        ]
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.status in JOB_FINISHED and job.updated_at.timestamp() < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+class SqliteJobStore(JobStore):
+    """Jobs in a SQLite file, so queued jobs and results survive restarts.
+
+    Pending requests are stored in the compact binary sample format.
+    """
+
+    def __init__(self, path: str = "jobs.sqlite3", ttl_seconds: float = 86400.0):
+        super().__init__(ttl_seconds)
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+                "updated_at REAL NOT NULL, job TEXT NOT NULL, request BLOB)"
+            )
+        return self._connection
+
+    def _add(self, job: AnalysisJob, request: AnalysisRequest) -> None:
+        # Lossless: samples are stored in at most the policy's precision
+        body = encode_analysis_request(
+            request, dtype=sample_dtype().name, compress=True
+        )
+        self._connect().execute(
+            "INSERT INTO jobs VALUES (?, ?, ?, ?, ?)",
+            (job.job_id, job.status, job.updated_at.timestamp(), job.json(), body),
+        )
+
+    def _get(self, job_id: str) -> Optional[AnalysisJob]:
+        row = (
+            self._connect()
+            .execute("SELECT job FROM jobs WHERE job_id = ?", (job_id,))
+            .fetchone()
+        )
+        return AnalysisJob.parse_raw(row[0]) if row else None
+
+    def _save(self, job: AnalysisJob) -> None:
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, updated_at = ?, job = ?, "
+            "request = CASE WHEN ? THEN NULL ELSE request END WHERE job_id = ?",
+            (
+                job.status,
+                job.updated_at.timestamp(),
+                job.json(),
+                job.status in JOB_FINISHED,
+                job.job_id,
+            ),
+        )
+
+    def _unfinished(self) -> List[Tuple[AnalysisJob, AnalysisRequest]]:
+        rows = (
+            self._connect()
+            .execute(
+                "SELECT job, request FROM jobs WHERE request IS NOT NULL "
+                "ORDER BY updated_at"
+            )
+            .fetchall()
+        )
+        return [
+            (AnalysisJob.parse_raw(job), decode_analysis_request(request))
+            for job, request in rows
+        ]
+
+    def _expire(self) -> None:
+        self._connect().execute(
+            "DELETE FROM jobs WHERE request IS NULL AND updated_at < ?",
+            (time.time() - self.ttl_seconds,),
+        )
+
+
+def create_job_store(
+    backend: str = "memory", path: str = "jobs.sqlite3", ttl_seconds: float = 86400.0
+) -> JobStore:
+    """Create the configured job store backend."""
+    if backend not in JOB_STORE_BACKENDS:
+        raise ValueError(
+            f"Unknown job store backend {backend!r}, "
+            f"expected one of {JOB_STORE_BACKENDS}"
+        )
+    if backend == "sqlite":
+        return SqliteJobStore(path, ttl_seconds)
+    return MemoryJobStore(ttl_seconds)
+
+
+class JobManager:
+    """Runs analysis jobs in the background on a small worker pool.
+
+    Job workers hand the analysis itself to ``analysis_executor`` when given,
+    so jobs share the pool, its worker limit and its kind with interactive
+    requests. Results are kept in the job store for polling and, when the job
+    has a callback URL, POSTed there as the job document (see
+    ``check_callback_url``). At most ``max_queue`` jobs wait for a worker;
+    beyond that ``ExecutorSaturatedError`` is raised.
+    """
+
+    def __init__(
+        self,
+        service: AnalysisService,
+        store: JobStore,
+        max_workers: int = 2,
+        max_queue: int = 256,
+        callback_timeout_seconds: float = 10.0,
+        callback_retries: int = 3,
+        analysis_executor: Optional[BoundedExecutor] = None,
+        callback_hosts: Sequence[str] = (),
+    ) -> None:
+        self.service = service
+        self.store = store
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.callback_timeout_seconds = callback_timeout_seconds
+        self.callback_retries = callback_retries
+        self.analysis_executor = analysis_executor
+        self.callback_hosts = tuple(callback_hosts)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="analysis-job"
+        )
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(
+        self, request: AnalysisRequest, callback_url: Optional[str] = None
+    ) -> AnalysisJob:
+        """Queue a request and return its job right away."""
+        if callback_url:
+            check_callback_url(callback_url, self.callback_hosts)
+        now = _now()
+        job = AnalysisJob(
+            job_id=str(uuid4()),
+            status=JOB_QUEUED,
+            created_at=now,
+            updated_at=now,
+            callback_url=callback_url,
+        )
+        with self._reserve():
+            self.store.add(job, request)
+            self._schedule(job.copy(), request)
+        return job
+
+    def resume(self) -> int:
+        """Requeue the jobs left unfinished by a previous run."""
+        unfinished = self.store.unfinished()
+        for job, request in unfinished:
+            with self._reserve(check=False):
+                self._schedule(job, request)
+        return len(unfinished)
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending": self._pending, "max_workers": self.max_workers}
+
+    def shutdown(self) -> None:
+        # Queued jobs stay in the store and are resumed by a persistent backend
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    @contextmanager
+    def _reserve(self, check: bool = True) -> Iterator[None]:
+        """Count a job as pending, refusing new ones when the queue is full."""
+        with self._lock:
+            if check and self._pending >= self.max_workers + self.max_queue:
+                raise ExecutorSaturatedError("Analysis job queue is full")
+            self._pending += 1
+        try:
+            yield
+        except BaseException:
+            # Scheduled jobs release their slot when they finish
+            with self._lock:
+                self._pending -= 1
+            raise
+
+    def _schedule(self, job: AnalysisJob, request: AnalysisRequest) -> None:
+        future = self.executor.submit(self._process, job, request)
+        future.add_done_callback(self._release)
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def _process(self, job: AnalysisJob, request: AnalysisRequest) -> None:
+        self._update(job, status=JOB_RUNNING)
+        try:
+            if self.analysis_executor is not None:
+                with self.analysis_executor.admit(check=False):
+                    result = self.service.analyze(
+                        request, self.analysis_executor.executor
+                    )
+            else:
+                result = self.service.analyze(request)
+        except Exception as e:
+            logger.exception("Analysis job %s failed", job.job_id)
+            self._update(job, status=JOB_FAILED, error=f"Error analyzing data: {e}")
+        else:
+            self._update(job, status=JOB_SUCCEEDED, result=result)
+
+        if job.callback_url:
+            delivered = self._deliver(job, job.callback_url)
+            self._update(job, callback_status="delivered" if delivered else "failed")
+
+    def _update(self, job: AnalysisJob, **fields: Any) -> None:
+        for name, value in fields.items():
+            setattr(job, name, value)
+        job.updated_at = _now()
+        self.store.save(job)
+
+    def _deliver(self, job: AnalysisJob, url: str) -> bool:
+        """POST the finished job to its callback URL, retrying with backoff."""
+        import httpx
+
+        # Checked again, as the host may resolve differently by now
+        try:
+            check_callback_url(url, self.callback_hosts)
+        except CallbackURLError as e:
+            logger.warning("Callback for job %s refused: %s", job.job_id, e)
+            return False
+
+        body = job.json()
+        headers = {"Content-Type": "application/json"}
+        for attempt in range(self.callback_retries):
+            if attempt:
+                time.sleep(2 ** (attempt - 1))
+            try:
+                response = httpx.post(
+                    url,
+                    content=body,
+                    headers=headers,
+                    timeout=self.callback_timeout_seconds,
+                )
+                if response.is_success:
+                    return True
+            except httpx.HTTPError:
+                pass
+            logger.warning(
+                "Callback for job %s failed (attempt %d)", job.job_id, attempt + 1
+            )
+        return False
@@ -0,0 +1,289 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Sequence
+from uuid import uuid4
+
+import numpy as np
+
+from app.models.acceleration import AccelerationChunk, ActivityMetrics, SampleArrays
+from app.models.analysis import AnalysisResponse
+from app.models.streaming import (
+    LiveAnalysisUpdate,
+    StreamingSessionRequest,
+    StreamingSessionStatus,
+)
+from app.services.aggregates import AggregateStore
+from app.services.analysis import build_response
+from app.services.classifier import (
+    ActivityClassifier,
+    LevelAccumulator,
+    with_level_minutes,
+)
+from app.utils.patterns import inactivity_periods_from_bounds
+from app.utils.rollups import RollupAccumulator
+from app.utils.signal import frame_from_arrays, order_samples, seconds_to_samples
+from app.utils.streaming import ActivityAccumulator, SampleRing
+
+
+class SessionNotFoundError(KeyError):
+    """Raised when a streaming session does not exist or has expired."""
+
+
+class SessionFullError(ValueError):
+    """Raised when a chunk would take a session past its sample limit."""
+
+
+class StreamingSession:
+    """A streaming analysis session holding only incremental state."""
+
+    def __init__(
+        self,
+        session_id: str,
+        request: StreamingSessionRequest,
+        classifier: Optional[ActivityClassifier] = None,
+        epoch_seconds: Sequence[float] = (),
+        record_rollups: bool = False,
+    ) -> None:
+        self.session_id = session_id
+        self.request = request
+        self.accumulator = ActivityAccumulator(request.sampling_rate_hz, epoch_seconds)
+        self.levels = (
+            LevelAccumulator(classifier, request.sampling_rate_hz)
+            if classifier is not None
+            else None
+        )
+        # Minute rollups for the user's trends, recorded when the session ends
+        self.rollups = RollupAccumulator() if record_rollups else None
+        self.samples_received = 0
+        # Timestamp of the last sample analyzed so far
+        self._last_ns: Optional[int] = None
+        self.last_seen = time.monotonic()
+        self.lock = threading.Lock()
+
+    def append(self, chunk: AccelerationChunk) -> SampleArrays:
+        """Feed the next chunk of samples into the accumulators.
+
+        Samples are ordered and repeats dropped as in batch analysis. Samples
+        at or before the end of an earlier chunk can no longer be sorted in,
+        so they are dropped and counted as repeated or reordered. Returns the
+        samples that were analyzed.
+        """
+        arrays = chunk.columns_to_arrays(
+            self.request.start_time,
+            self.request.sampling_rate_hz,
+            offset=self.samples_received,
+        )
+        self.samples_received += len(arrays.x)
+        ordered = order_samples(arrays)
+        arrays = ordered.arrays
+        reordered = int(ordered.reordered_samples.sum())
+        duplicates = int(ordered.duplicate_samples.sum())
+
+        if self._last_ns is not None:
+            late = int(np.searchsorted(arrays.timestamps, self._last_ns, "right"))
+            repeated = int(late and arrays.timestamps[late - 1] == self._last_ns)
+            duplicates += repeated
+            reordered += late - repeated
+            arrays = SampleArrays(*(column[late:] for column in arrays))
+        if len(arrays.x):
+            self._last_ns = int(arrays.timestamps[-1])
+
+        frame = frame_from_arrays(arrays, self.request.sampling_rate_hz)
+        frame.reordered_samples = reordered
+        frame.duplicate_samples = duplicates
+        active = self.accumulator.update(frame)
+        if self.levels is not None and len(frame):
+            self.levels.update(frame.magnitude)
+        if self.rollups is not None:
+            self.rollups.update(frame, active)
+        return arrays
+
+    def metrics(self) -> ActivityMetrics:
+        metrics = self.accumulator.metrics()
+        if self.levels is not None:
+            metrics = with_level_minutes(metrics, self.levels.minutes())
+        return metrics
+
+    def status(self) -> StreamingSessionStatus:
+        return StreamingSessionStatus(
+            session_id=self.session_id,
+            samples_received=self.samples_received,
+        )
+
+
+class LiveSession(StreamingSession):
+    """A streaming session that reports on itself while samples arrive.
+
+    The last ``window_seconds`` of samples are kept in a ring buffer and
+    analyzed afresh for every update, so an update costs the same however long
+    the session has been running.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        request: StreamingSessionRequest,
+        classifier: Optional[ActivityClassifier] = None,
+        epoch_seconds: Sequence[float] = (),
+        window_seconds: float = 60.0,
+    ) -> None:
+        super().__init__(session_id, request, classifier, epoch_seconds)
+        self.ring = SampleRing(
+            seconds_to_samples(window_seconds, request.sampling_rate_hz)
+        )
+
+    def append(self, chunk: AccelerationChunk) -> SampleArrays:
+        arrays = super().append(chunk)
+        self.ring.extend(arrays)
+        return arrays
+
+    def update(self) -> LiveAnalysisUpdate:
+        """Metrics so far and of the window, and newly closed inactivity."""
+        rate = self.request.sampling_rate_hz
+        window = ActivityAccumulator(rate)
+        if len(self.ring):
+            window.update(frame_from_arrays(self.ring.arrays(), rate))
+
+        runs = self.accumulator.take_closed_inactivity_runs()
+        return LiveAnalysisUpdate(
+            session_id=self.session_id,
+            samples_received=self.samples_received,
+            metrics=self.metrics(),
+            window_metrics=window.metrics(),
+            inactivity_periods=inactivity_periods_from_bounds(
+                [run[0] for run in runs], [run[1] for run in runs]
+            ),
+        )
+
+
+class StreamingSessionStore:
+    """In-memory registry of open streaming sessions with idle expiry.
+
+    Live sessions belong to their connection rather than the registry, but
+    count toward ``max_sessions`` while the connection is open.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 900.0,
+        max_sessions: int = 1000,
+        classifier: Optional[ActivityClassifier] = None,
+        epoch_seconds: Sequence[float] = (),
+        aggregates: Optional[AggregateStore] = None,
+        max_session_samples: int = 0,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_session_samples = max_session_samples
+        self.classifier = classifier
+        self.epoch_seconds = tuple(epoch_seconds)
+        self.aggregates = aggregates
+        self._sessions: Dict[str, StreamingSession] = {}
+        self._live_sessions = 0
+        self._lock = threading.Lock()
+
+    def create(self, request: StreamingSessionRequest) -> StreamingSessionStatus:
+        """Open a new session."""
+        with self._lock:
+            self._check_capacity()
+            session = StreamingSession(
+                str(uuid4()),
+                request,
+                self.classifier,
+                self.epoch_seconds,
+                record_rollups=self.aggregates is not None,
+            )
+            self._sessions[session.session_id] = session
+        return session.status()
+
+    @contextmanager
+    def live(
+        self, request: StreamingSessionRequest, window_seconds: float = 60.0
+    ) -> Iterator[LiveSession]:
+        """Open a live session for the duration of a connection."""
+        with self._lock:
+            self._check_capacity()
+            self._live_sessions += 1
+        try:
+            yield LiveSession(
+                str(uuid4()),
+                request,
+                self.classifier,
+                self.epoch_seconds,
+                window_seconds,
+            )
+        finally:
+            with self._lock:
+                self._live_sessions -= 1
+
+    def append(
+        self, session_id: str, chunk: AccelerationChunk
+    ) -> StreamingSessionStatus:
+        """Append a chunk of samples to a session.
+
+        Raises ``SessionFullError`` when the session would exceed
+        ``max_session_samples`` (0 for no limit) samples in total.
+        """
+        session = self._get(session_id)
+        with session.lock:
+            samples = session.samples_received + chunk.sample_count
+            if self.max_session_samples and samples > self.max_session_samples:
+                raise SessionFullError(
+                    f"Session would have {samples} samples, "
+                    f"the limit is {self.max_session_samples}"
+                )
+            session.append(chunk)
+            session.last_seen = time.monotonic()
+            return session.status()
+
+    def finish(self, session_id: str) -> AnalysisResponse:
+        """Close a session, add it to the user's trends and return its analysis."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            raise SessionNotFoundError(session_id)
+
+        with session.lock:
+            patterns = session.accumulator.patterns()
+            rollup = (
+                session.rollups.rollup(patterns.inactivity_periods)
+                if session.rollups is not None
+                else None
+            )
+            if self.aggregates is not None and rollup is not None:
+                self.aggregates.record_rollup(
+                    session.request.user_id,
+                    session.request.id or session.session_id,
+                    rollup,
+                )
+            return build_response(
+                session.metrics(),
+                patterns,
+                include_insights=session.request.include_insights,
+                include_recommendations=session.request.include_recommendations,
+                include_patterns=session.request.include_patterns,
+            )
+
+    def _get(self, session_id: str) -> StreamingSession:
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+        if session is None:
+            raise SessionNotFoundError(session_id)
+        return session
+
+    def _check_capacity(self) -> None:
+        self._expire()
+        if len(self._sessions) + self._live_sessions >= self.max_sessions:
+            raise OverflowError("Too many open streaming sessions")
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [
+            session_id
+            for session_id, session in self._sessions.items()
+            if session.last_seen < cutoff
+        ]
+        for session_id in expired:
+            del self._sessions[session_id]
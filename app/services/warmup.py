@@ -0,0 +1,41 @@
+"""Loading of what the first requests would otherwise wait for.
+
+SciPy, scikit-learn and the activity model are imported lazily so that the
+server starts quickly; the warm-up loads them in the background once it is
+serving, or in the gunicorn master before workers fork (gunicorn.conf.py).
+"""
+import importlib
+import logging
+import threading
+from typing import Optional
+
+from app.core.instrumentation import time_stage
+from app.services.classifier import ActivityClassifier
+
+logger = logging.getLogger(__name__)
+
+# Libraries imported on first use by the analysis stages
+WARM_UP_MODULES = ("scipy.signal",)
+
+
+def warm_up(classifier: Optional[ActivityClassifier] = None) -> None:
+    """Import the lazily loaded libraries and load the activity model."""
+    with time_stage("warm_up"):
+        for module in WARM_UP_MODULES:
+            importlib.import_module(module)
+        if classifier is not None:
+            classifier.warm_up()
+
+
+def start_warm_up(classifier: Optional[ActivityClassifier] = None) -> threading.Thread:
+    """Run ``warm_up`` in a daemon thread; failures are logged, not raised."""
+
+    def run() -> None:
+        try:
+            warm_up(classifier)
+        except Exception:
+            logger.exception("Warm-up failed")
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,174 @@
+"""Compact binary encoding of an analysis request.
+
+Layout (little-endian)::
+
+    magic "AREU" | version u8 | flags u8 | reserved u16 | header length u32
+    JSON header, space-padded to a multiple of 8 bytes
+    payload, zlib-compressed when FLAG_COMPRESSED is set:
+        timestamps int64[n] epoch ns (only when FLAG_TIMESTAMPS is set)
+        x[n] | y[n] | z[n] as float32 or float64 (header "dtype")
+
+The header carries the ``AccelerationData`` metadata and request options. On
+decoding the columns are ``np.frombuffer`` views of the body, so they reach the
+analysis pipeline without per-sample parsing or copies.
+"""
+import json
+import struct
+import zlib
+from typing import Any, Dict
+
+import numpy as np
+
+from app.models.acceleration import AccelerationData
+from app.models.analysis import AnalysisRequest
+
+CONTENT_TYPE = "application/vnd.areum.samples"
+
+MAGIC = b"AREU"
+VERSION = 1
+FLAG_COMPRESSED = 0x01
+FLAG_TIMESTAMPS = 0x02
+
+_PREAMBLE = struct.Struct("<4sBBHI")
+_DTYPES: Dict[str, np.dtype] = {"float32": np.dtype("<f4"), "float64": np.dtype("<f8")}
+_TIMESTAMP_DTYPE = np.dtype("<i8")
+# Decoded from the payload, never taken from the header
+_COLUMN_KEYS = frozenset({"timestamps", "x", "y", "z", "samples"})
+
+
+class BinaryFormatError(ValueError):
+    """Raised when a binary upload is malformed."""
+
+
+class SampleLimitError(BinaryFormatError):
+    """Raised when a binary upload declares more samples than allowed."""
+
+
+def encode_analysis_request(
+    request: AnalysisRequest,
+    dtype: str = "float32",
+    compress: bool = False,
+    include_timestamps: bool = True,
+) -> bytes:
+    """Encode a request in the binary upload format."""
+    if dtype not in _DTYPES:
+        raise ValueError(
+            f"Unsupported dtype {dtype!r}, expected one of {list(_DTYPES)}"
+        )
+
+    data = request.acceleration_data
+    arrays = data.to_arrays()
+    header: Dict[str, Any] = {
+        "data_type": data.data_type,
+        "device_info": data.device_info,
+        "sampling_rate_hz": data.sampling_rate_hz,
+        "start_time": data.start_time.isoformat(),
+        "metadata": data.metadata,
+        "id": data.id,
+        "user_id": request.user_id,
+        "include_insights": request.include_insights,
+        "include_recommendations": request.include_recommendations,
+        "include_patterns": request.include_patterns,
+        "sample_count": len(arrays.x),
+        "dtype": dtype,
+    }
+
+    header_bytes = json.dumps(header).encode()
+    header_bytes += b" " * (-len(header_bytes) % 8)
+
+    columns = [arrays.x, arrays.y, arrays.z]
+    payload = b"".join(
+        (
+            [arrays.timestamps.astype(_TIMESTAMP_DTYPE).tobytes()]
+            if include_timestamps
+            else []
+        )
+        + [column.astype(_DTYPES[dtype]).tobytes() for column in columns]
+    )
+
+    flags = FLAG_TIMESTAMPS if include_timestamps else 0
+    if compress:
+        flags |= FLAG_COMPRESSED
+        payload = zlib.compress(payload)
+
+    return (
+        _PREAMBLE.pack(MAGIC, VERSION, flags, 0, len(header_bytes))
+        + header_bytes
+        + payload
+    )
+
+
+def decode_analysis_request(body: bytes, max_samples: int = 0) -> AnalysisRequest:
+    """Decode a binary upload into a request backed by views of ``body``.
+
+    ``max_samples`` (0 for no limit) is checked against the header before the
+    payload is decompressed, which never inflates past the declared size.
+    """
+    if len(body) < _PREAMBLE.size:
+        raise BinaryFormatError("Body is too short for the binary format")
+
+    magic, version, flags, _, header_length = _PREAMBLE.unpack_from(body)
+    if magic != MAGIC:
+        raise BinaryFormatError("Body is not in the binary sample format")
+    if version != VERSION:
+        raise BinaryFormatError(f"Unsupported binary format version {version}")
+
+    header_end = _PREAMBLE.size + header_length
+    try:
+        header = json.loads(body[_PREAMBLE.size : header_end])
+        if not isinstance(header, dict):
+            raise TypeError("header must be an object")
+        count = int(header.pop("sample_count"))
+        dtype = _DTYPES[header.pop("dtype", "float32")]
+    except (ValueError, KeyError, TypeError) as e:
+        raise BinaryFormatError(f"Invalid binary header: {e}")
+    if count < 0:
+        raise BinaryFormatError(f"Invalid binary header: {count} samples")
+    clashing = sorted(_COLUMN_KEYS.intersection(header))
+    if clashing:
+        raise BinaryFormatError(f"Invalid binary header: unexpected {clashing}")
+    if max_samples and count > max_samples:
+        raise SampleLimitError(
+            f"Request has {count} samples, the limit is {max_samples}"
+        )
+
+    timestamp_bytes = (
+        count * _TIMESTAMP_DTYPE.itemsize if flags & FLAG_TIMESTAMPS else 0
+    )
+    expected = timestamp_bytes + 3 * count * dtype.itemsize
+
+    payload = memoryview(body)[header_end:]
+    if flags & FLAG_COMPRESSED:
+        try:
+            # One byte more than expected is enough to tell it is too long
+            payload = memoryview(zlib.decompressobj().decompress(payload, expected + 1))
+        except zlib.error as e:
+            raise BinaryFormatError(f"Invalid compressed payload: {e}")
+
+    if len(payload) != expected:
+        raise BinaryFormatError(
+            f"Payload has {len(payload)} bytes, expected {expected} for {count} samples"
+        )
+
+    columns: Dict[str, Any] = {}
+    if timestamp_bytes:
+        columns["timestamps"] = np.frombuffer(
+            payload, dtype=_TIMESTAMP_DTYPE, count=count
+        ).view("datetime64[ns]")
+    for index, axis in enumerate("xyz"):
+        offset = timestamp_bytes + index * count * dtype.itemsize
+        columns[axis] = np.frombuffer(payload, dtype=dtype, count=count, offset=offset)
+
+    options = {
+        key: header.pop(key)
+        for key in (
+            "user_id",
+            "include_insights",
+            "include_recommendations",
+            "include_patterns",
+        )
+        if key in header
+    }
+    return AnalysisRequest(
+        acceleration_data=AccelerationData(**header, **columns), **options
+    )
@@ -0,0 +1,83 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from app.utils.signal import seconds_to_samples
+
+# Length of the windows features are computed over
+FEATURE_WINDOW_SECONDS = 10.0
+# Frequencies where walking and running put their energy
+GAIT_BAND_HZ = (0.5, 3.5)
+
+# Columns of the window feature matrix
+WINDOW_FEATURES = (
+    "mean",
+    "variance",
+    "p10",
+    "p50",
+    "p90",
+    "spectral_energy",
+    "dominant_frequency",
+)
+
+
+def feature_window_samples(sampling_rate_hz: float) -> int:
+    """Samples in one feature window at the given rate."""
+    return int(seconds_to_samples(FEATURE_WINDOW_SECONDS, sampling_rate_hz))
+
+
+def window_view(
+    values: np.ndarray, window: int, step: Optional[int] = None
+) -> np.ndarray:
+    """Windows of ``window`` samples every ``step`` (default: back to back).
+
+    The result is a strided view of ``values``, no samples are copied; a
+    trailing partial window is left out.
+    """
+    if len(values) < window:
+        return np.empty((0, window), dtype=values.dtype)
+    return np.lib.stride_tricks.sliding_window_view(values, window)[:: step or window]
+
+
+def window_features(windows: np.ndarray, sampling_rate_hz: float) -> np.ndarray:
+    """Feature matrix with one row of ``WINDOW_FEATURES`` per magnitude window.
+
+    Spectral energy is the power in the gait band normalized by the window
+    length, so features do not depend on the sampling rate.
+    """
+    count, window = windows.shape
+    if count == 0:
+        return np.empty((0, len(WINDOW_FEATURES)))
+
+    mean = windows.mean(axis=1)
+    variance = windows.var(axis=1)
+    percentiles = np.percentile(windows, (10, 50, 90), axis=1)
+
+    power = np.square(np.abs(np.fft.rfft(windows - mean[:, None], axis=1)))
+    power /= window * window
+    frequencies = np.fft.rfftfreq(window, d=1.0 / sampling_rate_hz)
+    in_band = (frequencies >= GAIT_BAND_HZ[0]) & (frequencies <= GAIT_BAND_HZ[1])
+    power[:, 0] = 0.0  # DC is the mean, already a feature
+
+    return np.column_stack(
+        (
+            mean,
+            variance,
+            *percentiles,
+            power[:, in_band].sum(axis=1),
+            frequencies[power.argmax(axis=1)],
+        )
+    )
+
+
+def split_windows(
+    values: np.ndarray, window: int, carry: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Complete windows of ``carry`` followed by ``values``, and the new carry.
+
+    Lets chunked input produce exactly the windows of the whole signal.
+    """
+    if len(carry):
+        values = np.concatenate((carry, values))
+    complete = len(values) // window * window
+    return window_view(values[:complete], window), values[complete:].copy()
@@ -1,83 +1,218 @@
-from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
 
 import numpy as np
-import pandas as pd
 
-from app.models.acceleration import AccelerationData, ActivityMetrics
+from app.models.acceleration import (
+    AccelerationData,
+    ActivityMetrics,
+    EpochMetrics,
+    GapSummary,
+)
+from app.utils.rolling import RollingEngine, RollingWindow
+from app.utils.signal import (
+    GRAVITY_OFFSET,
+    SignalFrame,
+    build_signal_frame,
+    effective_rate_hz,
+    seconds_to_samples,
+)
+from app.utils.timestamps import GapTotals, sample_seconds
 
+# Rolling mean magnitude above gravity + threshold counts as active
+ACTIVE_THRESHOLD = 0.2  # Lower threshold to detect more activity
+ACTIVE_WINDOW_SECONDS = 1.0
+# Magnitude above gravity that maps to full intensity
+INTENSITY_SCALE = 0.5
 
-def calculate_activity_metrics(data: AccelerationData) -> ActivityMetrics:
-    """Calculate activity metrics from accelerometer data."""
-    samples = data.samples
 
-    if not samples:
-        return ActivityMetrics(
-            avg_intensity=0.0,
-            peak_intensity=0.0,
-            movement_consistency=0.0,
-            active_minutes=0.0,
-            total_duration=0.0,
+def active_window_samples(sampling_rate_hz: float) -> int:
+    """Length of the activity window in samples at the given rate."""
+    return int(seconds_to_samples(ACTIVE_WINDOW_SECONDS, sampling_rate_hz))
+
+
+def active_window(sampling_rate_hz: float) -> RollingWindow:
+    """Rolling window whose mean magnitude decides whether a sample is active."""
+    return RollingWindow(active_window_samples(sampling_rate_hz), stats=("mean",))
+
+
+def active_mask(frame: SignalFrame) -> np.ndarray:
+    """Mark samples whose rolling mean magnitude is above the active threshold."""
+    engine = RollingEngine([active_window(frame.sampling_rate_hz)])
+    [stats] = engine.update(frame.magnitude)
+    return stats["mean"] > (GRAVITY_OFFSET + ACTIVE_THRESHOLD)
+
+
+def intensity(magnitude: Any) -> Any:
+    """Activity intensity in [0, 1] of a magnitude in g."""
+    return np.clip((magnitude - GRAVITY_OFFSET) / INTENSITY_SCALE, 0, 1.0)
+
+
+class EpochTotals:
+    """Running totals over the back-to-back epochs of one length.
+
+    Fed the statistics of ``window`` from a ``RollingEngine``, one chunk at a
+    time.
+    """
+
+    def __init__(self, epoch_seconds: float, sampling_rate_hz: float) -> None:
+        self.epoch_seconds = epoch_seconds
+        self.sampling_rate_hz = effective_rate_hz(sampling_rate_hz)
+        self.samples = seconds_to_samples(epoch_seconds, self.sampling_rate_hz)
+        self.count = 0
+        self.active = 0
+        self.peak_mean = -np.inf
+        self.variance_sum = 0.0
+        self.peak_sum = 0.0
+
+    @property
+    def window(self) -> RollingWindow:
+        return RollingWindow(self.samples, step=self.samples)
+
+    def add(self, stats: Dict[str, np.ndarray]) -> None:
+        means = stats["mean"]
+        if len(means) == 0:
+            return
+        self.count += len(means)
+        self.active += int(np.count_nonzero(means > GRAVITY_OFFSET + ACTIVE_THRESHOLD))
+        self.peak_mean = max(self.peak_mean, float(means.max()))
+        self.variance_sum += float(stats["var"].sum())
+        self.peak_sum += float(stats["max"].sum())
+
+    def metrics(self) -> EpochMetrics:
+        count = max(self.count, 1)
+        return EpochMetrics(
+            epoch_seconds=self.epoch_seconds,
+            epoch_count=self.count,
+            active_epochs=self.active,
+            active_minutes=self.active * self.samples / self.sampling_rate_hz / 60.0,
+            peak_intensity=float(intensity(self.peak_mean)) if self.count else 0.0,
+            avg_variance=self.variance_sum / count,
+            avg_peak_magnitude=self.peak_sum / count,
         )
 
-    # Convert samples to DataFrame for easier manipulation
-    df = pd.DataFrame(
-        [
-            {
-                "timestamp": s.timestamp,
-                "x": s.x,
-                "y": s.y,
-                "z": s.z,
-            }
-            for s in samples
-        ]
-    )
 
-    # Calculate magnitude of acceleration vector
-    df["magnitude"] = np.sqrt(df["x"] ** 2 + df["y"] ** 2 + df["z"] ** 2)
+def epoch_metrics(
+    magnitude: np.ndarray, sampling_rate_hz: float, epoch_seconds: Sequence[float]
+) -> List[EpochMetrics]:
+    """Epoch summaries of a magnitude signal, all lengths in one pass."""
+    epochs = [EpochTotals(seconds, sampling_rate_hz) for seconds in epoch_seconds]
+    engine = RollingEngine([epoch.window for epoch in epochs])
+    for epoch, stats in zip(epochs, engine.update(magnitude)):
+        epoch.add(stats)
+    return [epoch.metrics() for epoch in epochs]
 
-    # Earth's gravity is approximately 1.0 in normalized device values
-    gravity_offset = 1.0
 
-    # Calculate metrics
-    avg_magnitude = df["magnitude"].mean()
-    max_magnitude = df["magnitude"].max()
+def activity_scores(
+    avg_magnitude: Any,
+    max_magnitude: Any,
+    magnitude_variance: Any,
+    duration_seconds: Any,
+    active_seconds: Any,
+) -> Dict[str, Any]:
+    """Activity metric fields from magnitude statistics.
 
+    Works on scalars or on arrays with one value per session.
+    """
     # CRITICAL CHANGE: Make intensity more sensitive
     # For high activity test data - calculate intensity using a more sensitive scale
     # Instead of dividing by 3.0, divide by 0.5 to amplify the signal
-    avg_intensity = min(max(0, (avg_magnitude - gravity_offset) / 0.5), 1.0)
-    peak_intensity = min(max(0, (max_magnitude - gravity_offset) / 0.5), 1.0)
+    avg_intensity = intensity(avg_magnitude)
+    peak_intensity = intensity(max_magnitude)
 
     # Calculate movement consistency as inverse of variance (normalized)
-    magnitude_variance = df["magnitude"].var() if len(df) > 1 else 0
-    movement_consistency = max(0, 1 - min(1, magnitude_variance / 2.0))
+    movement_consistency = np.maximum(0, 1 - np.minimum(1, magnitude_variance / 2.0))
 
-    # Calculate duration
-    start_time = df["timestamp"].min()
-    end_time = df["timestamp"].max()
-    duration_seconds = (end_time - start_time).total_seconds()
     total_duration = duration_seconds / 60.0  # Convert to minutes
 
-    # Calculate active minutes
-    active_threshold = 0.2  # Lower threshold to detect more activity
-    # Create a rolling window to detect active periods
-    window_size = min(10, len(df))  # Ensure window size doesn't exceed dataframe length
-    if window_size > 0:
-        df["active"] = df["magnitude"].rolling(
-            window=window_size, min_periods=1
-        ).mean() > (gravity_offset + active_threshold)
-        active_samples = df["active"].sum()
-    else:
-        active_samples = 0
-
-    # Convert active samples to minutes based on sampling rate
-    sample_duration = 1.0 / max(1, data.sampling_rate_hz)  # Avoid division by zero
-    active_minutes = (active_samples * sample_duration) / 60.0
+    active_minutes = active_seconds / 60.0
 
+    return {
+        "avg_intensity": avg_intensity,
+        "peak_intensity": peak_intensity,
+        "movement_consistency": movement_consistency,
+        "active_minutes": active_minutes,
+        "total_duration": total_duration,
+    }
+
+
+def summarize_activity(
+    avg_magnitude: float,
+    max_magnitude: float,
+    magnitude_variance: float,
+    duration_seconds: float,
+    active_seconds: float,
+    epochs: Sequence[EpochMetrics] = (),
+    gaps: Optional[GapSummary] = None,
+) -> ActivityMetrics:
+    """Turn magnitude statistics into activity metrics."""
+    scores = activity_scores(
+        avg_magnitude,
+        max_magnitude,
+        magnitude_variance,
+        duration_seconds,
+        active_seconds,
+    )
     return ActivityMetrics(
-        avg_intensity=float(avg_intensity),
-        peak_intensity=float(peak_intensity),
-        movement_consistency=float(movement_consistency),
-        active_minutes=float(active_minutes),
-        total_duration=float(total_duration),
+        **{name: float(value) for name, value in scores.items()},
+        epochs=list(epochs),
+        gaps=gaps,
+    )
+
+
+def calculate_activity_metrics(
+    data: AccelerationData,
+    frame: Optional[SignalFrame] = None,
+    epoch_seconds: Sequence[float] = (),
+) -> ActivityMetrics:
+    """Calculate activity metrics from accelerometer data.
+
+    A precomputed (possibly decimated) signal frame can be passed to avoid
+    rebuilding it. ``epoch_seconds`` adds a summary per epoch length; the
+    activity window and all epochs come from one rolling pass. Active samples
+    count the time until the next sample, so gaps and jitter are not
+    mistaken for activity.
+    """
+    if data.sample_count == 0:
+        return ActivityMetrics(
+            avg_intensity=0.0,
+            peak_intensity=0.0,
+            movement_consistency=0.0,
+            active_minutes=0.0,
+            total_duration=0.0,
+        )
+
+    if frame is None:
+        frame = build_signal_frame(data)
+    magnitude = frame.magnitude
+
+    # Calculate duration
+    duration_seconds = (frame.timestamps.max() - frame.timestamps.min()) / 1e9
+
+    epochs = [EpochTotals(seconds, frame.sampling_rate_hz) for seconds in epoch_seconds]
+    engine = RollingEngine(
+        [active_window(frame.sampling_rate_hz)] + [epoch.window for epoch in epochs]
+    )
+    active_stats, *epoch_stats = engine.update(magnitude)
+    active = active_stats["mean"] > (GRAVITY_OFFSET + ACTIVE_THRESHOLD)
+    for epoch, stats in zip(epochs, epoch_stats):
+        epoch.add(stats)
+
+    gaps = GapTotals(frame.sampling_rate_hz)
+    gaps.update(frame.timestamps)
+    gaps.reordered_samples = frame.reordered_samples
+    gaps.duplicate_samples = frame.duplicate_samples
+
+    return summarize_activity(
+        avg_magnitude=magnitude.mean(),
+        max_magnitude=magnitude.max(),
+        magnitude_variance=magnitude.var(ddof=1) if len(magnitude) > 1 else 0.0,
+        duration_seconds=duration_seconds,
+        active_seconds=float(
+            np.dot(
+                sample_seconds(frame.timestamps, frame.sampling_rate_hz, frame.next_ns),
+                active,
+            )
+        ),
+        epochs=[epoch.metrics() for epoch in epochs],
+        gaps=gaps.summary(),
     )
@@ -1,66 +1,106 @@
-from datetime import datetime
+from typing import List, Optional, Sequence, Tuple, Union
 
 import numpy as np
-import pandas as pd
 
-from app.models.acceleration import AccelerationData, ActivityPatterns, InactivityPeriod
-
-
-def detect_activity_patterns(data: AccelerationData) -> ActivityPatterns:
-    """Detect patterns in accelerometer data like periods of inactivity."""
-    samples = data.samples
-
-    if len(samples) < 10:
-        return ActivityPatterns(inactivity_periods=[])
-
-    # Convert to DataFrame
-    df = pd.DataFrame(
-        [
-            {
-                "timestamp": s.timestamp,
-                "x": s.x,
-                "y": s.y,
-                "z": s.z,
-            }
-            for s in samples
-        ]
+from app.models.acceleration import (
+    AccelerationData,
+    ActivityPatterns,
+    InactivityPeriod,
+    ns_to_datetime,
+)
+from app.utils.signal import (
+    SignalFrame,
+    build_signal_frame,
+    find_runs,
+    seconds_to_samples,
+)
+from app.utils.steps import detect_activity_bouts
+from app.utils.timestamps import gap_after
+
+# Inactive when the magnitude stays within this distance of gravity
+INACTIVITY_THRESHOLD = 0.1
+MIN_INACTIVITY_SECONDS = 2.0
+# Recordings shorter than this are too short for pattern detection
+MIN_PATTERN_SAMPLES = 10
+
+
+def min_inactivity_run(sampling_rate_hz: float) -> int:
+    """Minimum run length for an inactivity period in samples at the given rate."""
+    return int(seconds_to_samples(MIN_INACTIVITY_SECONDS, sampling_rate_hz))
+
+
+def min_inactivity_samples(sample_count: int, sampling_rate_hz: float) -> int:
+    """Minimum run length for an inactivity period, adjusted to data length."""
+    return min(min_inactivity_run(sampling_rate_hz), sample_count // 5)
+
+
+def run_time_bounds(
+    timestamps: np.ndarray, starts: np.ndarray, ends: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Min and max timestamp of each run, without assuming timestamps are sorted."""
+    if len(starts) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    boundaries = np.zeros(len(timestamps) + 1, dtype=np.int64)
+    boundaries[starts] += 1
+    boundaries[ends] -= 1
+    run_timestamps = timestamps[np.cumsum(boundaries[:-1]) > 0]
+    run_offsets = np.concatenate(([0], np.cumsum(ends - starts)[:-1]))
+    return (
+        np.minimum.reduceat(run_timestamps, run_offsets),
+        np.maximum.reduceat(run_timestamps, run_offsets),
     )
 
-    # Calculate magnitude
-    df["magnitude"] = np.sqrt(df["x"] ** 2 + df["y"] ** 2 + df["z"] ** 2)
 
-    # Gravity offset
-    gravity_offset = 1.0
-
-    # Normalize magnitude
-    df["normalized_magnitude"] = (df["magnitude"] - gravity_offset).abs()
+def inactivity_periods_from_bounds(
+    start_ns: Union[Sequence[int], np.ndarray], end_ns: Union[Sequence[int], np.ndarray]
+) -> List[InactivityPeriod]:
+    """Build inactivity periods from per-run start and end timestamps."""
+    return [
+        InactivityPeriod(
+            start_time=ns_to_datetime(start),
+            end_time=ns_to_datetime(end),
+            duration=(end - start) / 1e9,
+        )
+        for start, end in zip(
+            np.asarray(start_ns).tolist(), np.asarray(end_ns).tolist()
+        )
+    ]
+
+
+def detect_activity_patterns(
+    data: AccelerationData, frame: Optional[SignalFrame] = None
+) -> ActivityPatterns:
+    """Detect periods of inactivity and walking or running bouts.
+
+    A precomputed (possibly decimated) signal frame can be passed to avoid
+    rebuilding it. Inactivity periods do not span sampling gaps.
+    """
+    if data.sample_count < MIN_PATTERN_SAMPLES:
+        return ActivityPatterns(inactivity_periods=[])
 
-    # Threshold for inactivity
-    inactivity_threshold = 0.1
+    if frame is None:
+        frame = build_signal_frame(data)
 
     # Mark inactive samples
-    df["inactive"] = df["normalized_magnitude"] < inactivity_threshold
-
-    # Detect periods of inactivity (state changes)
-    df["state_change"] = df["inactive"].ne(df["inactive"].shift(1)).cumsum()
-    inactive_groups = df[df["inactive"] == True].groupby("state_change")
+    inactive = frame.normalized_magnitude < INACTIVITY_THRESHOLD
 
     # Minimum duration for an inactivity period (in samples)
-    min_samples = min(20, len(df) // 5)  # Adjust based on data length
+    min_samples = min_inactivity_samples(len(frame), frame.sampling_rate_hz)
 
-    # Extract inactivity periods
-    inactivity_periods = []
+    # Detect periods of inactivity (runs of inactive samples, split at gaps)
+    gaps = np.insert(gap_after(frame.timestamps, frame.sampling_rate_hz), 0, False)
+    starts, ends = find_runs(inactive, gaps)
+    long_enough = (ends - starts) >= min_samples
+    starts, ends = starts[long_enough], ends[long_enough]
 
-    for _, group in inactive_groups:
-        if len(group) >= min_samples:
-            start_time = group["timestamp"].min()
-            end_time = group["timestamp"].max()
-            duration = (end_time - start_time).total_seconds()
+    start_ns, end_ns = run_time_bounds(frame.timestamps, starts, ends)
 
-            inactivity_periods.append(
-                InactivityPeriod(
-                    start_time=start_time, end_time=end_time, duration=duration
-                )
-            )
+    # Detect steps and group them into bouts
+    bouts = detect_activity_bouts(frame)
 
-    return ActivityPatterns(inactivity_periods=inactivity_periods)
+    return ActivityPatterns(
+        inactivity_periods=inactivity_periods_from_bounds(start_ns, end_ns),
+        activity_patterns=bouts,
+        step_count=sum(bout.step_count for bout in bouts),
+    )
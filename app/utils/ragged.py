@@ -0,0 +1,333 @@
+"""Analysis of many sessions at once, stored as one ragged sample buffer.
+
+Sessions are concatenated into flat columns and ``offsets`` marks where each
+one starts (session ``i`` is ``offsets[i]:offsets[i + 1]``). Metrics and
+inactivity periods are computed with segmented reductions over the whole
+buffer, so the per-session Python overhead is limited to building the result
+models. Results match ``calculate_activity_metrics`` and
+``detect_activity_patterns`` run on each session separately; only step
+detection, a recursive filter, and epoch summaries, whose epoch length
+depends on the session's rate, run session by session.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+from numpy.typing import DTypeLike
+
+from app.models.acceleration import (
+    AccelerationData,
+    ActivityMetrics,
+    ActivityPatterns,
+    GapSummary,
+    SampleArrays,
+    sample_dtype,
+)
+from app.utils.metrics import (
+    ACTIVE_THRESHOLD,
+    ACTIVE_WINDOW_SECONDS,
+    activity_scores,
+    epoch_metrics,
+)
+from app.utils.patterns import (
+    INACTIVITY_THRESHOLD,
+    MIN_INACTIVITY_SECONDS,
+    MIN_PATTERN_SAMPLES,
+    inactivity_periods_from_bounds,
+    run_time_bounds,
+)
+from app.utils.signal import (
+    GRAVITY_OFFSET,
+    SignalFrame,
+    frame_from_arrays,
+    order_samples,
+    seconds_to_samples,
+)
+from app.utils.steps import StepDetector
+from app.utils.timestamps import gap_threshold_ns, sample_period_ns
+
+
+@dataclass
+class RaggedFrame:
+    """Signal columns of many sessions concatenated, with session offsets."""
+
+    timestamps: np.ndarray  # int64 epoch nanoseconds
+    magnitude: np.ndarray
+    normalized_magnitude: np.ndarray
+    offsets: np.ndarray  # int64, one more than the number of sessions
+    sampling_rate_hz: np.ndarray  # per session
+    # Per session, see ``order_samples``; None when nothing was reordered
+    reordered_samples: Optional[np.ndarray] = None
+    duplicate_samples: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def intervals(self) -> np.ndarray:
+        """Time since the previous sample of the session, 0 for first samples."""
+        intervals = np.diff(self.timestamps, prepend=self.timestamps[:1])
+        firsts = self.offsets[:-1][self.lengths > 0]
+        intervals[firsts] = 0
+        return intervals
+
+    def per_sample(self, values: np.ndarray) -> np.ndarray:
+        """Repeat a per-session value for every sample of the session."""
+        return np.repeat(values, self.lengths)
+
+
+def ragged_from_arrays(
+    arrays: SampleArrays,
+    offsets: Union[Sequence[int], np.ndarray],
+    sampling_rate_hz: Sequence[float],
+) -> RaggedFrame:
+    """Build a ragged frame from concatenated sample columns and offsets.
+
+    Each session's samples are put in timestamp order, without repeats.
+    """
+    bounds = np.asarray(offsets, dtype=np.int64)
+    rates = np.broadcast_to(
+        np.asarray(sampling_rate_hz, dtype=np.float64), (len(bounds) - 1,)
+    )
+    if bounds[0] != 0 or bounds[-1] != len(arrays.x) or np.any(np.diff(bounds) < 0):
+        raise ValueError("offsets must increase from 0 to the number of samples")
+
+    ordered = order_samples(arrays, bounds)
+    frame = frame_from_arrays(ordered.arrays, 0)
+    return RaggedFrame(
+        timestamps=frame.timestamps,
+        magnitude=frame.magnitude,
+        normalized_magnitude=frame.normalized_magnitude,
+        offsets=ordered.offsets,
+        sampling_rate_hz=rates,
+        reordered_samples=ordered.reordered_samples,
+        duplicate_samples=ordered.duplicate_samples,
+    )
+
+
+def concatenate_frames(frames: Sequence[SignalFrame]) -> RaggedFrame:
+    """Concatenate signal frames into one ragged frame."""
+    lengths = [len(frame) for frame in frames]
+
+    def column(name: str, dtype: DTypeLike) -> np.ndarray:
+        if not frames:
+            return np.empty(0, dtype=dtype)
+        return np.concatenate([getattr(frame, name) for frame in frames])
+
+    return RaggedFrame(
+        timestamps=column("timestamps", np.int64),
+        magnitude=column("magnitude", np.float64),
+        normalized_magnitude=column("normalized_magnitude", np.float64),
+        offsets=np.insert(np.cumsum(lengths, dtype=np.int64), 0, 0),
+        sampling_rate_hz=np.array(
+            [frame.sampling_rate_hz for frame in frames], dtype=np.float64
+        ),
+        reordered_samples=np.array(
+            [frame.reordered_samples for frame in frames], dtype=np.int64
+        ),
+        duplicate_samples=np.array(
+            [frame.duplicate_samples for frame in frames], dtype=np.int64
+        ),
+    )
+
+
+def ragged_from_sessions(sessions: Sequence[AccelerationData]) -> RaggedFrame:
+    """Concatenate sessions as sent to the API into one ragged frame."""
+    arrays = [data.to_arrays() for data in sessions]
+    lengths = [len(columns.x) for columns in arrays]
+
+    def column(index: int, dtype: DTypeLike) -> np.ndarray:
+        if not arrays:
+            return np.empty(0, dtype=dtype)
+        return np.concatenate([columns[index] for columns in arrays])
+
+    return ragged_from_arrays(
+        SampleArrays(
+            timestamps=column(0, np.int64),
+            x=column(1, sample_dtype()),
+            y=column(2, sample_dtype()),
+            z=column(3, sample_dtype()),
+        ),
+        offsets=np.insert(np.cumsum(lengths, dtype=np.int64), 0, 0),
+        sampling_rate_hz=[data.sampling_rate_hz for data in sessions],
+    )
+
+
+def _segment_reduce(
+    ufunc: np.ufunc, values: np.ndarray, ragged: RaggedFrame, empty: float = 0
+) -> np.ndarray:
+    """Per-session reduction (sum, min or max); ``empty`` for empty sessions."""
+    dtype = np.int64 if values.dtype == bool else values.dtype
+    result = np.full(len(ragged), empty, dtype=dtype)
+    non_empty = ragged.lengths > 0
+    if non_empty.any():
+        # reduceat is missing from NumPy's stubs for a generic ufunc
+        result[non_empty] = ufunc.reduceat(  # type: ignore[attr-defined]
+            values, ragged.offsets[:-1][non_empty], dtype=dtype
+        )
+    return result
+
+
+def ragged_activity_metrics(
+    ragged: RaggedFrame, epoch_seconds: Sequence[float] = ()
+) -> List[ActivityMetrics]:
+    """Activity metrics of every session, computed in one pass over the buffer."""
+    lengths = ragged.lengths
+    magnitude = ragged.magnitude
+    counts = np.maximum(lengths, 1)
+
+    mean = _segment_reduce(np.add, magnitude, ragged) / counts
+    deviations = magnitude - np.repeat(mean, lengths)
+    squares = _segment_reduce(np.add, np.square(deviations), ragged)
+    variance = np.where(lengths > 1, squares / np.maximum(lengths - 1, 1), 0.0)
+    peak = _segment_reduce(np.maximum, magnitude, ragged)
+    first_ns = _segment_reduce(np.minimum, ragged.timestamps, ragged)
+    last_ns = _segment_reduce(np.maximum, ragged.timestamps, ragged)
+
+    # Trailing rolling mean within each session (min_periods=1)
+    windows = np.minimum(
+        seconds_to_samples(ACTIVE_WINDOW_SECONDS, ragged.sampling_rate_hz), counts
+    )
+    cumulative = np.concatenate(([0.0], np.cumsum(magnitude)))
+    end = np.arange(1, len(magnitude) + 1)
+    start = np.maximum(
+        end - np.repeat(windows, lengths), np.repeat(ragged.offsets[:-1], lengths)
+    )
+    rolling = (cumulative[end] - cumulative[start]) / (end - start)
+    active = rolling > (GRAVITY_OFFSET + ACTIVE_THRESHOLD)
+
+    # Each sample lasts until the next one of its session, or one period at
+    # the end of the session and before a gap
+    intervals = ragged.intervals()
+    period = ragged.per_sample(sample_period_ns(ragged.sampling_rate_hz))
+    seconds = np.empty(len(magnitude))
+    seconds[:-1] = intervals[1:]
+    seconds[ragged.offsets[1:][lengths > 0] - 1] = 0
+    gaps = (seconds == 0) | (
+        seconds > ragged.per_sample(gap_threshold_ns(ragged.sampling_rate_hz))
+    )
+    seconds[gaps] = period[gaps]
+    seconds /= 1e9
+
+    scores = activity_scores(
+        avg_magnitude=mean,
+        max_magnitude=peak,
+        magnitude_variance=variance,
+        duration_seconds=(last_ns - first_ns) / 1e9,
+        active_seconds=_segment_reduce(np.add, seconds * active, ragged),
+    )
+    # Sessions without samples report zeros
+    rows = zip(
+        *(np.where(lengths > 0, value, 0.0).tolist() for value in scores.values())
+    )
+    metrics = [ActivityMetrics.construct(**dict(zip(scores, row))) for row in rows]
+    for session, gap_summary in zip(metrics, _gap_summaries(ragged, intervals)):
+        session.gaps = gap_summary
+
+    if epoch_seconds:
+        offsets = ragged.offsets.tolist()
+        rates = ragged.sampling_rate_hz.tolist()
+        for i, session in enumerate(metrics):
+            if lengths[i]:
+                session.epochs = epoch_metrics(
+                    magnitude[offsets[i] : offsets[i + 1]], rates[i], epoch_seconds
+                )
+    return metrics
+
+
+def _gap_summaries(
+    ragged: RaggedFrame, intervals: np.ndarray
+) -> List[Optional[GapSummary]]:
+    """Gap summary of every session, None for sessions without samples."""
+    lengths = ragged.lengths
+    rates = ragged.sampling_rate_hz
+    gaps = intervals > ragged.per_sample(gap_threshold_ns(rates))
+    gap_intervals = np.where(gaps, intervals, 0)
+
+    # Jitter from the other intervals, as deviations from the nominal period
+    period = sample_period_ns(rates)
+    regular = ~gaps
+    regular[ragged.offsets[:-1][lengths > 0]] = False
+    deviations = np.where(regular, intervals - ragged.per_sample(period), 0.0)
+    count = _segment_reduce(np.add, regular, ragged)
+    mean = _segment_reduce(np.add, deviations, ragged) / np.maximum(count, 1)
+    squares = _segment_reduce(np.add, np.square(deviations), ragged)
+    jitter = np.sqrt(np.maximum(squares / np.maximum(count, 1) - mean**2, 0.0))
+    observed = np.where(count > 0, 1e9 / (period + mean), rates)
+
+    zeros = np.zeros(len(ragged), dtype=np.int64)
+    columns = (
+        _segment_reduce(np.add, gaps, ragged).tolist(),
+        (_segment_reduce(np.add, gap_intervals, ragged) / 1e9).tolist(),
+        (_segment_reduce(np.maximum, gap_intervals, ragged) / 1e9).tolist(),
+        (
+            ragged.reordered_samples if ragged.reordered_samples is not None else zeros
+        ).tolist(),
+        (
+            ragged.duplicate_samples if ragged.duplicate_samples is not None else zeros
+        ).tolist(),
+        (jitter / 1e6).tolist(),
+        observed.tolist(),
+    )
+    return [
+        GapSummary.construct(**dict(zip(GapSummary.__fields__, row)))
+        if length
+        else None
+        for length, row in zip(lengths.tolist(), zip(*columns))
+    ]
+
+
+def ragged_activity_patterns(ragged: RaggedFrame) -> List[ActivityPatterns]:
+    """Inactivity periods of every session, found in one pass over the buffer."""
+    sessions = len(ragged)
+    lengths = ragged.lengths
+
+    # Runs of inactive samples that do not cross session boundaries
+    inactive = ragged.normalized_magnitude < INACTIVITY_THRESHOLD
+    boundary = np.zeros(len(inactive) + 1, dtype=bool)
+    boundary[ragged.offsets] = True
+    gaps = (
+        ragged.intervals()[1:]
+        > ragged.per_sample(gap_threshold_ns(ragged.sampling_rate_hz))[1:]
+    )
+    continues = inactive[:-1] & inactive[1:] & ~boundary[1:-1] & ~gaps
+    starts = np.flatnonzero(inactive & ~np.insert(continues, 0, False))
+    ends = np.flatnonzero(inactive & ~np.append(continues, False)) + 1
+
+    # Minimum run length per session, adjusted to its length
+    min_samples = np.minimum(
+        seconds_to_samples(MIN_INACTIVITY_SECONDS, ragged.sampling_rate_hz),
+        lengths // 5,
+    )
+    run_sessions = np.searchsorted(ragged.offsets, starts, side="right") - 1
+    keep = (ends - starts >= min_samples[run_sessions]) & (
+        lengths[run_sessions] >= MIN_PATTERN_SAMPLES
+    )
+    starts, ends, run_sessions = starts[keep], ends[keep], run_sessions[keep]
+
+    periods = inactivity_periods_from_bounds(
+        *run_time_bounds(ragged.timestamps, starts, ends)
+    )
+    bounds = np.searchsorted(run_sessions, np.arange(sessions + 1)).tolist()
+
+    # Steps are filtered per session so the filter never crosses a boundary
+    patterns = []
+    offsets = ragged.offsets.tolist()
+    for session, (begin, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+        bouts = []
+        if lengths[session] >= MIN_PATTERN_SAMPLES:
+            first, last = offsets[session], offsets[session + 1]
+            detector = StepDetector(ragged.sampling_rate_hz[session])
+            detector.update(ragged.timestamps[first:last], ragged.magnitude[first:last])
+            bouts = detector.bouts()
+        patterns.append(
+            ActivityPatterns.construct(
+                inactivity_periods=periods[begin:end],
+                activity_patterns=bouts,
+                step_count=sum(bout.step_count for bout in bouts),
+            )
+        )
+    return patterns
@@ -0,0 +1,159 @@
+"""Trailing rolling statistics over several window lengths in one pass.
+
+All windows share one cumulative sum of the values and one of their squares,
+so a mean or variance costs two lookups per evaluated sample whatever the
+window length. Maxima use the van Herk/Gil-Werman algorithm: prefix and
+suffix maxima of window-sized blocks give any window's maximum from two
+lookups. Windows that do not overlap take the maximum of each window directly.
+
+A window is evaluated at every sample, or only every ``step`` samples (e.g.
+at the end of back-to-back epochs when ``step`` equals its length). Like
+pandas' ``min_periods=1``, windows at the start of the recording are partial.
+``RollingEngine`` carries the trailing samples across chunks, so a recording
+fed in chunks gets the statistics of the whole recording.
+"""
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+ROLLING_STATS = ("mean", "var", "max")
+
+
+class RollingWindow(NamedTuple):
+    """A window of ``samples`` evaluated every ``step`` samples."""
+
+    samples: int
+    step: int = 1
+    stats: Tuple[str, ...] = ROLLING_STATS
+
+
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing rolling maximum with partial windows at the start.
+
+    Runs in linear time whatever the window length (van Herk/Gil-Werman).
+    """
+    count = len(values)
+    if count == 0 or window <= 1:
+        return values.astype(float, copy=True)
+
+    # Pad so that output j is the window padded[j : j + window], then to whole blocks
+    blocks = -(-(count + window - 1) // window)
+    padded = np.full(blocks * window, -np.inf)
+    padded[window - 1 : window - 1 + count] = values
+    padded = padded.reshape(blocks, window)
+    prefix = np.maximum.accumulate(padded, axis=1).ravel()
+    suffix = np.maximum.accumulate(padded[:, ::-1], axis=1)[:, ::-1].ravel()
+    return np.maximum(suffix[:count], prefix[window - 1 : window - 1 + count])
+
+
+class RollingEngine:
+    """Rolling statistics of several windows, fed chunk by chunk.
+
+    ``update`` returns, for every window, its statistics at the evaluation
+    points that fall in the chunk. State is the last ``max(samples) - 1``
+    samples.
+    """
+
+    def __init__(self, windows: Sequence[RollingWindow]) -> None:
+        self.windows = list(windows)
+        self.position = 0
+        self._tail = np.empty(0)
+        self._keep = max((window.samples for window in self.windows), default=1) - 1
+        self._need_squares = any("var" in window.stats for window in self.windows)
+        # Values are offset by the first sample so sums of squares stay small
+        self._shift: Optional[float] = None
+
+    def update(self, values: np.ndarray) -> List[Dict[str, np.ndarray]]:
+        """Add the next chunk and return each window's statistics within it."""
+        count = len(values)
+        data = np.concatenate((self._tail, values)) if len(self._tail) else values
+        # Global index of data[0]
+        origin = self.position - (len(data) - count)
+        if self._shift is None and count:
+            self._shift = float(values[0])
+
+        shifted = data - (self._shift or 0.0)
+        sums = _prefix_sums(shifted)
+        squares = None
+        if self._need_squares:
+            squares = _prefix_sums(np.square(shifted, out=shifted))
+        del shifted
+
+        results = [
+            self._window_stats(window, data, origin, sums, squares)
+            for window in self.windows
+        ]
+
+        self.position += count
+        self._tail = data[max(0, len(data) - self._keep) :].copy()
+        return results
+
+    def _window_stats(
+        self,
+        window: RollingWindow,
+        data: np.ndarray,
+        origin: int,
+        sums: np.ndarray,
+        squares: Optional[np.ndarray],
+    ) -> Dict[str, np.ndarray]:
+        # Evaluation points in this chunk, as exclusive ends within data
+        first = self.position + window.step - 1 - self.position % window.step
+        ends = range(first - origin + 1, len(data) + 1, window.step)
+
+        stats: Dict[str, np.ndarray] = {}
+        if "mean" in window.stats or "var" in window.stats:
+            mean = _window_means(sums, ends, window.samples)
+            if "var" in window.stats and squares is not None:
+                variance = _window_means(squares, ends, window.samples)
+                variance -= np.square(mean)
+                stats["var"] = np.maximum(variance, 0.0, out=variance)
+            if "mean" in window.stats:
+                mean += self._shift or 0.0
+                stats["mean"] = mean
+        if "max" in window.stats:
+            stats["max"] = self._window_max(window, data, ends)
+        return stats
+
+    @staticmethod
+    def _window_max(window: RollingWindow, data: np.ndarray, ends: range) -> np.ndarray:
+        if len(ends) == 0:
+            return np.empty(0)
+        if window.step < window.samples:
+            # Overlapping windows
+            maxima = rolling_max(data[: ends[-1]], window.samples)
+            return maxima[ends.start - 1 :: ends.step]
+        # Disjoint windows: reduce [start, end) pairs, skipping the gaps between
+        end_index = np.arange(ends.start, ends.stop, ends.step)
+        starts = np.maximum(end_index - window.samples, 0)
+        bounds = np.column_stack((starts, end_index)).ravel()[:-1]
+        return np.maximum.reduceat(data[: ends[-1]], bounds)[::2]
+
+
+def _window_means(prefix: np.ndarray, ends: range, samples: int) -> np.ndarray:
+    """Mean of the windows ending (exclusive) at ``ends`` from prefix sums.
+
+    Windows ending before ``samples`` are partial and start at 0; the rest
+    are strided slices of the prefix sums, so no index arrays are built.
+    """
+    means = np.empty(len(ends))
+    partial = len(range(ends.start, min(ends.stop, samples), ends.step))
+    if partial:
+        lengths = np.arange(ends.start, ends.start + partial * ends.step, ends.step)
+        means[:partial] = (prefix[lengths] - prefix[0]) / lengths
+    full = ends.start + partial * ends.step
+    if partial < len(means):
+        np.subtract(
+            prefix[full : ends.stop : ends.step],
+            prefix[full - samples : ends.stop - samples : ends.step],
+            out=means[partial:],
+        )
+        means[partial:] /= samples
+    return means
+
+
+def _prefix_sums(values: np.ndarray) -> np.ndarray:
+    """Cumulative sums with a leading zero, so window sums are differences."""
+    sums = np.empty(len(values) + 1)
+    sums[0] = 0.0
+    np.cumsum(values, out=sums[1:])
+    return sums
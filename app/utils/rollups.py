@@ -0,0 +1,190 @@
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.models.acceleration import InactivityPeriod, datetime_to_ns
+from app.utils.signal import SignalFrame
+from app.utils.timestamps import sample_seconds
+
+# Rollup bucket widths in seconds; buckets are aligned to UTC
+GRANULARITIES = {"minute": 60, "hour": 3600, "day": 86400}
+# Block rollups held by a RollupAccumulator before they are merged
+MERGE_BLOCKS = 64
+
+
+class Rollup(NamedTuple):
+    """Additive per-bucket aggregates of one or more sessions.
+
+    Every column except ``max_magnitude`` is a sum, so rollups of different
+    sessions (or of finer buckets) combine by adding them.
+    """
+
+    bucket_start: np.ndarray  # int64 epoch seconds
+    sample_count: np.ndarray
+    recorded_seconds: np.ndarray
+    magnitude_sum: np.ndarray
+    magnitude_sq_sum: np.ndarray
+    max_magnitude: np.ndarray
+    active_seconds: np.ndarray
+    inactivity_count: np.ndarray
+    inactivity_seconds: np.ndarray
+
+    def __len__(self) -> int:  # type: ignore[override]
+        return len(self.bucket_start)
+
+
+def _group(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sorted unique keys and the group index of every element.
+
+    Sorted keys (the usual case for timestamps) are grouped without sorting.
+    """
+    if np.all(keys[1:] >= keys[:-1]):
+        changed = np.concatenate(([len(keys) > 0], keys[1:] != keys[:-1]))
+        return keys[changed], np.cumsum(changed) - 1
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, inverse
+
+
+def rollup_session(
+    frame: SignalFrame,
+    active: np.ndarray,
+    inactivity_periods: List[InactivityPeriod],
+    bucket_seconds: int = GRANULARITIES["minute"],
+) -> Rollup:
+    """Aggregate a session's samples into fixed-width time buckets.
+
+    Inactivity periods are counted in the bucket where they start.
+    """
+    buckets = frame.timestamps // (bucket_seconds * 1_000_000_000)
+    keys, inverse = _group(buckets)
+    size = len(keys)
+
+    sample_count = np.bincount(inverse, minlength=size)
+    max_magnitude = np.full(size, -np.inf)
+    np.maximum.at(max_magnitude, inverse, frame.magnitude)
+    # Time each sample stands for, until the next sample
+    seconds = sample_seconds(frame.timestamps, frame.sampling_rate_hz, frame.next_ns)
+    inactivity_count, inactivity_seconds = _inactivity_columns(
+        keys, inactivity_periods, bucket_seconds
+    )
+
+    return Rollup(
+        bucket_start=keys * bucket_seconds,
+        sample_count=sample_count,
+        recorded_seconds=np.bincount(inverse, weights=seconds, minlength=size),
+        magnitude_sum=np.bincount(inverse, weights=frame.magnitude, minlength=size),
+        magnitude_sq_sum=np.bincount(
+            inverse, weights=np.square(frame.magnitude), minlength=size
+        ),
+        max_magnitude=max_magnitude,
+        active_seconds=np.bincount(inverse, weights=seconds * active, minlength=size),
+        inactivity_count=inactivity_count,
+        inactivity_seconds=inactivity_seconds,
+    )
+
+
+def _inactivity_columns(
+    keys: np.ndarray, inactivity_periods: List[InactivityPeriod], bucket_seconds: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Count and total duration of the periods starting in each bucket
+    period_starts = np.array(
+        [datetime_to_ns(period.start_time) for period in inactivity_periods],
+        dtype=np.int64,
+    )
+    period_buckets = np.searchsorted(
+        keys, period_starts // (bucket_seconds * 1_000_000_000)
+    )
+    period_seconds = np.array(
+        [period.duration for period in inactivity_periods], dtype=np.float64
+    )
+    return (
+        np.bincount(period_buckets, minlength=len(keys)),
+        np.bincount(period_buckets, weights=period_seconds, minlength=len(keys)),
+    )
+
+
+def combine_blocks(
+    blocks: List[Rollup],
+    inactivity_periods: List[InactivityPeriod],
+    bucket_seconds: int = GRANULARITIES["minute"],
+) -> Rollup:
+    """Rollup of a session analyzed in blocks, from the rollups of its blocks.
+
+    Buckets split across block edges are merged, and the session's inactivity
+    periods (which may span blocks) are counted once in the merged buckets.
+    """
+    merged = coarsen(
+        Rollup(*(np.concatenate(columns) for columns in zip(*blocks))), bucket_seconds
+    )
+    inactivity_count, inactivity_seconds = _inactivity_columns(
+        merged.bucket_start // bucket_seconds, inactivity_periods, bucket_seconds
+    )
+    fields = merged._asdict()
+    fields.update(
+        inactivity_count=inactivity_count, inactivity_seconds=inactivity_seconds
+    )
+    return Rollup(**fields)
+
+
+def coarsen(rollup: Rollup, bucket_seconds: int) -> Rollup:
+    """Merge a rollup into wider buckets, e.g. minutes into hours."""
+    keys, inverse = _group(rollup.bucket_start // bucket_seconds)
+    size = len(keys)
+    max_magnitude = np.full(size, -np.inf)
+    np.maximum.at(max_magnitude, inverse, rollup.max_magnitude)
+
+    def total(column: np.ndarray) -> np.ndarray:
+        summed = np.bincount(inverse, weights=column, minlength=size)
+        return summed.astype(column.dtype, copy=False)
+
+    return Rollup(
+        bucket_start=keys * bucket_seconds,
+        sample_count=total(rollup.sample_count),
+        recorded_seconds=total(rollup.recorded_seconds),
+        magnitude_sum=total(rollup.magnitude_sum),
+        magnitude_sq_sum=total(rollup.magnitude_sq_sum),
+        max_magnitude=max_magnitude,
+        active_seconds=total(rollup.active_seconds),
+        inactivity_count=total(rollup.inactivity_count),
+        inactivity_seconds=total(rollup.inactivity_seconds),
+    )
+
+
+class RollupAccumulator:
+    """Minute rollup of a recording whose frames arrive one at a time.
+
+    A frame is rolled up when the next one arrives, so its last sample counts
+    the time until the next frame, as in a rollup of the whole recording.
+    Block rollups are merged as they pile up, so the state grows with the
+    minutes recorded rather than the number of frames.
+    """
+
+    def __init__(self, bucket_seconds: int = GRANULARITIES["minute"]) -> None:
+        self.bucket_seconds = bucket_seconds
+        self._blocks: List[Rollup] = []
+        self._pending: Optional[Tuple[SignalFrame, np.ndarray]] = None
+
+    def update(self, frame: SignalFrame, active: np.ndarray) -> None:
+        """Add the next frame of the recording and its active mask."""
+        if len(frame) == 0:
+            return
+        if self._pending is not None:
+            pending, pending_active = self._pending
+            pending.next_ns = int(frame.timestamps[0])
+            self._add(rollup_session(pending, pending_active, [], self.bucket_seconds))
+        self._pending = (frame, active)
+
+    def rollup(self, inactivity_periods: List[InactivityPeriod]) -> Optional[Rollup]:
+        """Rollup of everything received, or None when nothing was."""
+        blocks = list(self._blocks)
+        if self._pending is not None:
+            frame, active = self._pending
+            blocks.append(rollup_session(frame, active, [], self.bucket_seconds))
+        if not blocks:
+            return None
+        return combine_blocks(blocks, inactivity_periods, self.bucket_seconds)
+
+    def _add(self, block: Rollup) -> None:
+        self._blocks.append(block)
+        if len(self._blocks) >= MERGE_BLOCKS:
+            self._blocks = [combine_blocks(self._blocks, [], self.bucket_seconds)]
@@ -0,0 +1,219 @@
+from dataclasses import dataclass
+from typing import Any, Iterator, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.models.acceleration import AccelerationData, SampleArrays
+
+# Earth's gravity is approximately 1.0 in normalized device values
+GRAVITY_OFFSET = 1.0
+# Rate assumed for windows in seconds when a recording has no usable rate
+DEFAULT_SAMPLING_RATE_HZ = 10
+
+
+@dataclass
+class SignalFrame:
+    """Array-backed accelerometer signal shared by the analysis stages."""
+
+    timestamps: np.ndarray  # int64 epoch nanoseconds
+    x: np.ndarray
+    y: np.ndarray
+    z: np.ndarray
+    magnitude: np.ndarray
+    normalized_magnitude: np.ndarray  # |magnitude - gravity|
+    sampling_rate_hz: float
+    # Samples moved or dropped by ``order_samples`` before the frame was built
+    reordered_samples: int = 0
+    duplicate_samples: int = 0
+    # Timestamp of the sample after the frame, when it is a block of a recording
+    next_ns: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.magnitude)
+
+
+class OrderedSamples(NamedTuple):
+    """Sample columns in timestamp order without repeated timestamps."""
+
+    arrays: SampleArrays
+    offsets: np.ndarray  # session bounds, as passed in but after dropping repeats
+    reordered_samples: np.ndarray  # per session, earlier than their predecessor
+    duplicate_samples: np.ndarray  # per session, dropped repeats
+
+
+def order_samples(
+    arrays: SampleArrays, offsets: Optional[Union[Sequence[int], np.ndarray]] = None
+) -> OrderedSamples:
+    """Sort samples by timestamp and drop repeated timestamps, per session.
+
+    ``offsets`` delimits concatenated sessions (one session by default),
+    which are ordered independently. Already increasing timestamps, the usual
+    case, are detected in one pass and returned without copying; only
+    out-of-order input is sorted (stably, so the first of repeated samples is
+    kept).
+    """
+    timestamps = arrays.timestamps
+    count = len(timestamps)
+    bounds = np.asarray([0, count] if offsets is None else offsets, dtype=np.int64)
+    sessions = len(bounds) - 1
+    reordered = np.zeros(sessions, dtype=np.int64)
+    duplicates = np.zeros(sessions, dtype=np.int64)
+    if count < 2:
+        return OrderedSamples(arrays, bounds, reordered, duplicates)
+
+    # Pairs of consecutive samples within one session
+    within = np.ones(count - 1, dtype=bool)
+    within[bounds[1:-1][bounds[1:-1] > 0] - 1] = False
+    steps = np.diff(timestamps)
+
+    def per_session(pairs: np.ndarray) -> np.ndarray:
+        # Session of the second sample of every flagged pair
+        session = np.searchsorted(bounds, np.flatnonzero(pairs) + 1, side="right")
+        return np.bincount(session - 1, minlength=sessions)
+
+    backwards = (steps < 0) & within
+    if backwards.any():
+        reordered = per_session(backwards)
+        session_ids = np.repeat(np.arange(sessions), np.diff(bounds))
+        order = np.lexsort((timestamps, session_ids))
+        arrays = SampleArrays(*(column[order] for column in arrays))
+        steps = np.diff(arrays.timestamps)
+
+    repeated = (steps == 0) & within
+    if repeated.any():
+        duplicates = per_session(repeated)
+        keep = np.insert(~repeated, 0, True)
+        arrays = SampleArrays(*(column[keep] for column in arrays))
+        bounds = bounds - np.insert(np.cumsum(duplicates), 0, 0)
+
+    return OrderedSamples(arrays, bounds, reordered, duplicates)
+
+
+def build_signal_frame(data: AccelerationData) -> SignalFrame:
+    """Convert accelerometer data into an ordered signal frame."""
+    ordered = order_samples(data.to_arrays())
+    return ordered_frame(ordered, data.sampling_rate_hz)
+
+
+def ordered_frame(ordered: OrderedSamples, sampling_rate_hz: float) -> SignalFrame:
+    """Signal frame of one session's ordered samples."""
+    frame = frame_from_arrays(ordered.arrays, sampling_rate_hz)
+    frame.reordered_samples = int(ordered.reordered_samples.sum())
+    frame.duplicate_samples = int(ordered.duplicate_samples.sum())
+    return frame
+
+
+def frame_from_arrays(arrays: SampleArrays, sampling_rate_hz: float) -> SignalFrame:
+    """Build a signal frame from sample columns."""
+    # Accumulate in float64 whatever the storage dtype of the axes
+    magnitude = np.square(arrays.x, dtype=np.float64)
+    magnitude += np.square(arrays.y, dtype=np.float64)
+    magnitude += np.square(arrays.z, dtype=np.float64)
+    np.sqrt(magnitude, out=magnitude)
+
+    return SignalFrame(
+        timestamps=arrays.timestamps,
+        x=arrays.x,
+        y=arrays.y,
+        z=arrays.z,
+        magnitude=magnitude,
+        normalized_magnitude=np.abs(magnitude - GRAVITY_OFFSET),
+        sampling_rate_hz=sampling_rate_hz,
+    )
+
+
+def find_runs(
+    mask: np.ndarray, breaks: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return start and (exclusive) end indices of the runs of True in a mask.
+
+    Samples marked in ``breaks`` start a new run, e.g. after a sampling gap.
+    """
+    padded = np.pad(mask, 1)
+    if breaks is None or not breaks.any():
+        edges = np.flatnonzero(padded[1:] != padded[:-1])
+        return edges[::2], edges[1::2]
+    continues = padded[:-2] & ~breaks
+    ends_here = np.append(~continues[1:], True)
+    return (
+        np.flatnonzero(mask & ~continues),
+        np.flatnonzero(mask & (ends_here | ~padded[2:])) + 1,
+    )
+
+
+def effective_rate_hz(sampling_rate_hz: float) -> float:
+    """The sampling rate, or ``DEFAULT_SAMPLING_RATE_HZ`` when it is not positive."""
+    return sampling_rate_hz if sampling_rate_hz > 0 else DEFAULT_SAMPLING_RATE_HZ
+
+
+def seconds_to_samples(seconds: float, sampling_rate_hz: Any) -> Any:
+    """Number of samples (at least one) spanning ``seconds`` at the given rate.
+
+    Accepts one rate or an array of per-session rates.
+    """
+    rates = np.asarray(sampling_rate_hz, dtype=np.float64)
+    rates = np.where(rates > 0, rates, DEFAULT_SAMPLING_RATE_HZ)
+    samples = np.maximum(1, np.rint(seconds * rates)).astype(np.int64)
+    return int(samples) if samples.ndim == 0 else samples
+
+
+def decimation_factor(sampling_rate_hz: float, target_rate_hz: float) -> int:
+    """Whole number of samples averaged into one by ``decimate_frame``."""
+    return int(sampling_rate_hz // target_rate_hz) if target_rate_hz else 0
+
+
+def decimate_frame(frame: SignalFrame, target_rate_hz: float) -> SignalFrame:
+    """Reduce a frame to about ``target_rate_hz`` by averaging blocks of samples.
+
+    The block mean is a boxcar low-pass filter, so activity above the new
+    Nyquist rate is averaged out rather than aliased. Magnitudes are averaged
+    per block (not recomputed from averaged axes), which keeps the mean
+    magnitude exact. Frames at or below the target rate are returned as is.
+    """
+    factor = decimation_factor(frame.sampling_rate_hz, target_rate_hz)
+    if factor < 2 or len(frame) == 0:
+        return frame
+
+    starts = np.arange(0, len(frame), factor)
+    counts = np.diff(np.append(starts, len(frame)))
+
+    def block_mean(values: np.ndarray) -> np.ndarray:
+        means: np.ndarray = np.add.reduceat(values, starts, dtype=np.float64) / counts
+        return means
+
+    return SignalFrame(
+        timestamps=frame.timestamps[starts],
+        x=block_mean(frame.x),
+        y=block_mean(frame.y),
+        z=block_mean(frame.z),
+        magnitude=block_mean(frame.magnitude),
+        normalized_magnitude=block_mean(frame.normalized_magnitude),
+        sampling_rate_hz=frame.sampling_rate_hz / factor,
+        reordered_samples=frame.reordered_samples,
+        duplicate_samples=frame.duplicate_samples,
+        next_ns=frame.next_ns,
+    )
+
+
+def iter_frame_blocks(
+    arrays: SampleArrays,
+    sampling_rate_hz: float,
+    block_samples: int,
+    target_rate_hz: float = 0.0,
+) -> Iterator[SignalFrame]:
+    """Signal frames of consecutive blocks of samples, in recording order.
+
+    Only one block's derived columns exist at a time. With ``target_rate_hz``
+    each block is decimated; blocks are aligned to the decimation factor so the
+    result matches decimating the whole recording.
+    """
+    factor = max(1, decimation_factor(sampling_rate_hz, target_rate_hz))
+    block_samples = max(factor, block_samples // factor * factor)
+    count = len(arrays.x)
+    for start in range(0, count, block_samples):
+        end = start + block_samples
+        block = SampleArrays(*(column[start:end] for column in arrays))
+        frame = frame_from_arrays(block, sampling_rate_hz)
+        if end < count:
+            frame.next_ns = int(arrays.timestamps[end])
+        yield decimate_frame(frame, target_rate_hz) if target_rate_hz else frame
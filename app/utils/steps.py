@@ -0,0 +1,178 @@
+"""Step counting and walking/running bout detection.
+
+The magnitude is band-passed around gait frequencies (0.5-4 Hz), which
+removes gravity and slow posture changes. Every positive lobe of the filtered
+signal (a run of samples above zero) whose peak reaches ``STEP_MIN_AMPLITUDE``
+is one step, timed at its peak. Steps closer than ``MAX_STEP_INTERVAL_SECONDS``
+form a bout; bouts of at least ``MIN_BOUT_STEPS`` steps are reported with
+their cadence and labeled running or walking by cadence.
+
+The filter is causal and its state, like an unfinished lobe or bout, is
+carried across chunks, so feeding a recording in chunks gives exactly the
+result of feeding it whole. Everything runs in linear time.
+"""
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from app.models.acceleration import ActivityBout, ns_to_datetime
+from app.utils.signal import SignalFrame, find_runs
+
+STEP_BAND_HZ = (0.5, 4.0)
+STEP_FILTER_ORDER = 2
+# Peak of the band-passed magnitude, in g, for a lobe to count as a step
+STEP_MIN_AMPLITUDE = 0.1
+MAX_STEP_INTERVAL_SECONDS = 1.2
+MIN_BOUT_STEPS = 10
+# Bouts at or above this cadence (steps per minute) are labeled running
+RUNNING_CADENCE_SPM = 140.0
+
+# (start_ns, end_ns, step_count) of a bout
+Bout = Tuple[int, int, int]
+
+
+def step_filter(sampling_rate_hz: float) -> Optional[np.ndarray]:
+    """Band-pass filter sections for the rate, None when it is too low for steps."""
+    if sampling_rate_hz <= 2 * STEP_BAND_HZ[1]:
+        return None
+    signal = _scipy_signal()
+    sos: np.ndarray = signal.butter(
+        STEP_FILTER_ORDER,
+        STEP_BAND_HZ,
+        btype="bandpass",
+        fs=sampling_rate_hz,
+        output="sos",
+    )
+    return sos
+
+
+def _scipy_signal() -> Any:
+    # SciPy takes a while to import, so it is loaded on first use (or by the
+    # warm-up, see app.services.warmup)
+    from scipy import signal
+
+    return signal
+
+
+class StepDetector:
+    """Incrementally detects steps and bouts in a magnitude signal."""
+
+    def __init__(self, sampling_rate_hz: float) -> None:
+        self.sampling_rate_hz = sampling_rate_hz
+        self._sos = step_filter(sampling_rate_hz)
+        self._zi: Optional[np.ndarray] = None
+        self._max_gap_ns = int(MAX_STEP_INTERVAL_SECONDS * 1e9)
+
+        # Peak (value, timestamp) of the lobe still open at the end of the last chunk
+        self._open_lobe: Optional[Tuple[float, int]] = None
+        self._closed_bouts: List[Bout] = []
+        self._open_bout: Optional[Bout] = None
+
+    def update(self, timestamps: np.ndarray, magnitude: np.ndarray) -> None:
+        """Add the next chunk of the recording."""
+        if self._sos is None or len(magnitude) == 0:
+            return
+
+        # Start from the steady state of the first sample so gravity causes no
+        # transient
+        signal = _scipy_signal()
+        if self._zi is None:
+            self._zi = signal.sosfilt_zi(self._sos) * magnitude[0]
+        filtered, self._zi = signal.sosfilt(self._sos, magnitude, zi=self._zi)
+
+        self._add_steps(self._lobe_peaks(timestamps, filtered))
+
+    def bouts(self) -> List[ActivityBout]:
+        """Bouts of everything received so far, in recording order."""
+        bouts = self._closed_bouts
+        if self._open_bout is not None and self._open_bout[2] >= MIN_BOUT_STEPS:
+            bouts = bouts + [self._open_bout]
+        return [_activity_bout(*bout) for bout in bouts]
+
+    def _lobe_peaks(self, timestamps: np.ndarray, filtered: np.ndarray) -> np.ndarray:
+        """Timestamps of the steps among the lobes closed by this chunk."""
+        starts, ends = find_runs(filtered > 0)
+        if len(starts) == 0:
+            peaks = np.empty(0)
+            peak_ns = np.empty(0, dtype=np.int64)
+        else:
+            # Peak value and (first) peak position of every lobe
+            lengths = ends - starts
+            positive = filtered[filtered > 0]
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            peaks = np.maximum.reduceat(positive, offsets)
+            at_peak = np.flatnonzero(positive == np.repeat(peaks, lengths))
+            lobe = np.searchsorted(offsets, at_peak, side="right") - 1
+            first = at_peak[np.concatenate(([True], lobe[1:] != lobe[:-1]))]
+            peak_ns = timestamps[starts + (first - offsets)]
+
+        # A lobe touching the chunk start continues the open lobe
+        closed: List[Tuple[float, int]] = []
+        if self._open_lobe is not None:
+            if len(starts) and starts[0] == 0:
+                if self._open_lobe[0] >= peaks[0]:
+                    peaks[0], peak_ns[0] = self._open_lobe
+            else:
+                closed.append(self._open_lobe)
+            self._open_lobe = None
+
+        # A lobe touching the chunk end may continue in the next chunk
+        last = len(starts)
+        if len(ends) and ends[-1] == len(filtered):
+            last -= 1
+            self._open_lobe = (float(peaks[last]), int(peak_ns[last]))
+
+        closed_peaks = np.array([peak for peak, _ in closed] + peaks[:last].tolist())
+        closed_ns = np.array(
+            [ns for _, ns in closed] + peak_ns[:last].tolist(), dtype=np.int64
+        )
+        step_ns: np.ndarray = closed_ns[closed_peaks >= STEP_MIN_AMPLITUDE]
+        return step_ns
+
+    def _add_steps(self, step_ns: np.ndarray) -> None:
+        if len(step_ns) == 0:
+            return
+
+        # Groups of steps with no gap longer than the maximum step interval
+        breaks = np.flatnonzero(np.diff(step_ns) > self._max_gap_ns) + 1
+        starts = np.insert(breaks, 0, 0)
+        ends = np.append(breaks, len(step_ns))
+        groups = [
+            (int(step_ns[start]), int(step_ns[end - 1]), int(end - start))
+            for start, end in zip(starts.tolist(), ends.tolist())
+        ]
+
+        # The first group continues the open bout when it follows closely
+        if self._open_bout is not None:
+            open_start, open_end, open_steps = self._open_bout
+            if groups[0][0] - open_end <= self._max_gap_ns:
+                start, end, steps = groups[0]
+                groups[0] = (open_start, end, open_steps + steps)
+            else:
+                groups.insert(0, self._open_bout)
+
+        self._open_bout = groups.pop()
+        self._closed_bouts.extend(
+            group for group in groups if group[2] >= MIN_BOUT_STEPS
+        )
+
+
+def _activity_bout(start_ns: int, end_ns: int, step_count: int) -> ActivityBout:
+    duration = (end_ns - start_ns) / 1e9
+    # Cadence from the intervals between the bout's steps
+    cadence = 60.0 * (step_count - 1) / duration if duration > 0 else 0.0
+    return ActivityBout(
+        activity="running" if cadence >= RUNNING_CADENCE_SPM else "walking",
+        start_time=ns_to_datetime(start_ns),
+        end_time=ns_to_datetime(end_ns),
+        duration=duration,
+        step_count=step_count,
+        cadence=cadence,
+    )
+
+
+def detect_activity_bouts(frame: SignalFrame) -> List[ActivityBout]:
+    """Walking and running bouts of a signal frame."""
+    detector = StepDetector(frame.sampling_rate_hz)
+    detector.update(frame.timestamps, frame.magnitude)
+    return detector.bouts()
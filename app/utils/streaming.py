@@ -0,0 +1,280 @@
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.models.acceleration import (
+    ActivityMetrics,
+    ActivityPatterns,
+    SampleArrays,
+    sample_dtype,
+)
+from app.utils.metrics import (
+    ACTIVE_THRESHOLD,
+    EpochTotals,
+    active_window,
+    summarize_activity,
+)
+from app.utils.patterns import (
+    INACTIVITY_THRESHOLD,
+    MIN_PATTERN_SAMPLES,
+    find_runs,
+    inactivity_periods_from_bounds,
+    min_inactivity_run,
+    run_time_bounds,
+)
+from app.utils.rolling import RollingEngine
+from app.utils.signal import GRAVITY_OFFSET, SignalFrame
+from app.utils.steps import StepDetector
+from app.utils.timestamps import GapTotals, sample_period_ns, sample_seconds
+
+# (start_ns, end_ns, sample_count) of an inactivity run
+InactivityRun = Tuple[int, int, int]
+
+
+class ActivityAccumulator:
+    """Incrementally computes activity metrics and inactivity periods.
+
+    Frames are fed in recording order with ``update``. State is constant in the
+    recording length (apart from the inactivity periods that are reported), and
+    ``metrics``/``patterns`` match the batch functions on the concatenated signal.
+    """
+
+    def __init__(
+        self, sampling_rate_hz: float, epoch_seconds: Sequence[float] = ()
+    ) -> None:
+        self.sampling_rate_hz = sampling_rate_hz
+        self.sample_count = 0
+        self._min_run = min_inactivity_run(sampling_rate_hz)
+
+        # Welford mean/variance of the magnitude, merged chunk by chunk
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._max = -np.inf
+        self._first_ns: Optional[int] = None
+        self._last_ns: Optional[int] = None
+
+        # The activity window and every epoch length share one rolling pass,
+        # which keeps the trailing magnitudes needed to continue it
+        self._epochs = [
+            EpochTotals(seconds, sampling_rate_hz) for seconds in epoch_seconds
+        ]
+        self._rolling = RollingEngine(
+            [active_window(sampling_rate_hz)] + [epoch.window for epoch in self._epochs]
+        )
+        self._active_seconds = 0.0
+        # Whether the last sample so far is active; its time depends on the next
+        self._last_active = False
+        self._previous_ns = 0
+        self._gaps = GapTotals(sampling_rate_hz)
+
+        # Closed inactivity runs and the run still open at the end of the last chunk
+        self._closed_runs: List[InactivityRun] = []
+        self._open_run: Optional[InactivityRun] = None
+        # Closed runs handed out by take_closed_inactivity_runs
+        self._taken_runs = 0
+
+        self._steps = StepDetector(sampling_rate_hz)
+
+    def update(self, frame: SignalFrame) -> np.ndarray:
+        """Add the next chunk of the recording.
+
+        Returns which samples of the chunk are active (see ``active_mask``).
+        """
+        self._gaps.reordered_samples += frame.reordered_samples
+        self._gaps.duplicate_samples += frame.duplicate_samples
+        count = len(frame)
+        if count == 0:
+            return np.zeros(0, dtype=bool)
+
+        magnitude = frame.magnitude
+        self._update_moments(magnitude)
+        self._update_time_range(frame.timestamps)
+        gaps = self._gaps.update(frame.timestamps)
+        active = self._update_active_samples(frame)
+        self._update_inactivity_runs(frame, gaps)
+        self._steps.update(frame.timestamps, magnitude)
+
+        # Once the recording reaches 5 minimum runs the minimum run length is
+        # fixed, so shorter closed runs can never be reported; later runs are
+        # filtered as they close
+        if self.sample_count < 5 * self._min_run <= self.sample_count + count:
+            taken = self._closed_runs[: self._taken_runs]
+            self._taken_runs = sum(run[2] >= self._min_run for run in taken)
+            self._closed_runs = [
+                run for run in self._closed_runs if run[2] >= self._min_run
+            ]
+        self.sample_count += count
+        return active
+
+    def metrics(self) -> ActivityMetrics:
+        """Activity metrics for everything received so far."""
+        if self._first_ns is None or self._last_ns is None:
+            return ActivityMetrics(
+                avg_intensity=0.0,
+                peak_intensity=0.0,
+                movement_consistency=0.0,
+                active_minutes=0.0,
+                total_duration=0.0,
+            )
+
+        variance = self._m2 / (self.sample_count - 1) if self.sample_count > 1 else 0.0
+        # The last sample so far counts one sample period
+        last_seconds = float(sample_period_ns(self.sampling_rate_hz)) / 1e9
+        return summarize_activity(
+            avg_magnitude=self._mean,
+            max_magnitude=self._max,
+            magnitude_variance=variance,
+            duration_seconds=(self._last_ns - self._first_ns) / 1e9,
+            active_seconds=self._active_seconds + self._last_active * last_seconds,
+            epochs=[epoch.metrics() for epoch in self._epochs],
+            gaps=self._gaps.summary(),
+        )
+
+    def patterns(self) -> ActivityPatterns:
+        """Activity patterns for everything received so far."""
+        if self.sample_count < MIN_PATTERN_SAMPLES:
+            return ActivityPatterns(inactivity_periods=[])
+
+        min_samples = min(self._min_run, self.sample_count // 5)
+        runs = self._closed_runs + ([self._open_run] if self._open_run else [])
+        runs = [run for run in runs if run[2] >= min_samples]
+
+        bouts = self._steps.bouts()
+        return ActivityPatterns(
+            inactivity_periods=inactivity_periods_from_bounds(
+                [run[0] for run in runs], [run[1] for run in runs]
+            ),
+            activity_patterns=bouts,
+            step_count=sum(bout.step_count for bout in bouts),
+        )
+
+    def take_closed_inactivity_runs(self) -> List[InactivityRun]:
+        """Inactivity runs closed since the last call, which can no longer change.
+
+        Only runs of at least the minimum run length are returned, so every
+        one of them is also in the final ``patterns``. Costs the number of
+        runs closed since the last call, however long the recording is.
+        """
+        runs = self._closed_runs[self._taken_runs :]
+        self._taken_runs = len(self._closed_runs)
+        return [run for run in runs if run[2] >= self._min_run]
+
+    def _update_moments(self, magnitude: np.ndarray) -> None:
+        count = len(magnitude)
+        chunk_mean = magnitude.mean()
+        chunk_m2 = ((magnitude - chunk_mean) ** 2).sum()
+
+        total = self.sample_count + count
+        delta = chunk_mean - self._mean
+        self._mean += delta * count / total
+        self._m2 += chunk_m2 + delta**2 * self.sample_count * count / total
+        self._max = max(self._max, magnitude.max())
+
+    def _update_time_range(self, timestamps: np.ndarray) -> None:
+        first, last = int(timestamps.min()), int(timestamps.max())
+        self._first_ns = first if self._first_ns is None else min(self._first_ns, first)
+        self._last_ns = last if self._last_ns is None else max(self._last_ns, last)
+
+    def _update_active_samples(self, frame: SignalFrame) -> np.ndarray:
+        active_stats, *epoch_stats = self._rolling.update(frame.magnitude)
+        active = active_stats["mean"] > GRAVITY_OFFSET + ACTIVE_THRESHOLD
+        for epoch, stats in zip(self._epochs, epoch_stats):
+            epoch.add(stats)
+
+        # The previous chunk's last sample lasts until this chunk's first
+        timestamps = frame.timestamps
+        if self._last_active:
+            previous = sample_seconds(
+                np.array([self._previous_ns]),
+                self.sampling_rate_hz,
+                next_ns=int(timestamps[0]),
+            )
+            self._active_seconds += float(previous[0])
+        seconds = sample_seconds(timestamps, self.sampling_rate_hz)
+        self._active_seconds += float(np.dot(seconds[:-1], active[:-1]))
+        self._last_active = bool(active[-1])
+        self._previous_ns = int(timestamps[-1])
+        return active
+
+    def _update_inactivity_runs(self, frame: SignalFrame, gaps: np.ndarray) -> None:
+        inactive = frame.normalized_magnitude < INACTIVITY_THRESHOLD
+        starts, ends = find_runs(inactive, gaps)
+        start_ns, end_ns = run_time_bounds(frame.timestamps, starts, ends)
+        lengths = ends - starts
+
+        last_run = len(starts)
+
+        runs_final = self.sample_count + len(frame) >= 5 * self._min_run
+
+        # A run touching the chunk start continues the open run, unless a gap
+        # separates them
+        if self._open_run is not None:
+            if len(starts) and starts[0] == 0 and not gaps[0]:
+                open_start, open_end, open_count = self._open_run
+                start_ns[0] = min(open_start, start_ns[0])
+                end_ns[0] = max(open_end, end_ns[0])
+                lengths[0] += open_count
+            elif not runs_final or self._open_run[2] >= self._min_run:
+                self._closed_runs.append(self._open_run)
+            self._open_run = None
+
+        # A run touching the chunk end may continue in the next chunk
+        if len(ends) and ends[-1] == len(frame):
+            last_run -= 1
+            self._open_run = (
+                int(start_ns[last_run]),
+                int(end_ns[last_run]),
+                int(lengths[last_run]),
+            )
+
+        closed = np.arange(last_run)
+        if runs_final:
+            closed = closed[lengths[closed] >= self._min_run]
+        self._closed_runs.extend(
+            zip(
+                start_ns[closed].tolist(),
+                end_ns[closed].tolist(),
+                lengths[closed].tolist(),
+            )
+        )
+
+
+class SampleRing:
+    """The last ``capacity`` samples of a stream, in preallocated columns."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, capacity)
+        self._columns = SampleArrays(
+            timestamps=np.empty(self.capacity, dtype=np.int64),
+            x=np.empty(self.capacity, dtype=sample_dtype()),
+            y=np.empty(self.capacity, dtype=sample_dtype()),
+            z=np.empty(self.capacity, dtype=sample_dtype()),
+        )
+        # Samples written so far; the next one goes to written % capacity
+        self._written = 0
+
+    def __len__(self) -> int:
+        return min(self._written, self.capacity)
+
+    def extend(self, arrays: SampleArrays) -> None:
+        """Append samples, overwriting the oldest ones."""
+        count = len(arrays.x)
+        kept = min(count, self.capacity)
+        start = (self._written + count - kept) % self.capacity
+        # At most two slices: up to the end of the buffer, then from its start
+        first = min(kept, self.capacity - start)
+        for column, values in zip(self._columns, arrays):
+            values = values[count - kept :]
+            column[start : start + first] = values[:first]
+            column[: kept - first] = values[first:]
+        self._written += count
+
+    def arrays(self) -> SampleArrays:
+        """Copy of the samples held, oldest first."""
+        start = self._written % self.capacity if self._written > self.capacity else 0
+        return SampleArrays(
+            *(
+                np.concatenate((column[start : len(self)], column[:start]))
+                for column in self._columns
+            )
+        )
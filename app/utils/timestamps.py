@@ -0,0 +1,128 @@
+"""Sampling gaps, clock jitter and per-sample durations of ordered timestamps.
+
+Uploads have Bluetooth dropouts and jittery clocks. An interval between two
+samples longer than ``gap_threshold_ns`` is a gap. Every sample stands for
+the time until the next one (``sample_seconds``), so active minutes follow
+the actual sampling; the sample before a gap, and the last sample, count one
+nominal sample period instead. Inactivity runs are split at gaps.
+
+Timestamps must be ordered (see ``order_samples``); everything here is a
+single pass over them.
+"""
+from typing import Optional, Union
+
+import numpy as np
+
+from app.models.acceleration import GapSummary
+from app.utils.signal import DEFAULT_SAMPLING_RATE_HZ
+
+# An interval is a gap when it exceeds both of these
+GAP_MIN_SECONDS = 1.0
+GAP_MIN_PERIODS = 5
+
+
+def sample_period_ns(sampling_rate_hz: Union[float, np.ndarray]) -> np.ndarray:
+    """Nominal sample period in nanoseconds, for one rate or an array of rates."""
+    rates = np.asarray(sampling_rate_hz, dtype=np.float64)
+    period: np.ndarray = 1e9 / np.where(rates > 0, rates, DEFAULT_SAMPLING_RATE_HZ)
+    return period
+
+
+def gap_threshold_ns(sampling_rate_hz: Union[float, np.ndarray]) -> np.ndarray:
+    """Longest interval between samples that is not a gap."""
+    threshold: np.ndarray = np.maximum(
+        GAP_MIN_SECONDS * 1e9, GAP_MIN_PERIODS * sample_period_ns(sampling_rate_hz)
+    )
+    return threshold
+
+
+def sample_seconds(
+    timestamps: np.ndarray, sampling_rate_hz: float, next_ns: Optional[int] = None
+) -> np.ndarray:
+    """Time each sample stands for, in seconds.
+
+    ``next_ns`` is the timestamp of the sample following the last one, when
+    the frame is a chunk of a longer recording.
+    """
+    period = float(sample_period_ns(sampling_rate_hz))
+    seconds = np.empty(len(timestamps))
+    if len(timestamps) == 0:
+        return seconds
+    np.subtract(timestamps[1:], timestamps[:-1], out=seconds[:-1])
+    seconds[-1] = period if next_ns is None else next_ns - timestamps[-1]
+    seconds[seconds > gap_threshold_ns(sampling_rate_hz)] = period
+    seconds /= 1e9
+    return seconds
+
+
+def gap_after(timestamps: np.ndarray, sampling_rate_hz: float) -> np.ndarray:
+    """Whether each interval between consecutive samples is a gap."""
+    gaps: np.ndarray = np.diff(timestamps) > gap_threshold_ns(sampling_rate_hz)
+    return gaps
+
+
+class GapTotals:
+    """Running gap and jitter statistics of ordered timestamps, fed in chunks.
+
+    Jitter is the standard deviation of the intervals that are not gaps,
+    accumulated as sums of their deviation from the nominal period.
+    """
+
+    def __init__(self, sampling_rate_hz: float) -> None:
+        self.sampling_rate_hz = sampling_rate_hz
+        self._period = float(sample_period_ns(sampling_rate_hz))
+        self._threshold = float(gap_threshold_ns(sampling_rate_hz))
+        self._last_ns: Optional[int] = None
+        self.gap_count = 0
+        self.gap_ns = 0
+        self.longest_gap_ns = 0
+        self._intervals = 0
+        self._deviation_sum = 0.0
+        self._deviation_sq_sum = 0.0
+        self.reordered_samples = 0
+        self.duplicate_samples = 0
+
+    def update(self, timestamps: np.ndarray) -> np.ndarray:
+        """Add the next chunk; returns whether a gap precedes each of its samples."""
+        if len(timestamps) == 0:
+            return np.zeros(0, dtype=bool)
+        previous = (
+            timestamps[:1] if self._last_ns is None else np.array([self._last_ns])
+        )
+        intervals = np.diff(timestamps, prepend=previous)
+        gaps: np.ndarray = intervals > self._threshold
+
+        gap_intervals = intervals[gaps]
+        if len(gap_intervals):
+            self.gap_count += len(gap_intervals)
+            self.gap_ns += int(gap_intervals.sum())
+            self.longest_gap_ns = max(self.longest_gap_ns, int(gap_intervals.max()))
+
+        # The first sample of the recording has no interval before it
+        deviations = intervals[~gaps][1 if self._last_ns is None else 0 :]
+        deviations = deviations - self._period
+        self._intervals += len(deviations)
+        self._deviation_sum += float(deviations.sum())
+        self._deviation_sq_sum += float(np.square(deviations).sum())
+
+        self._last_ns = int(timestamps[-1])
+        return gaps
+
+    def summary(self) -> GapSummary:
+        mean = self._deviation_sum / max(self._intervals, 1)
+        variance = max(
+            self._deviation_sq_sum / max(self._intervals, 1) - mean**2, 0.0
+        )
+        return GapSummary(
+            gap_count=self.gap_count,
+            gap_seconds=self.gap_ns / 1e9,
+            longest_gap_seconds=self.longest_gap_ns / 1e9,
+            reordered_samples=self.reordered_samples,
+            duplicate_samples=self.duplicate_samples,
+            jitter_ms=float(np.sqrt(variance)) / 1e6,
+            observed_rate_hz=(
+                1e9 / (self._period + mean)
+                if self._intervals
+                else self.sampling_rate_hz
+            ),
+        )
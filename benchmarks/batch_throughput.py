@@ -0,0 +1,65 @@
+"""Compare N single /analyze calls against one /analyze/batch call.
+
+Usage: python -m benchmarks.batch_throughput --sessions 500 --seconds 60
+"""
+import argparse
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+from app.api import routes
+from app.main import app
+from app.models.analysis import AnalysisRequest
+from benchmarks.generators import PROFILES, generate_session
+
+
+def make_session(index: int, seconds: int, rate_hz: int) -> dict:
+    """A short session as the backend would post it."""
+    profile = PROFILES[index % len(PROFILES)]
+    data = generate_session(profile, rate_hz, seconds, seed=index)
+    request = AnalysisRequest(acceleration_data=data, user_id=f"user-{index}")
+    return json.loads(request.json())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--rate-hz", type=int, default=10)
+    args = parser.parse_args()
+
+    sessions = [
+        make_session(index, args.seconds, args.rate_hz)
+        for index in range(args.sessions)
+    ]
+    # Both passes analyze the same sessions, so the cache would skew the batch
+    routes.analysis_service.cache = None
+    client = TestClient(app)
+
+    start = time.perf_counter()
+    for session in sessions:
+        assert client.post("/analyze", json=session).status_code == 200
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    response = client.post("/analyze/batch", json={"requests": sessions})
+    assert response.status_code == 200
+    batch_seconds = time.perf_counter() - start
+
+    print(
+        json.dumps(
+            {
+                "sessions": args.sessions,
+                "samples_per_session": args.seconds * args.rate_hz,
+                "single_calls_per_second": args.sessions / single_seconds,
+                "batch_sessions_per_second": args.sessions / batch_seconds,
+                "speedup": single_seconds / batch_seconds,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
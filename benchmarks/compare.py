@@ -0,0 +1,50 @@
+"""Compare two benchmark result files and flag regressions.
+
+Usage: python -m benchmarks.compare baseline.json results.json --threshold 0.1
+
+Exits with status 1 when any stage's median latency grew by more than the
+threshold (default 10%).
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Tuple
+
+
+def load(path: str) -> Dict[Tuple[str, str], dict]:
+    with open(path) as f:
+        report = json.load(f)
+    return {(r["case"], r["stage"]): r for r in report["results"]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    regressions = 0
+
+    print(
+        f"{'case':28} {'stage':14} {'baseline ms':>12} {'candidate ms':>12} {'ratio':>7}"
+    )
+    for key in sorted(baseline.keys() & candidate.keys()):
+        before = baseline[key]["median_seconds"]
+        after = candidate[key]["median_seconds"]
+        ratio = after / before
+        flag = ""
+        if ratio > 1 + args.threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(
+            f"{key[0]:28} {key[1]:14} {before * 1e3:12.2f} {after * 1e3:12.2f}"
+            f" {ratio:7.2f}{flag}"
+        )
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
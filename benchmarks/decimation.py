@@ -0,0 +1,77 @@
+"""Speed-up and metric drift of decimating recordings before analysis.
+
+Usage: python -m benchmarks.decimation --target-hz 10 --seconds 3600
+
+For each profile and recording rate, metrics and patterns are computed on the
+full-rate frame and on the frame decimated to ``--target-hz`` (the decimation
+itself is included in the timing). Drift is the absolute difference of each
+metric and of the total inactivity time.
+"""
+import argparse
+import json
+
+from app.utils.metrics import calculate_activity_metrics
+from app.utils.patterns import detect_activity_patterns
+from app.utils.signal import build_signal_frame, decimate_frame
+from benchmarks.generators import PROFILES, generate_session
+from benchmarks.run import measure
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--target-hz", type=float, default=10.0)
+    parser.add_argument("--rates", type=int, nargs="+", default=[50, 100, 200])
+    parser.add_argument("--seconds", type=int, default=3600)
+    parser.add_argument("--min-time", type=float, default=0.5)
+    args = parser.parse_args()
+
+    results = []
+    for profile in PROFILES:
+        for rate_hz in args.rates:
+            data = generate_session(profile, rate_hz, args.seconds, seed=0)
+            frame = build_signal_frame(data)
+
+            def analyze_full():
+                return (
+                    calculate_activity_metrics(data, frame),
+                    detect_activity_patterns(data, frame),
+                )
+
+            def analyze_decimated():
+                decimated = decimate_frame(frame, args.target_hz)
+                return (
+                    calculate_activity_metrics(data, decimated),
+                    detect_activity_patterns(data, decimated),
+                )
+
+            full_timing = measure(analyze_full, args.min_time)
+            decimated_timing = measure(analyze_decimated, args.min_time)
+            full_metrics, full_patterns = analyze_full()
+            metrics, patterns = analyze_decimated()
+
+            drift = {
+                field: abs(getattr(metrics, field) - value)
+                for field, value in full_metrics.dict().items()
+            }
+            drift["inactivity_seconds"] = abs(
+                sum(period.duration for period in patterns.inactivity_periods)
+                - sum(period.duration for period in full_patterns.inactivity_periods)
+            )
+            results.append(
+                {
+                    "profile": profile,
+                    "rate_hz": rate_hz,
+                    "samples": len(frame),
+                    "full_seconds": full_timing["median_seconds"],
+                    "decimated_seconds": decimated_timing["median_seconds"],
+                    "speedup": full_timing["median_seconds"]
+                    / decimated_timing["median_seconds"],
+                    "drift": drift,
+                }
+            )
+
+    print(json.dumps({"target_hz": args.target_hz, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Import time of the application, from ``python -X importtime``.
+
+Usage: python -m benchmarks.import_time --output import_time.json
+       python -m benchmarks.compare baseline.json import_time.json
+
+Each run imports ``--module`` in a fresh interpreter. The total is the
+cumulative time of the module; the slowest direct and indirect imports are
+listed to show where the time goes. Results use the ``benchmarks.run`` format,
+so ``benchmarks.compare`` flags regressions.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from benchmarks.run import git_commit
+
+
+def import_times(module: str) -> Dict[str, float]:
+    """Cumulative import seconds of every module imported by ``module``."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    # Lines read "import time: self [us] | cumulative | imported package"
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", help="Write machine-readable results here")
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.repeats)]
+    totals: List[float] = [run[args.module] for run in runs]
+
+    # Median per module over the runs that imported it
+    modules = {name for run in runs for name in run if name != args.module}
+    slowest = sorted(
+        (
+            (statistics.median(run[name] for run in runs if name in run), name)
+            for name in modules
+        ),
+        reverse=True,
+    )[: args.top]
+    for seconds, name in slowest:
+        print(f"{name:50} {seconds * 1e3:10.1f} ms")
+    print(f"{args.module:50} {statistics.median(totals) * 1e3:10.1f} ms total")
+
+    report = {
+        "meta": {
+            "suite": "import_time",
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "results": [
+            {
+                "case": "import",
+                "stage": args.module,
+                "median_seconds": statistics.median(totals),
+                "min_seconds": min(totals),
+                "repeats": len(totals),
+                "slowest_imports": {name: seconds for seconds, name in slowest},
+            }
+        ],
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
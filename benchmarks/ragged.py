@@ -0,0 +1,76 @@
+"""Compare per-session analysis with the ragged multi-session path.
+
+Usage: python -m benchmarks.ragged --sessions 2000 --seconds 60
+"""
+import argparse
+import json
+import time
+
+from app.models.analysis import AnalysisRequest
+from app.services.analysis import AnalysisService, analyze_sessions
+from app.utils.metrics import calculate_activity_metrics
+from app.utils.patterns import detect_activity_patterns
+from app.utils.ragged import (
+    ragged_activity_metrics,
+    ragged_activity_patterns,
+    ragged_from_sessions,
+)
+from benchmarks.generators import PROFILES, generate_session
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--rate-hz", type=int, default=10)
+    args = parser.parse_args()
+
+    sessions = [
+        generate_session(
+            PROFILES[index % len(PROFILES)], args.rate_hz, args.seconds, seed=index
+        )
+        for index in range(args.sessions)
+    ]
+    requests = [
+        AnalysisRequest(acceleration_data=data, user_id="benchmark")
+        for data in sessions
+    ]
+    service = AnalysisService()
+
+    def stages_per_session():
+        for data in sessions:
+            calculate_activity_metrics(data)
+            detect_activity_patterns(data)
+
+    def stages_ragged():
+        ragged = ragged_from_sessions(sessions)
+        ragged_activity_metrics(ragged)
+        ragged_activity_patterns(ragged)
+
+    results = {
+        "sessions": args.sessions,
+        "samples_per_session": args.seconds * args.rate_hz,
+        "stages_per_session_seconds": timed(stages_per_session),
+        "stages_ragged_seconds": timed(stages_ragged),
+        "analyze_per_session_seconds": timed(
+            lambda: [service.analyze(request) for request in requests]
+        ),
+        "analyze_sessions_seconds": timed(lambda: analyze_sessions(sessions)),
+    }
+    results["stages_speedup"] = (
+        results["stages_per_session_seconds"] / results["stages_ragged_seconds"]
+    )
+    results["analyze_speedup"] = (
+        results["analyze_per_session_seconds"] / results["analyze_sessions_seconds"]
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
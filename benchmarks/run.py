@@ -0,0 +1,224 @@
+"""Benchmark the analysis hot paths across profiles, sampling rates and durations.
+
+Usage:
+    python -m benchmarks.run --suite standard --output results.json
+    python -m benchmarks.compare baseline.json results.json
+
+Each stage is timed until ``--min-time`` seconds have elapsed (median and min
+are reported), then run once more under tracemalloc for peak memory.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.models.analysis import AnalysisRequest
+from app.services.analysis import AnalysisService, build_response
+from app.utils.binary import decode_analysis_request, encode_analysis_request
+from app.utils.metrics import calculate_activity_metrics
+from app.utils.patterns import detect_activity_patterns
+from app.utils.signal import build_signal_frame
+from benchmarks.generators import PROFILES, generate_session
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# (sampling rate in Hz, duration in seconds) per suite; every profile runs each
+SUITES: Dict[str, List[Tuple[int, int]]] = {
+    "quick": [(10, MINUTE), (50, 10 * MINUTE)],
+    "standard": [(10, 10 * MINUTE), (50, HOUR), (100, HOUR)],
+    "full": [(10, 10 * MINUTE), (50, HOUR), (100, HOUR), (10, DAY), (50, DAY)],
+}
+
+STAGES = (
+    "validation",
+    "binary_decode",
+    "signal_frame",
+    "metrics",
+    "patterns",
+    "insights",
+    "end_to_end",
+    "end_to_end_budget",
+    "http",
+)
+
+
+def measure(
+    fn: Callable[[], Any], min_time: float, max_repeats: int = 50
+) -> Dict[str, float]:
+    """Time ``fn`` repeatedly, then once more for peak traced memory."""
+    timings = []
+    deadline = time.perf_counter() + min_time
+    while not timings or (
+        time.perf_counter() < deadline and len(timings) < max_repeats
+    ):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_seconds": statistics.median(timings),
+        "min_seconds": min(timings),
+        "repeats": len(timings),
+        "peak_memory_bytes": peak,
+    }
+
+
+def stage_functions(
+    profile: str,
+    rate_hz: int,
+    duration_seconds: int,
+    http_max_samples: int,
+    memory_budget_bytes: int = 16 * 2**20,
+) -> Dict[str, Callable[[], Any]]:
+    """Zero-argument callables for each stage of one benchmark case.
+
+    ``end_to_end_budget`` runs the pipeline in memory-budget mode, so its peak
+    memory can be compared with ``end_to_end``.
+    """
+    data = generate_session(profile, rate_hz, duration_seconds)
+    frame = build_signal_frame(data)
+    metrics = calculate_activity_metrics(data, frame)
+    patterns = detect_activity_patterns(data, frame)
+    request = AnalysisRequest(acceleration_data=data, user_id="benchmark")
+    # No cache: every call must run the whole pipeline
+    service = AnalysisService()
+    budget_service = AnalysisService(memory_budget_bytes=memory_budget_bytes)
+
+    body = request.json()
+    payload = json.loads(body)
+    binary_body = encode_analysis_request(request)
+
+    stages: Dict[str, Callable[[], Any]] = {
+        "validation": lambda: AnalysisRequest.parse_obj(payload),
+        "binary_decode": lambda: decode_analysis_request(binary_body),
+        "signal_frame": lambda: build_signal_frame(data),
+        "metrics": lambda: calculate_activity_metrics(data, frame),
+        "patterns": lambda: detect_activity_patterns(data, frame),
+        "insights": lambda: build_response(metrics, patterns),
+        "end_to_end": lambda: service.analyze(request),
+        "end_to_end_budget": lambda: budget_service.analyze(request),
+    }
+
+    if data.sample_count <= http_max_samples:
+        from fastapi.testclient import TestClient
+
+        from app.api import routes
+        from app.main import app
+
+        routes.analysis_service.cache = None
+        client = TestClient(app)
+        headers = {"content-type": "application/json"}
+        stages["http"] = lambda: client.post("/analyze", content=body, headers=headers)
+
+    return stages
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(
+    suite: str,
+    stages: List[str],
+    min_time: float,
+    http_max_samples: int,
+    profiles: List[str],
+    memory_budget_bytes: int = 16 * 2**20,
+) -> Dict[str, Any]:
+    results = []
+    for rate_hz, duration_seconds in SUITES[suite]:
+        for profile in profiles:
+            case = f"{profile}-{rate_hz}hz-{duration_seconds}s"
+            functions = stage_functions(
+                profile,
+                rate_hz,
+                duration_seconds,
+                http_max_samples,
+                memory_budget_bytes,
+            )
+            samples = rate_hz * duration_seconds
+            for stage in stages:
+                if stage not in functions:
+                    continue
+                result = measure(functions[stage], min_time)
+                result.update(
+                    case=case,
+                    stage=stage,
+                    samples=samples,
+                    samples_per_second=samples / result["median_seconds"],
+                )
+                results.append(result)
+                print(
+                    f"{case:28} {stage:14} {result['median_seconds'] * 1e3:10.2f} ms"
+                    f" {result['samples_per_second'] / 1e6:8.2f} M samples/s"
+                    f" {result['peak_memory_bytes'] / 2**20:9.1f} MiB"
+                )
+
+    return {
+        "meta": {
+            "suite": suite,
+            "memory_budget_bytes": memory_budget_bytes,
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--suite", choices=sorted(SUITES), default="standard")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=PROFILES)
+    parser.add_argument("--min-time", type=float, default=0.5)
+    parser.add_argument("--http-max-samples", type=int, default=500_000)
+    parser.add_argument(
+        "--memory-budget-mb",
+        type=float,
+        default=16.0,
+        help="Working memory budget of the end_to_end_budget stage",
+    )
+    parser.add_argument("--output", help="Write machine-readable results here")
+    args = parser.parse_args()
+
+    report = run_suite(
+        args.suite,
+        args.stages,
+        args.min_time,
+        args.http_max_samples,
+        list(args.profiles),
+        int(args.memory_budget_mb * 2**20),
+    )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
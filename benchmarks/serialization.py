@@ -0,0 +1,87 @@
+"""Compare FastAPI's response_model serialization with the orjson fast path.
+
+Usage: python -m benchmarks.serialization --periods 100 1000 10000 100000
+
+The default path validates the returned model against ``response_model``,
+runs ``jsonable_encoder`` and encodes with the standard json module; the fast
+path serializes the already-built model once with orjson.
+"""
+import argparse
+import asyncio
+import json
+from datetime import timedelta
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.api.responses import ModelResponse
+from app.models.acceleration import InactivityPeriod
+from app.models.analysis import AnalysisResponse
+from app.services.analysis import build_response
+from app.utils.metrics import calculate_activity_metrics
+from app.utils.patterns import detect_activity_patterns
+from benchmarks.generators import START_TIME, generate_session
+from benchmarks.run import measure
+
+RESPONSE_FIELD = create_response_field(name="Response", type_=AnalysisResponse)
+LOOP = asyncio.new_event_loop()
+
+
+def make_response(periods: int) -> AnalysisResponse:
+    """A response with insights, recommendations and many inactivity periods."""
+    data = generate_session("mixed", 10, 600, seed=0)
+    patterns = detect_activity_patterns(data)
+    patterns.inactivity_periods = [
+        InactivityPeriod(
+            start_time=START_TIME + timedelta(seconds=30 * i),
+            end_time=START_TIME + timedelta(seconds=30 * i + 12.5),
+            duration=12.5,
+        )
+        for i in range(periods)
+    ]
+    return build_response(
+        calculate_activity_metrics(data), patterns, include_patterns=True
+    )
+
+
+def response_model_body(response: AnalysisResponse) -> bytes:
+    content = LOOP.run_until_complete(
+        serialize_response(field=RESPONSE_FIELD, response_content=response)
+    )
+    return JSONResponse(content).body
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--periods", type=int, nargs="+", default=[100, 1000, 10000, 100000]
+    )
+    parser.add_argument("--min-time", type=float, default=0.5)
+    args = parser.parse_args()
+
+    results = []
+    for periods in args.periods:
+        response = make_response(periods)
+        assert json.loads(ModelResponse(response).body) == json.loads(
+            response_model_body(response)
+        )
+        default = measure(lambda: response_model_body(response), args.min_time)
+        fast = measure(lambda: ModelResponse(response).body, args.min_time)
+        results.append(
+            {
+                "inactivity_periods": periods,
+                "body_bytes": len(ModelResponse(response).body),
+                "response_model_seconds": default["median_seconds"],
+                "orjson_seconds": fast["median_seconds"],
+                "speedup": default["median_seconds"] / fast["median_seconds"],
+                "response_model_peak_bytes": default["peak_memory_bytes"],
+                "orjson_peak_bytes": fast["peak_memory_bytes"],
+            }
+        )
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
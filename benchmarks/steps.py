@@ -0,0 +1,54 @@
+"""Throughput of step and bout detection on long recordings.
+
+Usage: python -m benchmarks.steps --rate-hz 50 --hours 24
+
+Step detection alone and the whole pattern stage (inactivity and bouts) are
+timed on a mixed-profile recording, with peak traced memory.
+"""
+import argparse
+import json
+
+from app.utils.patterns import detect_activity_patterns
+from app.utils.signal import build_signal_frame
+from app.utils.steps import detect_activity_bouts
+from benchmarks.generators import generate_session
+from benchmarks.run import measure
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate-hz", type=int, default=50)
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument("--min-time", type=float, default=1.0)
+    args = parser.parse_args()
+
+    data = generate_session("mixed", args.rate_hz, args.hours * 3600, seed=0)
+    frame = build_signal_frame(data)
+    bouts = detect_activity_bouts(frame)
+
+    results = {}
+    for stage, fn in {
+        "steps": lambda: detect_activity_bouts(frame),
+        "patterns": lambda: detect_activity_patterns(data, frame),
+    }.items():
+        timing = measure(fn, args.min_time)
+        timing["samples_per_second"] = len(frame) / timing["median_seconds"]
+        results[stage] = timing
+
+    print(
+        json.dumps(
+            {
+                "rate_hz": args.rate_hz,
+                "hours": args.hours,
+                "samples": len(frame),
+                "bouts": len(bouts),
+                "steps": sum(bout.step_count for bout in bouts),
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
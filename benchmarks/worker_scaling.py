@@ -0,0 +1,119 @@
+"""Requests per second of the production server at several worker counts.
+
+Starts ``gunicorn app.main:app`` (configured by gunicorn.conf.py) once per
+worker count and posts the same sessions from concurrent clients.
+
+Usage: python -m benchmarks.worker_scaling --workers 1 2 4 8 --requests 400
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import httpx
+
+from benchmarks.batch_throughput import make_session
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    """Run the server and wait until it answers health checks."""
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(workers),
+        BIND=f"127.0.0.1:{port}",
+        # Every request must be analyzed, and workers must not wait on SQLite
+        RESULT_CACHE_BACKEND="none",
+        AGGREGATES_ENABLED="false",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app.main:app"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"Server with {workers} workers did not start")
+
+
+def measure(port: int, sessions: List[dict], concurrency: int) -> dict:
+    """Post every session once from ``concurrency`` clients."""
+    url = f"http://127.0.0.1:{port}/analyze"
+    latencies: List[float] = []
+
+    with httpx.Client(timeout=120) as client:
+
+        def post(session: dict) -> None:
+            start = time.perf_counter()
+            response = client.post(url, json=session)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(post, sessions))
+        seconds = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests_per_second": len(sessions) / seconds,
+        "p50_latency_seconds": latencies[len(latencies) // 2],
+        "p99_latency_seconds": latencies[int(len(latencies) * 0.99)],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--seconds", type=int, default=600)
+    parser.add_argument("--rate-hz", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    sessions = [
+        make_session(index, args.seconds, args.rate_hz)
+        for index in range(args.requests)
+    ]
+    concurrency = args.concurrency or 2 * max(args.workers)
+
+    results = []
+    for workers in args.workers:
+        server = start_server(workers, args.port)
+        try:
+            # One warm-up pass so every worker has served requests
+            measure(args.port, sessions[: 4 * workers], concurrency)
+            result = measure(args.port, sessions, concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+        results.append({"workers": workers, **result})
+
+    baseline = results[0]["requests_per_second"]
+    for result in results:
+        result["speedup"] = result["requests_per_second"] / baseline
+    print(
+        json.dumps(
+            {
+                "samples_per_request": args.seconds * args.rate_hz,
+                "concurrency": concurrency,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Production server: ``gunicorn app.main:app`` from the repository root.
+
+Runs one uvicorn worker process per available CPU (``WEB_CONCURRENCY``
+overrides it). The application, with NumPy, SciPy and the activity model (see
+app.services.warmup), is loaded once in the master before forking, so workers
+share those pages copy-on-write instead of each loading its own copy. Native
+thread pools and the analysis executor are sized so that all workers together
+use each CPU once.
+"""
+import gc
+import os
+
+from app.core.workers import pin_blas_threads, threads_per_worker, worker_count
+
+workers = worker_count(int(os.environ.get("WEB_CONCURRENCY", 0)))
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.environ.get("BIND", f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+preload_app = True
+# Long recordings are analyzed off the event loop, which keeps heartbeating
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+# Must happen before the preloaded application imports NumPy
+pin_blas_threads(threads_per_worker(workers))
+os.environ.setdefault("ANALYSIS_MAX_WORKERS", str(threads_per_worker(workers)))
+
+# Per-process state that multiple workers do not share
+_PER_WORKER_SETTINGS = {
+    "JOB_STORE_BACKEND": (
+        "memory",
+        "jobs are only visible to the worker that ran them",
+    ),
+    "DATABASE_URL": ("", "trends are split across workers"),
+}
+# HTTP streaming sessions (/stream) stay in the worker that opened them; set
+# when the load balancer routes each session to one worker
+_sticky_sessions = os.environ.get("STICKY_SESSIONS", "").lower() in ("1", "true")
+
+
+def on_starting(server):
+    if workers < 2:
+        return
+    for variable, (value, effect) in _PER_WORKER_SETTINGS.items():
+        if os.environ.get(variable, value) == value:
+            server.log.warning(
+                "%s is %r with %d workers: %s", variable, value, workers, effect
+            )
+    if not _sticky_sessions:
+        server.log.warning(
+            "HTTP streaming sessions are kept by the worker that opened them; "
+            "with %d workers their chunks need sticky routing (set "
+            "STICKY_SESSIONS=true once it is in place) or they are answered "
+            "with 404",
+            workers,
+        )
+
+
+def when_ready(server):
+    from app.api.routes import activity_classifier
+    from app.services.warmup import warm_up
+
+    # Load the lazily imported libraries and the model here, so workers share
+    # them too
+    warm_up(activity_classifier)
+    # Keep the preloaded objects out of the collector, so collections in the
+    # workers do not write to (and copy) the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app.core.config import settings
+
+    # Unfinished jobs of a previous run are resumed by the first worker only
+    settings.JOB_RESUME_ON_STARTUP = settings.JOB_RESUME_ON_STARTUP and worker.age == 1
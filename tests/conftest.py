@@ -93,3 +93,40 @@ def sample_inactive_acceleration_data() -> AccelerationData:
         samples=samples,
         id="test-data-3",
     )
+
+
+@pytest.fixture
+def make_flipping_acceleration_data():
+    """Factory for columnar data whose activity state flips at random run lengths."""
+
+    def make(seed: int, n: int, shuffle: bool = False) -> AccelerationData:
+        rng = np.random.default_rng(seed)
+        run_lengths = rng.integers(1, 40, size=n)
+        states = np.repeat(np.arange(len(run_lengths)) % 2, run_lengths)[:n]
+        noise = np.where(states == 1, 0.01, 0.5)
+        # 10Hz epoch milliseconds with a little jitter
+        timestamps = 1_700_000_000_000 + np.arange(n) * 100 + rng.integers(0, 5, n)
+        if shuffle:
+            timestamps = rng.permutation(timestamps)
+
+        return AccelerationData(
+            data_type="acceleration",
+            device_info={"device": "test", "model": "unit-test"},
+            sampling_rate_hz=10,
+            start_time=datetime(2023, 11, 14, 22, 13, 20, tzinfo=timezone.utc),
+            timestamps=timestamps,
+            x=rng.normal(0.0, noise),
+            y=rng.normal(0.0, noise),
+            z=1.0 + rng.normal(0.0, noise),
+            id=f"flipping-data-{seed}",
+        )
+
+    return make
+
+
+@pytest.fixture
+def make_synthetic_acceleration_data():
+    """Factory for synthetic rest/walking/mixed sessions at any rate and length."""
+    from benchmarks.generators import generate_session
+
+    return generate_session
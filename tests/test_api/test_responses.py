@@ -0,0 +1,63 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from app.api.responses import ModelResponse
+from app.models.acceleration import ActivityMetrics, ActivityPatterns, InactivityPeriod
+from app.models.analysis import AnalysisResponse, BatchAnalysisResponse, Insight
+
+
+@pytest.fixture
+def analysis_response():
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return AnalysisResponse(
+        status="success",
+        insights=[
+            Insight(id="a", insight_type="t", message="Ünïcode ✓", priority="low")
+        ],
+        metrics=ActivityMetrics(
+            avg_intensity=0.1,
+            peak_intensity=1 / 3,
+            movement_consistency=0.9,
+            active_minutes=0.0,
+            total_duration=12.5,
+        ),
+        patterns=ActivityPatterns(
+            inactivity_periods=[
+                InactivityPeriod(
+                    start_time=start + timedelta(seconds=i),
+                    end_time=start + timedelta(seconds=i, microseconds=500),
+                    duration=0.0005,
+                )
+                for i in range(3)
+            ]
+        ),
+    )
+
+
+def test_model_response_matches_pydantic_json(analysis_response):
+    """Test that orjson output decodes to the same document as .json()."""
+    response = ModelResponse(analysis_response)
+
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == json.loads(analysis_response.json())
+
+
+def test_model_response_nested_models(analysis_response):
+    """Test that models nested in lists and constructed models are serialized."""
+    batch = BatchAnalysisResponse.construct(
+        results=[analysis_response, AnalysisResponse(status="error", message="x")]
+    )
+
+    body = json.loads(ModelResponse(batch).body)
+
+    assert body == json.loads(BatchAnalysisResponse(results=batch.results).json())
+    assert json.loads(ModelResponse({"value": np.float64(0.5)}).body) == {"value": 0.5}
+
+
+def test_model_response_rejects_unknown_types():
+    """Test that unsupported objects fail loudly instead of being dropped."""
+    with pytest.raises(TypeError):
+        ModelResponse({"value": object()})
@@ -1,10 +1,23 @@
+import asyncio
 import json
+import time
+from datetime import datetime
 
 import pytest
+from fastapi import WebSocketDisconnect
 from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketState
 
+from app.api import routes
+from app.core.config import settings
+from app.core.executors import BoundedExecutor
 from app.main import app
-from app.models.analysis import AnalysisRequest
+from app.models.analysis import AnalysisRequest, BatchAnalysisRequest
+from app.models.streaming import StreamingSessionRequest
+from app.services.classifier import LEVEL_FIELDS
+from app.services.streaming import LiveSession
+from app.utils.binary import CONTENT_TYPE, encode_analysis_request
+from app.utils.patterns import detect_activity_patterns
 
 client = TestClient(app)
 
@@ -56,3 +69,565 @@ def test_analyze_endpoint_invalid_data():
 
     # Should return a validation error
     assert response.status_code == 422  # Unprocessable Entity
+
+
+def test_analyze_endpoint_unknown_sampling_rate(sample_acceleration_data):
+    """Test that a sampling rate of 0 is analyzed at the default rate."""
+    request = AnalysisRequest(
+        acceleration_data=sample_acceleration_data.copy(update={"sampling_rate_hz": 0}),
+        user_id="test-user-1",
+    )
+
+    response = client.post("/analyze", json=json.loads(request.json()))
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "success"
+    assert response.json()["metrics"]["total_duration"] > 0
+
+
+def test_analyze_endpoint_columnar_data(sample_acceleration_data):
+    """Test that the analyze endpoint accepts columnar sample arrays."""
+    arrays = sample_acceleration_data.to_arrays()
+    json_dict = {
+        "acceleration_data": {
+            "data_type": "acceleration",
+            "device_info": {"device": "test"},
+            "sampling_rate_hz": 10,
+            "start_time": sample_acceleration_data.start_time.isoformat(),
+            "x": arrays.x.tolist(),
+            "y": arrays.y.tolist(),
+            "z": arrays.z.tolist(),
+        },
+        "user_id": "test-user-1",
+    }
+
+    response = client.post("/analyze", json=json_dict)
+
+    assert response.status_code == 200
+    assert response.json()["metrics"]["total_duration"] > 0.0
+
+
+def test_analyze_endpoint_includes_patterns(sample_inactive_acceleration_data):
+    """Test that inactivity periods are returned only when requested."""
+    request = AnalysisRequest(
+        acceleration_data=sample_inactive_acceleration_data,
+        user_id="test-user-1",
+        include_patterns=True,
+    )
+
+    response = client.post("/analyze", json=json.loads(request.json()))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    periods = response.json()["patterns"]["inactivity_periods"]
+    expected = detect_activity_patterns(sample_inactive_acceleration_data)
+    assert len(periods) == len(expected.inactivity_periods) > 0
+    assert periods[0] == json.loads(expected.inactivity_periods[0].json())
+
+    request.include_patterns = False
+    response = client.post("/analyze", json=json.loads(request.json()))
+    assert response.json()["patterns"] is None
+
+
+def test_streaming_session(sample_inactive_acceleration_data):
+    """Test that a session streamed in chunks gives the batch analysis."""
+    data = sample_inactive_acceleration_data
+    session = {
+        "data_type": data.data_type,
+        "device_info": data.device_info,
+        "sampling_rate_hz": data.sampling_rate_hz,
+        "start_time": data.start_time.isoformat(),
+        "user_id": "test-user-1",
+    }
+
+    response = client.post("/stream", json=session)
+    assert response.status_code == 200
+    session_id = response.json()["session_id"]
+
+    arrays = data.to_arrays()
+    for start in range(0, len(arrays.x), 30):
+        chunk = {
+            axis: getattr(arrays, axis)[start : start + 30].tolist() for axis in "xyz"
+        }
+        response = client.post(f"/stream/{session_id}/chunks", json=chunk)
+        assert response.status_code == 200
+
+    assert response.json()["samples_received"] == len(arrays.x)
+
+    response = client.post(f"/stream/{session_id}/finish")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "success"
+    assert any(i["insight_type"] == "inactivity" for i in data["insights"])
+    # The 10 s recording is one classified window
+    levels = [data["metrics"][field] for field in LEVEL_FIELDS]
+    assert sum(levels) == pytest.approx(10 / 60)
+
+    # Finished sessions are gone
+    response = client.post(f"/stream/{session_id}/finish")
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("sampling_rate_hz", [0, -10])
+def test_streaming_session_rejects_invalid_rate(
+    sampling_rate_hz, sample_acceleration_data
+):
+    """Test that sessions need a positive sampling rate."""
+    message = live_session_message(sample_acceleration_data)
+    message["sampling_rate_hz"] = sampling_rate_hz
+
+    assert client.post("/stream", json=message).status_code == 422
+    with client.websocket_connect("/stream/live") as websocket:
+        websocket.send_json(message)
+        assert "detail" in websocket.receive_json()
+        with pytest.raises(WebSocketDisconnect) as error:
+            websocket.receive_json()
+        assert error.value.code == 1008
+
+
+def test_analyze_batch_endpoint(
+    sample_acceleration_data, sample_active_acceleration_data
+):
+    """Test that the batch endpoint returns results in request order."""
+    batch = BatchAnalysisRequest(
+        requests=[
+            AnalysisRequest(acceleration_data=data, user_id=f"test-user-{i}")
+            for i, data in enumerate(
+                [sample_acceleration_data, sample_active_acceleration_data]
+            )
+        ]
+    )
+
+    response = client.post("/analyze/batch", json=json.loads(batch.json()))
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["success", "success"]
+    assert (
+        results[0]["metrics"]["avg_intensity"] < results[1]["metrics"]["avg_intensity"]
+    )
+
+
+def test_analyze_endpoint_saturated(sample_acceleration_data, monkeypatch):
+    """Test that a full analysis queue returns 503 with Retry-After."""
+    executor = BoundedExecutor("thread", max_workers=1, max_queue=0)
+    monkeypatch.setattr(routes, "analysis_executor", executor)
+    request = AnalysisRequest(
+        acceleration_data=sample_acceleration_data, user_id="test-user-1"
+    )
+
+    with executor.admit():
+        response = client.post("/analyze", json=json.loads(request.json()))
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    executor.shutdown()
+
+
+def test_stats_endpoint():
+    """Test that the stats endpoint exposes the worker pool gauges."""
+    response = client.get("/stats")
+
+    assert response.status_code == 200
+    assert {"in_flight", "queued", "max_workers", "max_queue"} <= set(
+        response.json()["analysis_executor"]
+    )
+
+
+def test_metrics_endpoint(sample_active_acceleration_data):
+    """Test that per-stage latencies are exposed after an analysis."""
+    request = AnalysisRequest(
+        acceleration_data=sample_active_acceleration_data, user_id="test-user-1"
+    )
+    client.post("/analyze", json=json.loads(request.json()))
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    for stage in ["validation", "signal_frame", "cache_lookup"]:
+        assert f'analysis_stage_seconds_count{{stage="{stage}"}}' in text
+    assert 'route="/analyze"' in text
+    assert "analysis_samples_bucket" in text
+    assert "analysis_executor_in_flight" in text
+
+
+def test_metrics_label_routes_outside_the_api():
+    """Test that only requests no route matched are labeled unmatched."""
+    client.get("/openapi.json")
+    client.get("/no-such-route")
+
+    text = client.get("/metrics").text
+
+    assert 'method="GET",route="/openapi.json",status="200"' in text
+    assert 'method="GET",route="unmatched",status="404"' in text
+
+
+def test_analyze_endpoint_binary_upload(sample_inactive_acceleration_data):
+    """Test that binary uploads give the same analysis as JSON."""
+    request = AnalysisRequest(
+        acceleration_data=sample_inactive_acceleration_data,
+        include_insights=False,
+        user_id="test-user-1",
+    )
+
+    json_response = client.post("/analyze", json=json.loads(request.json()))
+    binary_response = client.post(
+        "/analyze",
+        content=encode_analysis_request(request, dtype="float64", compress=True),
+        headers={"content-type": CONTENT_TYPE},
+    )
+
+    assert binary_response.status_code == 200
+    assert binary_response.json()["metrics"] == json_response.json()["metrics"]
+    assert binary_response.json()["insights"] == []
+
+
+def test_analyze_endpoint_malformed_binary_upload():
+    """Test that malformed binary uploads are rejected with 400."""
+    response = client.post(
+        "/analyze", content=b"not binary", headers={"content-type": CONTENT_TYPE}
+    )
+
+    assert response.status_code == 400
+
+
+def test_openapi_schema():
+    """Test that the OpenAPI schema documents both /analyze body types."""
+    response = client.get("/openapi.json")
+
+    assert response.status_code == 200
+    content = response.json()["paths"]["/analyze"]["post"]["requestBody"]["content"]
+    assert set(content) == {"application/json", CONTENT_TYPE}
+
+
+def test_trends_endpoint(make_flipping_acceleration_data):
+    """Test that analyzed sessions show up in the user's trends."""
+    data = make_flipping_acceleration_data(seed=11, n=1200)
+    request = AnalysisRequest(acceleration_data=data, user_id="trends-user")
+    assert client.post("/analyze", json=json.loads(request.json())).status_code == 200
+
+    response = client.get(
+        "/users/trends-user/trends",
+        params={"granularity": "hour", "start": "2023-11-14T00:00:00Z"},
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["granularity"] == "hour"
+    assert sum(bucket["sample_count"] for bucket in body["buckets"]) == 1200
+    assert body["buckets"][0]["metrics"]["total_duration"] > 0
+
+    response = client.get("/users/trends-user/trends", params={"granularity": "week"})
+    assert response.status_code == 422
+
+
+def test_analyze_endpoint_async_job(sample_active_acceleration_data):
+    """Test that async=true queues a job whose result can be polled."""
+    request = AnalysisRequest(
+        acceleration_data=sample_active_acceleration_data,
+        user_id="test-user-1",
+        include_insights=True,
+    )
+    response = client.post(
+        "/analyze", params={"async": "true"}, json=json.loads(request.json())
+    )
+
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued"
+    assert response.headers["Location"] == f"/jobs/{job['job_id']}"
+
+    deadline = time.monotonic() + 10
+    while job["status"] in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.01)
+        job = client.get(f"/jobs/{job['job_id']}").json()
+
+    assert job["status"] == "succeeded"
+    direct = client.post("/analyze", json=json.loads(request.json())).json()
+    assert job["result"]["metrics"] == direct["metrics"]
+    assert [i["rule_id"] for i in job["result"]["insights"]] == [
+        i["rule_id"] for i in direct["insights"]
+    ]
+
+
+def test_analyze_endpoint_async_job_errors(sample_acceleration_data):
+    """Test unknown jobs, invalid or internal callback URLs and a full job queue."""
+    assert client.get("/jobs/missing").status_code == 404
+
+    body = json.loads(
+        AnalysisRequest(
+            acceleration_data=sample_acceleration_data, user_id="test-user-1"
+        ).json()
+    )
+    response = client.post(
+        "/analyze", params={"async": "true", "callback_url": "not a url"}, json=body
+    )
+    assert response.status_code == 422
+    response = client.post(
+        "/analyze",
+        params={"async": "true", "callback_url": "http://127.0.0.1:8000/hook"},
+        json=body,
+    )
+    assert response.status_code == 422
+
+    limit = routes.analysis_jobs.max_queue
+    routes.analysis_jobs.max_queue = -routes.analysis_jobs.max_workers
+    try:
+        response = client.post("/analyze", params={"async": "true"}, json=body)
+    finally:
+        routes.analysis_jobs.max_queue = limit
+    assert response.status_code == 503
+
+
+def test_analyze_endpoint_rejects_oversized_requests(
+    sample_acceleration_data, monkeypatch
+):
+    """Test that too many samples or bytes are refused with a 413."""
+    request = AnalysisRequest(
+        acceleration_data=sample_acceleration_data, user_id="test-user-1"
+    )
+    body = request.json().encode()
+    binary_body = encode_analysis_request(request)
+
+    monkeypatch.setattr(settings, "MAX_REQUEST_SAMPLES", 99)
+    response = client.post("/analyze", json=json.loads(body))
+    assert response.status_code == 413
+    response = client.post(
+        "/analyze", content=binary_body, headers={"content-type": CONTENT_TYPE}
+    )
+    assert response.status_code == 413
+    batch = BatchAnalysisRequest(requests=[request])
+    response = client.post("/analyze/batch", json=json.loads(batch.json()))
+    assert response.status_code == 413
+
+    monkeypatch.setattr(settings, "MAX_REQUEST_SAMPLES", 100)
+    monkeypatch.setattr(settings, "MAX_REQUEST_BYTES", len(body) - 1)
+    response = client.post(
+        "/analyze", content=body, headers={"content-type": "application/json"}
+    )
+    assert response.status_code == 413
+
+    # Chunked uploads have no Content-Length and are checked while reading
+    response = client.post(
+        "/analyze",
+        content=iter([body[:100], body[100:]]),
+        headers={"content-type": "application/json"},
+    )
+    assert response.status_code == 413
+
+    monkeypatch.setattr(settings, "MAX_REQUEST_BYTES", len(body))
+    assert client.post("/analyze", json=json.loads(body)).status_code == 200
+
+
+def test_streaming_and_batch_bodies_are_limited(
+    sample_inactive_acceleration_data, monkeypatch
+):
+    """Test that chunks and batches are held to the request and session limits."""
+    data = sample_inactive_acceleration_data
+    request = AnalysisRequest(acceleration_data=data, user_id="test-user-1")
+    batch = BatchAnalysisRequest(requests=[request]).json().encode()
+    session_id = client.post("/stream", json=live_session_message(data)).json()[
+        "session_id"
+    ]
+    arrays = data.to_arrays()
+    chunk = {axis: getattr(arrays, axis)[:60].tolist() for axis in "xyz"}
+    chunk_body = json.dumps(chunk).encode()
+    url = f"/stream/{session_id}/chunks"
+
+    # Chunked uploads have no Content-Length and are checked while reading
+    monkeypatch.setattr(settings, "MAX_REQUEST_BYTES", len(chunk_body) - 1)
+    for path, body in [("/analyze/batch", batch), (url, chunk_body)]:
+        response = client.post(
+            path,
+            content=iter([body[:100], body[100:]]),
+            headers={"content-type": "application/json"},
+        )
+        assert response.status_code == 413
+
+    monkeypatch.setattr(settings, "MAX_REQUEST_BYTES", 0)
+    monkeypatch.setattr(settings, "MAX_REQUEST_SAMPLES", 59)
+    assert client.post(url, json=chunk).status_code == 413
+
+    monkeypatch.setattr(settings, "MAX_REQUEST_SAMPLES", 60)
+    monkeypatch.setattr(routes.streaming_sessions, "max_session_samples", 100)
+    response = client.post(url, json=chunk)
+    assert response.json()["samples_received"] == 60
+    response = client.post(url, json=chunk)
+    assert response.status_code == 413
+    assert "limit is 100" in response.json()["detail"]
+    assert client.post(f"/stream/{session_id}/finish").status_code == 200
+
+
+def live_session_message(data):
+    return {
+        "data_type": data.data_type,
+        "device_info": data.device_info,
+        "sampling_rate_hz": data.sampling_rate_hz,
+        "start_time": data.start_time.isoformat(),
+        "user_id": "test-user-1",
+    }
+
+
+def test_live_stream(make_synthetic_acceleration_data, monkeypatch):
+    """Test that the live endpoint pushes running and windowed results."""
+    monkeypatch.setattr(settings, "STREAM_LIVE_UPDATE_SECONDS", 0.0)
+    monkeypatch.setattr(settings, "STREAM_LIVE_WINDOW_SECONDS", 30.0)
+    data = make_synthetic_acceleration_data("mixed", 10, 600, seed=2)
+    arrays = data.to_arrays()
+
+    periods = []
+    with client.websocket_connect("/stream/live") as websocket:
+        websocket.send_json(live_session_message(data))
+        for start in range(0, len(arrays.x), 100):
+            chunk = {
+                axis: getattr(arrays, axis)[start : start + 100].tolist()
+                for axis in "xyz"
+            }
+            # Epoch milliseconds
+            chunk["timestamps"] = (
+                arrays.timestamps[start : start + 100] // 10**6
+            ).tolist()
+            websocket.send_json(chunk)
+            update = websocket.receive_json()
+            assert update["samples_received"] == min(start + 100, len(arrays.x))
+            periods.extend(update["inactivity_periods"])
+
+        websocket.send_json({"x": [1.0], "y": [0.0]})
+        assert "detail" in websocket.receive_json()
+
+    expected = routes.analysis_service.analyze(
+        AnalysisRequest(user_id="test-user-1", acceleration_data=data)
+    ).metrics
+    assert update["metrics"]["active_minutes"] == pytest.approx(expected.active_minutes)
+    assert update["metrics"]["avg_intensity"] == pytest.approx(expected.avg_intensity)
+    # The window covers the last 30 s only
+    assert update["window_metrics"]["total_duration"] == pytest.approx(0.5, abs=0.01)
+
+    final = detect_activity_patterns(data).inactivity_periods
+    final_ends = {period.end_time for period in final}
+    assert all(
+        datetime.fromisoformat(period["end_time"]) in final_ends for period in periods
+    )
+
+
+def test_live_stream_pushes_on_cadence(sample_acceleration_data, monkeypatch):
+    """Test that updates are pushed on a timer and bad sessions are refused."""
+    monkeypatch.setattr(settings, "STREAM_LIVE_UPDATE_SECONDS", 0.01)
+
+    with client.websocket_connect("/stream/live") as websocket:
+        websocket.send_json(live_session_message(sample_acceleration_data))
+        websocket.send_json({"x": [0.0] * 50, "y": [0.0] * 50, "z": [1.0] * 50})
+        for _ in range(20):
+            update = websocket.receive_json()
+            if update["samples_received"] == 50:
+                break
+        assert update["samples_received"] == 50
+
+    with client.websocket_connect("/stream/live") as websocket:
+        websocket.send_json({"data_type": "acceleration"})
+        assert "detail" in websocket.receive_json()
+        with pytest.raises(WebSocketDisconnect) as error:
+            websocket.receive_json()
+        assert error.value.code == 1008
+
+
+def test_live_stream_reports_failed_updates(sample_acceleration_data, monkeypatch):
+    """Test that a failing update closes the connection instead of going quiet."""
+    monkeypatch.setattr(settings, "STREAM_LIVE_UPDATE_SECONDS", 0.01)
+
+    def fail(self):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(LiveSession, "update", fail)
+    with client.websocket_connect("/stream/live") as websocket:
+        websocket.send_json(live_session_message(sample_acceleration_data))
+        assert websocket.receive_json() == {"detail": "Error analyzing data: boom"}
+        with pytest.raises(WebSocketDisconnect) as error:
+            websocket.receive_json()
+        assert error.value.code == 1011
+
+
+def test_live_stream_limits_chunk_samples(sample_acceleration_data, monkeypatch):
+    """Test that live chunks are held to MAX_REQUEST_SAMPLES."""
+    monkeypatch.setattr(settings, "STREAM_LIVE_UPDATE_SECONDS", 0.0)
+    monkeypatch.setattr(settings, "MAX_REQUEST_SAMPLES", 49)
+    chunk = {"x": [0.0] * 50, "y": [0.0] * 50, "z": [1.0] * 50}
+
+    with client.websocket_connect("/stream/live") as websocket:
+        websocket.send_json(live_session_message(sample_acceleration_data))
+        websocket.send_json(chunk)
+        assert "the limit is 49" in websocket.receive_json()["detail"]
+        websocket.send_json({axis: values[:49] for axis, values in chunk.items()})
+        assert websocket.receive_json()["samples_received"] == 49
+
+
+class GoneWebSocket:
+    """A live connection whose client went away."""
+
+    def __init__(self, client_state):
+        self.client_state = client_state
+        self.sent = []
+
+    async def receive_text(self):
+        await asyncio.sleep(10)
+
+    async def send_text(self, text):
+        raise ConnectionResetError("client went away")
+
+    async def send_json(self, data):
+        if self.client_state == WebSocketState.CONNECTED:
+            raise ConnectionResetError("client went away")
+        self.sent.append(data)
+
+    async def close(self, code=1000):
+        self.sent.append(code)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "client_state", [WebSocketState.CONNECTED, WebSocketState.DISCONNECTED]
+)
+async def test_live_stream_ends_quietly_without_client(
+    sample_acceleration_data, monkeypatch, client_state
+):
+    """Test that no error frame is sent to a client that went away."""
+    monkeypatch.setattr(settings, "STREAM_LIVE_UPDATE_SECONDS", 0.01)
+    request = StreamingSessionRequest.parse_obj(
+        live_session_message(sample_acceleration_data)
+    )
+    websocket = GoneWebSocket(client_state)
+
+    await routes._serve_live_session(websocket, LiveSession("gone", request))
+
+    assert websocket.sent == []
+
+
+def test_live_sessions_count_toward_session_limit(
+    sample_acceleration_data, monkeypatch
+):
+    """Test that open live connections use up streaming session slots."""
+    monkeypatch.setattr(settings, "STREAM_LIVE_UPDATE_SECONDS", 0.0)
+    # Room for exactly one more session
+    sessions = routes.streaming_sessions
+    monkeypatch.setattr(sessions, "max_sessions", len(sessions._sessions) + 1)
+    message = live_session_message(sample_acceleration_data)
+
+    with client.websocket_connect("/stream/live") as websocket:
+        websocket.send_json(message)
+        websocket.send_json({"x": [0.0], "y": [0.0], "z": [1.0]})
+        assert websocket.receive_json()["samples_received"] == 1
+
+        assert client.post("/stream", json=message).status_code == 503
+        with client.websocket_connect("/stream/live") as refused:
+            refused.send_json(message)
+            assert "detail" in refused.receive_json()
+            with pytest.raises(WebSocketDisconnect) as error:
+                refused.receive_json()
+            assert error.value.code == 1013
+
+    # The slot is released when the connection closes
+    response = client.post("/stream", json=message)
+    assert response.status_code == 200
+    client.post(f"/stream/{response.json()['session_id']}/finish")
@@ -0,0 +1,33 @@
+import pytest
+
+from app.utils.metrics import calculate_activity_metrics
+from benchmarks.run import measure, stage_functions
+
+
+@pytest.mark.parametrize("rate_hz", [10, 100])
+def test_synthetic_profiles(make_synthetic_acceleration_data, rate_hz):
+    """Test that synthetic profiles have the expected size and activity levels."""
+    rest = make_synthetic_acceleration_data("rest", rate_hz, 120)
+    walking = make_synthetic_acceleration_data("walking", rate_hz, 120)
+
+    assert rest.sample_count == walking.sample_count == 120 * rate_hz
+    assert calculate_activity_metrics(rest).active_minutes == 0.0
+    assert calculate_activity_metrics(walking).peak_intensity > 0.5
+
+
+def test_synthetic_sessions_are_reproducible(make_synthetic_acceleration_data):
+    """Test that the same seed gives the same session."""
+    first = make_synthetic_acceleration_data("mixed", 10, 600, seed=3)
+    second = make_synthetic_acceleration_data("mixed", 10, 600, seed=3)
+
+    assert (first.to_arrays().z == second.to_arrays().z).all()
+
+
+def test_benchmark_stages_run():
+    """Test that every benchmark stage runs and reports its measurements."""
+    functions = stage_functions("mixed", 10, 60, http_max_samples=1000)
+
+    for stage, fn in functions.items():
+        result = measure(fn, min_time=0.0)
+        assert result["median_seconds"] > 0, stage
+        assert result["peak_memory_bytes"] >= 0, stage
@@ -0,0 +1,13 @@
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import Settings
+
+
+def test_process_executor_needs_shared_aggregates():
+    """Test that worker processes cannot write trends to private databases."""
+    with pytest.raises(ValidationError, match="DATABASE_URL"):
+        Settings(ANALYSIS_EXECUTOR="process", DATABASE_URL="")
+
+    Settings(ANALYSIS_EXECUTOR="process", DATABASE_URL="sqlite:///trends.sqlite3")
+    Settings(ANALYSIS_EXECUTOR="process", AGGREGATES_ENABLED=False)
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.executors import BoundedExecutor, ExecutorSaturatedError
+
+
+@pytest.fixture
+def bounded_executor():
+    """A thread executor with one worker and room for one queued job."""
+    executor = BoundedExecutor("thread", max_workers=1, max_queue=1)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_run_keeps_event_loop_responsive(bounded_executor):
+    """Test that blocking work runs off the event loop."""
+    release = threading.Event()
+    job = asyncio.ensure_future(bounded_executor.run(release.wait, 5))
+
+    # The loop still serves other coroutines while the job blocks a worker
+    await asyncio.sleep(0.01)
+    assert not job.done()
+    assert bounded_executor.stats()["in_flight"] == 1
+
+    release.set()
+    assert await job is True
+    assert bounded_executor.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_run_rejects_when_saturated(bounded_executor):
+    """Test that work beyond the worker and queue limits is rejected."""
+    release = threading.Event()
+    jobs = [
+        asyncio.ensure_future(bounded_executor.run(release.wait, 5)) for _ in range(2)
+    ]
+    await asyncio.sleep(0.01)
+    assert bounded_executor.stats() == {
+        "in_flight": 1,
+        "queued": 1,
+        "max_workers": 1,
+        "max_queue": 1,
+    }
+
+    with pytest.raises(ExecutorSaturatedError):
+        await bounded_executor.run(release.wait, 5)
+
+    release.set()
+    await asyncio.gather(*jobs)
+    assert bounded_executor.stats()["queued"] == 0
+
+
+def test_unknown_executor_kind():
+    """Test that an unknown pool kind is rejected."""
+    with pytest.raises(ValueError):
+        BoundedExecutor("fiber")
+
+
+@pytest.mark.asyncio
+async def test_process_executor_does_not_fork_the_server():
+    """Test that process workers start clean, not as forks of a threaded server."""
+    executor = BoundedExecutor("process", max_workers=1)
+    try:
+        assert executor.executor._mp_context.get_start_method() != "fork"
+        assert await executor.run(sum, [1, 2, 3]) == 6
+    finally:
+        executor.shutdown()
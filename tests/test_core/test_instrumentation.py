@@ -0,0 +1,41 @@
+import pytest
+
+from app.core.instrumentation import Histogram, MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative():
+    """Test that observations land in the first bucket they fit."""
+    histogram = Histogram([0.1, 1.0])
+    for value in [0.05, 0.1, 0.5, 2.0]:
+        histogram.observe(value)
+
+    cumulative, total = histogram.snapshot()
+
+    assert cumulative == [2, 3, 4]
+    assert total == pytest.approx(2.65)
+
+
+def test_registry_renders_prometheus_text():
+    """Test that histograms and callbacks render in the exposition format."""
+    registry = MetricsRegistry()
+    registry.register_histogram("stage_seconds", "Stage latency.", [0.5])
+    registry.register_callback("queue_depth", "Queued jobs.", "gauge", lambda: 3)
+
+    registry.observe("stage_seconds", 0.25, stage="metrics")
+    with registry.time("stage_seconds", stage="patterns"):
+        pass
+
+    text = registry.render()
+
+    assert "# TYPE stage_seconds histogram" in text
+    assert 'stage_seconds_bucket{stage="metrics",le="0.5"} 1' in text
+    assert 'stage_seconds_bucket{stage="metrics",le="+Inf"} 1' in text
+    assert 'stage_seconds_sum{stage="metrics"} 0.25' in text
+    assert 'stage_seconds_count{stage="patterns"} 1' in text
+    assert "# TYPE queue_depth gauge\nqueue_depth 3" in text
+
+
+def test_registry_rejects_unregistered_histograms():
+    """Test that observing an unknown metric fails loudly."""
+    with pytest.raises(KeyError):
+        MetricsRegistry().observe("unknown_seconds", 1.0)
@@ -0,0 +1,48 @@
+import os
+import runpy
+
+from app.core.workers import (
+    BLAS_THREAD_VARIABLES,
+    available_cpus,
+    pin_blas_threads,
+    threads_per_worker,
+    worker_count,
+)
+
+
+def test_worker_count_defaults_to_cpus():
+    """Test that 0 workers means one per available CPU."""
+    assert worker_count(0) == available_cpus()
+    assert worker_count(3) == 3
+
+
+def test_threads_per_worker_share_the_cpus():
+    """Test that workers split the CPUs and always get a thread."""
+    cpus = available_cpus()
+    assert threads_per_worker(1) == cpus
+    assert threads_per_worker(cpus) == 1
+    assert threads_per_worker(4 * cpus) == 1
+
+
+def test_pin_blas_threads_keeps_explicit_values():
+    """Test that every thread pool is capped unless already configured."""
+    environ = {"OMP_NUM_THREADS": "4"}
+    pin_blas_threads(2, environ)
+
+    assert environ.pop("OMP_NUM_THREADS") == "4"
+    assert set(environ) == set(BLAS_THREAD_VARIABLES) - {"OMP_NUM_THREADS"}
+    assert set(environ.values()) == {"2"}
+
+
+def test_gunicorn_config(monkeypatch):
+    """Test that the server preloads the app with one worker per CPU."""
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    for variable in BLAS_THREAD_VARIABLES + ("ANALYSIS_MAX_WORKERS",):
+        monkeypatch.setenv(variable, "1")
+
+    root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    config = runpy.run_path(os.path.join(root, "gunicorn.conf.py"))
+
+    assert config["workers"] == 2
+    assert config["preload_app"] is True
+    assert config["worker_class"] == "uvicorn.workers.UvicornWorker"
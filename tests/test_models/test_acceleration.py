@@ -0,0 +1,179 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.models.acceleration import (
+    AccelerationData,
+    AccelerationSample,
+    FloatArray,
+    SampleList,
+    datetime_to_ns,
+    sample_dtype,
+)
+from app.utils.metrics import calculate_activity_metrics
+from app.utils.patterns import detect_activity_patterns
+
+
+def to_columnar(
+    data: AccelerationData, with_timestamps: bool = True
+) -> AccelerationData:
+    """Re-express list-of-samples data as columnar data."""
+    arrays = data.to_arrays()
+    return AccelerationData(
+        data_type=data.data_type,
+        device_info=data.device_info,
+        sampling_rate_hz=data.sampling_rate_hz,
+        start_time=data.start_time,
+        timestamps=arrays.timestamps.view("datetime64[ns]")
+        if with_timestamps
+        else None,
+        x=arrays.x.tolist(),
+        y=arrays.y.tolist(),
+        z=arrays.z.tolist(),
+    )
+
+
+def test_columnar_data_matches_samples(sample_inactive_acceleration_data):
+    """Test that columnar and list-of-samples payloads give the same results."""
+    columnar = to_columnar(sample_inactive_acceleration_data)
+
+    assert columnar.sample_count == sample_inactive_acceleration_data.sample_count
+    assert calculate_activity_metrics(columnar) == calculate_activity_metrics(
+        sample_inactive_acceleration_data
+    )
+    assert detect_activity_patterns(columnar) == detect_activity_patterns(
+        sample_inactive_acceleration_data
+    )
+
+
+def test_columnar_timestamps_derived_from_sampling_rate():
+    """Test that omitted timestamps are derived from start time and rate."""
+    start_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    data = AccelerationData(
+        data_type="acceleration",
+        device_info={},
+        sampling_rate_hz=50,
+        start_time=start_time,
+        x=[0.0] * 5,
+        y=[0.0] * 5,
+        z=[1.0] * 5,
+    )
+
+    timestamps = data.to_arrays().timestamps
+    assert timestamps[0] == datetime_to_ns(start_time)
+    assert np.all(np.diff(timestamps) == 20_000_000)  # 20ms at 50Hz
+
+
+def test_columnar_timestamps_accept_iso_strings():
+    """Test that ISO 8601 timestamps are parsed in bulk."""
+    data = AccelerationData(
+        data_type="acceleration",
+        device_info={},
+        sampling_rate_hz=10,
+        start_time="2024-01-01T00:00:00Z",
+        timestamps=["2024-01-01T00:00:00Z", "2024-01-01T00:00:00.100+00:00"],
+        x=[0.0, 0.1],
+        y=[0.0, 0.1],
+        z=[1.0, 1.1],
+    )
+
+    timestamps = data.to_arrays().timestamps
+    assert timestamps[1] - timestamps[0] == 100_000_000
+
+
+def test_columnar_json_round_trip(sample_acceleration_data):
+    """Test that columnar data survives JSON serialization."""
+    columnar = to_columnar(sample_acceleration_data)
+    parsed = AccelerationData.parse_raw(columnar.json())
+
+    # Timestamps travel as float epoch milliseconds, exact to well below 1us
+    np.testing.assert_allclose(
+        parsed.to_arrays().timestamps,
+        columnar.to_arrays().timestamps,
+        rtol=0,
+        atol=1000,
+    )
+    np.testing.assert_array_equal(parsed.to_arrays().x, columnar.to_arrays().x)
+
+
+@pytest.mark.parametrize(
+    "columns",
+    [
+        {"x": [0.0, 0.1], "y": [0.0, 0.1]},  # missing z
+        {"x": [0.0, 0.1], "y": [0.0], "z": [1.0, 1.0]},  # length mismatch
+        {"x": [0.0, "a"], "y": [0.0, 0.1], "z": [1.0, 1.0]},  # not numeric
+        {"x": [0.0], "y": [0.0], "z": [1.0], "timestamps": [1, 2]},  # bad timestamps
+        {"timestamps": [1, 2]},  # timestamps without axes
+    ],
+)
+def test_columnar_data_validation(columns):
+    """Test that malformed columns are rejected."""
+    with pytest.raises(ValidationError):
+        AccelerationData(
+            data_type="acceleration",
+            device_info={},
+            sampling_rate_hz=10,
+            start_time=datetime.utcnow(),
+            **columns,
+        )
+
+
+def test_samples_are_stored_as_columns(sample_acceleration_data):
+    """Test that samples validate into columns and index as sample models."""
+    samples = sample_acceleration_data.samples
+
+    assert isinstance(samples, SampleList)
+    assert samples.arrays.x.dtype == sample_dtype()
+    assert isinstance(samples[0], AccelerationSample)
+    assert samples[-1].x == pytest.approx(float(samples.arrays.x[-1]))
+    assert isinstance(samples[1:3], SampleList) and len(samples[1:3]) == 2
+    assert samples == list(samples)
+
+
+def test_samples_json_round_trip(sample_acceleration_data):
+    """Test that samples serialize as a list of sample objects."""
+    parsed = AccelerationData.parse_raw(sample_acceleration_data.json())
+
+    assert parsed.samples == sample_acceleration_data.samples
+    assert (
+        AccelerationData(
+            data_type="acceleration",
+            device_info={},
+            sampling_rate_hz=10,
+            start_time=datetime.utcnow(),
+        ).samples
+        == []
+    )
+
+
+def test_samples_validation():
+    """Test that samples missing a field are rejected."""
+    with pytest.raises(ValidationError, match="timestamp, x, y and z"):
+        AccelerationData(
+            data_type="acceleration",
+            device_info={},
+            sampling_rate_hz=10,
+            start_time=datetime.utcnow(),
+            samples=[{"timestamp": datetime.utcnow(), "x": 0.0, "y": 0.0}],
+        )
+
+
+def test_sample_dtype_policy(monkeypatch):
+    """Test that axes are stored in the configured dtype, copying only to narrow."""
+    float32 = np.zeros(4, dtype=np.float32)
+    float64 = np.zeros(4)
+
+    assert np.shares_memory(FloatArray.validate(float32), float32)
+    assert FloatArray.validate(float64).dtype == np.float32
+    assert FloatArray.validate([0.0, 1.0]).dtype == np.float32
+
+    monkeypatch.setattr(settings, "SAMPLE_DTYPE", "float64")
+    assert np.shares_memory(FloatArray.validate(float64), float64)
+    assert np.shares_memory(FloatArray.validate(float32), float32)
+
+    monkeypatch.setattr(settings, "SAMPLE_DTYPE", "float16")
+    with pytest.raises(ValueError, match="SAMPLE_DTYPE"):
+        sample_dtype()
@@ -0,0 +1,170 @@
+import pickle
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from app.models.acceleration import AccelerationChunk
+from app.models.analysis import AnalysisRequest
+from app.models.streaming import StreamingSessionRequest
+from app.services.aggregates import AggregateStore, database_path
+from app.services.analysis import AnalysisService
+from app.services.cache import create_result_cache
+from app.services.streaming import StreamingSessionStore
+from app.utils.metrics import calculate_activity_metrics
+from app.utils.patterns import detect_activity_patterns
+from app.utils.signal import build_signal_frame
+
+
+def record(store, data, user_id="user-1", session_key=None):
+    frame = build_signal_frame(data)
+    patterns = detect_activity_patterns(data, frame)
+    return store.record_session(user_id, session_key or data.id, frame, patterns)
+
+
+def test_daily_trend_matches_session_metrics(make_flipping_acceleration_data):
+    """Test that a single-day rollup reproduces the session's metrics."""
+    data = make_flipping_acceleration_data(seed=1, n=6000)
+    store = AggregateStore()
+
+    assert record(store, data)
+    [bucket] = store.trends("user-1", "day")
+
+    metrics = calculate_activity_metrics(data)
+    patterns = detect_activity_patterns(data)
+    assert bucket.session_count == 1
+    assert bucket.sample_count == 6000
+    assert bucket.metrics.avg_intensity == pytest.approx(metrics.avg_intensity)
+    assert bucket.metrics.peak_intensity == pytest.approx(metrics.peak_intensity)
+    assert bucket.metrics.active_minutes == pytest.approx(metrics.active_minutes)
+    assert bucket.metrics.movement_consistency == pytest.approx(
+        metrics.movement_consistency
+    )
+    assert bucket.inactivity_count == len(patterns.inactivity_periods)
+
+
+def test_sessions_are_recorded_once(make_flipping_acceleration_data):
+    """Test that re-recording the same session does not double count it."""
+    data = make_flipping_acceleration_data(seed=1, n=600)
+    store = AggregateStore()
+
+    assert record(store, data)
+    assert not record(store, data)
+    assert record(store, data, user_id="user-2")
+
+    assert store.trends("user-1", "minute")[0].session_count == 1
+    assert sum(b.sample_count for b in store.trends("user-1", "minute")) == 600
+
+
+def test_trends_accumulate_and_filter_by_range(make_synthetic_acceleration_data):
+    """Test that sessions on different days accumulate into separate buckets."""
+    store = AggregateStore()
+    for day in range(3):
+        data = make_synthetic_acceleration_data("mixed", 10, 600, seed=day)
+        data.timestamps += np.timedelta64(day, "D")
+        record(store, data)
+
+    days = store.trends("user-1", "day")
+    assert [bucket.session_count for bucket in days] == [1, 1, 1]
+    assert len(store.trends("user-1", "hour")) == 3
+
+    start = days[1].bucket_start
+    in_range = store.trends("user-1", "day", start=start, end=start + timedelta(1))
+    assert in_range == [days[1]]
+    assert store.trends("someone-else", "day") == []
+
+
+def test_trends_rejects_unknown_granularity():
+    """Test that an unknown granularity is reported."""
+    with pytest.raises(ValueError):
+        AggregateStore().trends("user-1", "week")
+
+
+def test_store_is_shared_through_file_after_pickling(
+    tmp_path, make_flipping_acceleration_data
+):
+    """Test that a pickled file-backed store sees the same rollups."""
+    store = AggregateStore(str(tmp_path / "aggregates.db"))
+    record(store, make_flipping_acceleration_data(seed=1, n=600))
+
+    copy = pickle.loads(pickle.dumps(store))
+
+    assert copy.trends("user-1", "day") == store.trends("user-1", "day")
+
+
+def test_database_path():
+    """Test that the database URL is mapped to a SQLite path."""
+    assert database_path("") == ":memory:"
+    assert database_path("sqlite:///data/app.db") == "data/app.db"
+    with pytest.raises(ValueError):
+        database_path("postgresql://localhost/app")
+
+
+def test_service_records_each_analyzed_session(make_flipping_acceleration_data):
+    """Test that analysis updates the rollups once per distinct session."""
+    service = AnalysisService(aggregates=AggregateStore())
+    data = make_flipping_acceleration_data(seed=2, n=600)
+    anonymous = make_flipping_acceleration_data(seed=3, n=600)
+    anonymous.id = None
+
+    for item in (data, data, anonymous, anonymous):
+        service.analyze(AnalysisRequest(acceleration_data=item, user_id="user-1"))
+
+    [bucket] = service.aggregates.trends("user-1", "day")
+    assert bucket.session_count == 2
+
+
+def test_cached_sessions_are_recorded_for_every_user(make_flipping_acceleration_data):
+    """Test that a cache hit still adds the session to a new user's trends."""
+    service = AnalysisService(
+        cache=create_result_cache("memory"), aggregates=AggregateStore()
+    )
+    data = make_flipping_acceleration_data(seed=2, n=600)
+
+    for user_id in ("user-1", "user-2", "user-2"):
+        service.analyze(AnalysisRequest(acceleration_data=data, user_id=user_id))
+
+    assert service.aggregates.has_session("user-2", data.id)
+    assert [b.session_count for b in service.aggregates.trends("user-2")] == [1]
+    assert service.aggregates.trends("user-2") == service.aggregates.trends("user-1")
+
+
+def test_finished_streams_are_recorded(make_synthetic_acceleration_data):
+    """Test that a streamed session reaches the trends as if analyzed at once."""
+    data = make_synthetic_acceleration_data("mixed", 10, 900, seed=4)
+    batch = AnalysisService(aggregates=AggregateStore())
+    batch.analyze(AnalysisRequest(acceleration_data=data, user_id="user-1"))
+
+    sessions = StreamingSessionStore(aggregates=AggregateStore())
+    session_id = sessions.create(
+        StreamingSessionRequest(
+            data_type=data.data_type,
+            device_info=data.device_info,
+            sampling_rate_hz=data.sampling_rate_hz,
+            start_time=data.start_time,
+            user_id="user-1",
+        )
+    ).session_id
+    arrays = data.to_arrays()
+    # Chunks that do not line up with minute buckets, enough to be merged
+    for start in range(0, len(arrays.x), 130):
+        sessions.append(
+            session_id,
+            AccelerationChunk(
+                timestamps=arrays.timestamps[start : start + 130].view(
+                    "datetime64[ns]"
+                ),
+                **{axis: getattr(arrays, axis)[start : start + 130] for axis in "xyz"},
+            ),
+        )
+    sessions.finish(session_id)
+
+    for granularity in ("minute", "day"):
+        streamed = sessions.aggregates.trends("user-1", granularity)
+        expected = batch.aggregates.trends("user-1", granularity)
+        assert len(streamed) == len(expected)
+        for bucket, expected_bucket in zip(streamed, expected):
+            assert bucket.sample_count == expected_bucket.sample_count
+            assert bucket.inactivity_count == expected_bucket.inactivity_count
+            for field, value in expected_bucket.metrics.dict().items():
+                assert getattr(bucket.metrics, field) == pytest.approx(value)
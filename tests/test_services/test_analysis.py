@@ -1,7 +1,21 @@
 import pytest
 
+from app.core.config import settings
+from app.core.executors import create_executor
+from app.core.instrumentation import STAGE_SECONDS, registry
 from app.models.analysis import AnalysisRequest
-from app.services.analysis import AnalysisService
+from app.services.aggregates import AggregateStore
+from app.services.analysis import (
+    ANALYSIS_BYTES_PER_SAMPLE,
+    MIN_BLOCK_SAMPLES,
+    AnalysisService,
+    analyze_sessions,
+)
+
+
+def advice(items):
+    """Insights or recommendations without their per-response ids."""
+    return [item.dict(exclude={"id"}) for item in items]
 
 
 @pytest.fixture
@@ -104,3 +118,194 @@ def test_analyze_with_inactive_data(
         r for r in response.recommendations if r.recommendation_type == "inactivity"
     ]
     assert len(inactivity_recommendations) > 0
+
+
+@pytest.mark.parametrize("kind", [None, "thread", "process"])
+def test_analyze_batch(
+    analysis_service,
+    sample_acceleration_data,
+    sample_inactive_acceleration_data,
+    kind,
+):
+    """Test that batch analysis returns one result per request, in order."""
+    requests = [
+        AnalysisRequest(acceleration_data=data, user_id=f"test-user-{i}")
+        for i, data in enumerate(
+            [sample_acceleration_data, sample_inactive_acceleration_data] * 3
+        )
+    ]
+
+    executor = create_executor(kind, max_workers=2) if kind else None
+    try:
+        results = analysis_service.analyze_batch(requests, executor)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    assert len(results) == len(requests)
+    for request, result in zip(requests, results):
+        assert result.status == "success"
+        expected = analysis_service.analyze(request)
+        assert result.metrics == expected.metrics
+        assert advice(result.insights) == advice(expected.insights)
+        assert advice(result.recommendations) == advice(expected.recommendations)
+
+
+def stage_count(stage):
+    """Observations of an analysis stage in the metrics registry."""
+    prefix = f'{STAGE_SECONDS}_count{{stage="{stage}"}} '
+    lines = [line for line in registry.render().splitlines() if line.startswith(prefix)]
+    return int(lines[0][len(prefix) :]) if lines else 0
+
+
+def test_stages_timed_in_worker_processes_are_recorded(
+    analysis_service, sample_acceleration_data
+):
+    """Test that stage timings of process workers reach this process' registry."""
+    request = AnalysisRequest(
+        acceleration_data=sample_acceleration_data, user_id="test-user-1"
+    )
+    before = stage_count("metrics")
+
+    executor = create_executor("process", max_workers=1)
+    try:
+        analysis_service.analyze(request, executor)
+        analysis_service.analyze_batch([request] * 2, executor)
+    finally:
+        executor.shutdown()
+
+    assert stage_count("metrics") == before + 3
+
+
+def test_analyze_batch_reports_errors_per_item(
+    analysis_service, sample_acceleration_data, monkeypatch
+):
+    """Test that a failing item doesn't fail the whole batch."""
+    original_analyze_signal = AnalysisService.analyze_signal
+
+    def analyze_signal(self, request, lookup=None):
+        if request.user_id == "broken-user":
+            raise ValueError("boom")
+        return original_analyze_signal(self, request, lookup)
+
+    monkeypatch.setattr(AnalysisService, "analyze_signal", analyze_signal)
+
+    requests = [
+        AnalysisRequest(acceleration_data=sample_acceleration_data, user_id=user_id)
+        for user_id in ["test-user-1", "broken-user", "test-user-2"]
+    ]
+    results = analysis_service.analyze_batch(requests)
+
+    assert [r.status for r in results] == ["success", "error", "success"]
+    assert "boom" in results[1].message
+
+
+def test_analyze_with_resampling(make_synthetic_acceleration_data):
+    """Test that a decimating service reports metrics close to the full rate."""
+    data = make_synthetic_acceleration_data("mixed", 100, 600, seed=1)
+    request = AnalysisRequest(acceleration_data=data, user_id="test-user")
+
+    full = AnalysisService().analyze(request)
+    resampled = AnalysisService(resample_rate_hz=10).analyze(request)
+
+    assert resampled.status == "success"
+    assert resampled.metrics.avg_intensity == pytest.approx(full.metrics.avg_intensity)
+    assert resampled.metrics.active_minutes == pytest.approx(
+        full.metrics.active_minutes, abs=0.01
+    )
+
+
+def test_analyze_sessions_matches_analyze(
+    analysis_service, sample_active_acceleration_data, sample_inactive_acceleration_data
+):
+    """Test that vectorized multi-session analysis gives the same responses."""
+    sessions = [sample_active_acceleration_data, sample_inactive_acceleration_data]
+
+    responses = analyze_sessions(sessions)
+
+    for data, response in zip(sessions, responses):
+        expected = analysis_service.analyze(
+            AnalysisRequest(acceleration_data=data, user_id="test-user")
+        )
+        assert advice(response.insights) == advice(expected.insights)
+        assert advice(response.recommendations) == advice(expected.recommendations)
+        for field, value in expected.metrics.dict().items():
+            assert getattr(response.metrics, field) == pytest.approx(value)
+
+
+@pytest.mark.parametrize("resample_rate_hz", [0.0, 10.0])
+def test_analyze_in_blocks_matches_whole(
+    resample_rate_hz, make_synthetic_acceleration_data
+):
+    """Test that memory-budget mode gives the same results and trend rollups."""
+    data = make_synthetic_acceleration_data("mixed", 50, 1800, seed=5)
+    request = AnalysisRequest(
+        acceleration_data=data, user_id="test-user", include_patterns=True
+    )
+    whole = AnalysisService(
+        aggregates=AggregateStore(), resample_rate_hz=resample_rate_hz
+    )
+    budgeted = AnalysisService(
+        aggregates=AggregateStore(),
+        resample_rate_hz=resample_rate_hz,
+        memory_budget_bytes=MIN_BLOCK_SAMPLES * ANALYSIS_BYTES_PER_SAMPLE,
+    )
+    assert budgeted.block_samples(data.sample_count) == MIN_BLOCK_SAMPLES
+    assert whole.block_samples(data.sample_count) == 0
+
+    expected = whole.analyze(request)
+    response = budgeted.analyze(request)
+
+    for field, value in expected.metrics.dict().items():
+        assert getattr(response.metrics, field) == pytest.approx(value, abs=1e-9)
+    assert response.patterns == expected.patterns
+    assert advice(response.insights) == advice(expected.insights)
+
+    expected_trend = whole.aggregates.trends("test-user", "minute")
+    trend = budgeted.aggregates.trends("test-user", "minute")
+    assert len(trend) == len(expected_trend) == 30
+    for bucket, expected_bucket in zip(trend, expected_trend):
+        assert bucket.sample_count == expected_bucket.sample_count
+        assert bucket.inactivity_count == expected_bucket.inactivity_count
+        assert bucket.metrics.avg_intensity == pytest.approx(
+            expected_bucket.metrics.avg_intensity
+        )
+        assert bucket.metrics.active_minutes == pytest.approx(
+            expected_bucket.metrics.active_minutes
+        )
+
+
+def assert_metrics_close(actual, expected, path="metrics"):
+    """Compare nested metric dicts, numbers within the float32 storage tolerance."""
+    if isinstance(expected, dict):
+        for key, value in expected.items():
+            assert_metrics_close(actual[key], value, f"{path}.{key}")
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected), path
+        for index, (got, value) in enumerate(zip(actual, expected)):
+            assert_metrics_close(got, value, f"{path}[{index}]")
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, rel=1e-4, abs=1e-6), path
+    else:
+        assert actual == expected, path
+
+
+@pytest.mark.parametrize("profile", ["rest", "walking", "mixed"])
+def test_float32_storage_matches_float64(
+    profile, monkeypatch, make_synthetic_acceleration_data
+):
+    """Test that float32 sample storage keeps metrics within the tolerance."""
+    responses = {}
+    for dtype in ("float64", "float32"):
+        monkeypatch.setattr(settings, "SAMPLE_DTYPE", dtype)
+        data = make_synthetic_acceleration_data(profile, 50, 1800, seed=7)
+        assert data.to_arrays().x.dtype == dtype
+        request = AnalysisRequest(acceleration_data=data, user_id="test-user")
+        responses[dtype] = AnalysisService().analyze(request)
+
+    assert_metrics_close(
+        responses["float32"].metrics.dict(), responses["float64"].metrics.dict()
+    )
+    assert advice(responses["float32"].insights) == advice(
+        responses["float64"].insights
+    )
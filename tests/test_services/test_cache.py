@@ -0,0 +1,144 @@
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.executors import create_executor
+from app.models.analysis import AnalysisRequest, AnalysisResponse
+from app.services.analysis import AnalysisService
+from app.services.cache import (
+    DiskResultCache,
+    MemoryResultCache,
+    analysis_cache_key,
+    create_result_cache,
+)
+from app.utils.signal import build_signal_frame
+
+
+@pytest.fixture(params=["memory", "disk"])
+def result_cache(request, tmp_path):
+    """Create each cache backend for testing."""
+    return create_result_cache(
+        request.param, max_entries=2, ttl_seconds=60, path=str(tmp_path / "c.db")
+    )
+
+
+def test_cache_get_set_and_counters(result_cache):
+    """Test that cached responses are returned and hits/misses counted."""
+    response = AnalysisResponse(status="success", message="cached")
+
+    assert result_cache.get("a") is None
+    result_cache.set("a", response)
+
+    assert result_cache.get("a") == response
+    assert result_cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_cache_evicts_beyond_max_entries(result_cache):
+    """Test that the cache keeps at most max_entries responses."""
+    for key in "abc":
+        result_cache.set(key, AnalysisResponse(status="success", message=key))
+
+    assert len(result_cache) == 2
+    assert result_cache.get("c").message == "c"
+
+
+def test_memory_cache_is_lru():
+    """Test that the least recently used entry is evicted first."""
+    cache = MemoryResultCache(max_entries=2)
+    cache.set("a", AnalysisResponse(status="success"))
+    cache.set("b", AnalysisResponse(status="success"))
+    cache.get("a")
+    cache.set("c", AnalysisResponse(status="success"))
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+
+
+def test_cache_expires_entries(tmp_path):
+    """Test that entries older than the TTL are not served."""
+    for cache in [
+        MemoryResultCache(ttl_seconds=0.01),
+        DiskResultCache(str(tmp_path / "c.db"), ttl_seconds=0.01),
+    ]:
+        cache.set("a", AnalysisResponse(status="success"))
+        time.sleep(0.02)
+        assert cache.get("a") is None
+
+
+def test_disk_cache_is_shared_across_pickling(tmp_path):
+    """Test that a pickled disk cache still sees the same entries."""
+    cache = DiskResultCache(str(tmp_path / "c.db"))
+    cache.set("a", AnalysisResponse(status="success", message="shared"))
+
+    clone = pickle.loads(pickle.dumps(cache))
+
+    assert clone.get("a").message == "shared"
+    assert pickle.loads(pickle.dumps(MemoryResultCache())).stats()["entries"] == 0
+
+
+def test_cache_key_depends_on_samples_and_options(
+    sample_acceleration_data, sample_active_acceleration_data
+):
+    """Test that the key changes with the samples and the include flags."""
+
+    def key(data, **options):
+        request = AnalysisRequest(acceleration_data=data, user_id="u", **options)
+        return analysis_cache_key(request, build_signal_frame(data))
+
+    assert key(sample_acceleration_data) == key(sample_acceleration_data)
+    assert key(sample_acceleration_data) != key(sample_active_acceleration_data)
+    assert key(sample_acceleration_data) != key(
+        sample_acceleration_data, include_insights=False
+    )
+    assert key(sample_acceleration_data) != key(
+        sample_acceleration_data, include_patterns=True
+    )
+
+
+def test_service_serves_repeated_requests_from_cache(sample_acceleration_data):
+    """Test that identical requests are analyzed once, even concurrently."""
+    service = AnalysisService(cache=MemoryResultCache())
+    request = AnalysisRequest(
+        acceleration_data=sample_acceleration_data, user_id="test-user-1"
+    )
+    first = service.analyze(request)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        responses = list(executor.map(service.analyze, [request] * 20))
+
+    # Every response gets its own insight ids
+    without_ids = {
+        "insights": {"__all__": {"id"}},
+        "recommendations": {"__all__": {"id"}},
+    }
+    assert all(
+        response.dict(exclude=without_ids) == first.dict(exclude=without_ids)
+        for response in responses
+    )
+    ids = [
+        insight.id for response in [first, *responses] for insight in response.insights
+    ]
+    assert len(set(ids)) == len(ids)
+    assert service.cache.stats() == {"hits": 20, "misses": 1, "entries": 1}
+
+
+def test_service_uses_its_cache_with_worker_processes(sample_acceleration_data):
+    """Test that analyses run in worker processes still fill and hit the cache."""
+    service = AnalysisService(cache=MemoryResultCache())
+    request = AnalysisRequest(
+        acceleration_data=sample_acceleration_data, user_id="test-user-1"
+    )
+
+    executor = create_executor("process", max_workers=1)
+    try:
+        first = service.analyze(request, executor)
+        second = service.analyze(request, executor)
+        batch = service.analyze_batch([request] * 2, executor)
+    finally:
+        executor.shutdown()
+
+    assert second.metrics == first.metrics
+    assert all(response.metrics == first.metrics for response in batch)
+    assert service.cache.stats() == {"hits": 3, "misses": 1, "entries": 1}
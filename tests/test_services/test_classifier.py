@@ -0,0 +1,126 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from app.models.analysis import AnalysisRequest
+from app.services.analysis import AnalysisService, analyze_sessions
+from app.services.classifier import (
+    ACTIVITY_LEVELS,
+    LEVEL_FIELDS,
+    LevelAccumulator,
+    load_activity_classifier,
+    synthetic_training_set,
+)
+from app.utils.signal import DEFAULT_SAMPLING_RATE_HZ, build_signal_frame
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return load_activity_classifier()
+
+
+@pytest.mark.parametrize(
+    "profile, level", [("rest", "sedentary"), ("walking", "moderate")]
+)
+@pytest.mark.parametrize("rate_hz", [10, 50])
+def test_steady_activity_has_one_level(
+    profile, level, rate_hz, classifier, make_synthetic_acceleration_data
+):
+    """Test that rest and walking are labeled sedentary and moderate throughout."""
+    data = make_synthetic_acceleration_data(profile, rate_hz, 600, seed=2)
+    frame = build_signal_frame(data)
+
+    minutes = classifier.level_minutes(frame.magnitude, rate_hz)
+
+    assert minutes == {
+        field: 10.0 if field == f"{level}_minutes" else 0.0 for field in LEVEL_FIELDS
+    }
+
+
+def test_bundled_model_accuracy(classifier):
+    """Test the bundled model on synthetic windows it was not trained on."""
+    features, labels = synthetic_training_set(windows_per_level=400, seed=7)
+
+    accuracy = np.mean(classifier.predict(features) == labels)
+
+    assert accuracy > 0.97
+    assert set(classifier.predict(features)) == set(range(len(ACTIVITY_LEVELS)))
+
+
+def test_chunked_levels_match_whole(classifier, make_synthetic_acceleration_data):
+    """Test that a recording fed in uneven chunks gets the same minutes."""
+    data = make_synthetic_acceleration_data("mixed", 50, 1800, seed=4)
+    magnitude = build_signal_frame(data).magnitude
+
+    accumulator = LevelAccumulator(classifier, 50)
+    for chunk in np.array_split(magnitude, [1, 777, 5000, 5001, 60000]):
+        accumulator.update(chunk)
+
+    minutes = accumulator.minutes()
+    assert minutes == classifier.level_minutes(magnitude, 50)
+    # Every complete 10 s window gets a level
+    assert sum(minutes.values()) == pytest.approx(30.0)
+
+
+def test_many_matches_single(classifier, make_synthetic_acceleration_data):
+    """Test that one model call for many signals matches per-signal calls."""
+    frames = [
+        build_signal_frame(make_synthetic_acceleration_data(profile, rate, 300, seed))
+        for seed, (profile, rate) in enumerate(
+            [("mixed", 50), ("rest", 10), ("walking", 25)]
+        )
+    ]
+    magnitudes = [frame.magnitude for frame in frames] + [np.empty(0)]
+    rates = [frame.sampling_rate_hz for frame in frames] + [50.0]
+
+    many = classifier.level_minutes_many(magnitudes, rates)
+
+    assert many == [
+        classifier.level_minutes(magnitude, rate)
+        for magnitude, rate in zip(magnitudes, rates)
+    ]
+
+
+def test_unknown_rate_uses_default(classifier, make_synthetic_acceleration_data):
+    """Test that a rate of 0 is classified at the default sampling rate."""
+    data = make_synthetic_acceleration_data("walking", DEFAULT_SAMPLING_RATE_HZ, 120)
+    magnitude = build_signal_frame(data).magnitude
+    expected = classifier.level_minutes(magnitude, DEFAULT_SAMPLING_RATE_HZ)
+
+    accumulator = LevelAccumulator(classifier, 0)
+    accumulator.update(magnitude)
+
+    assert classifier.level_minutes(magnitude, 0) == expected
+    assert classifier.level_minutes_many([magnitude], [0]) == [expected]
+    assert accumulator.minutes() == expected
+
+
+def test_pickles_by_path(classifier):
+    """Test that the classifier pickles as its path and reloads the cached model."""
+    payload = pickle.dumps(classifier)
+
+    assert len(payload) < 1000
+    assert pickle.loads(payload) is classifier
+
+
+def test_analysis_paths_agree(classifier, make_synthetic_acceleration_data):
+    """Test level minutes from whole, block and many-session analysis."""
+    data = make_synthetic_acceleration_data("mixed", 50, 1800, seed=5)
+    request = AnalysisRequest(user_id="user-1", acceleration_data=data)
+
+    whole = AnalysisService(classifier=classifier).analyze(request).metrics
+    blocks = (
+        AnalysisService(classifier=classifier, memory_budget_bytes=1 << 20)
+        .analyze(request)
+        .metrics
+    )
+    [many] = analyze_sessions([data], classifier=classifier)
+
+    assert sum(getattr(whole, field) > 0 for field in LEVEL_FIELDS) > 1
+    for metrics in (blocks, many.metrics):
+        for field in LEVEL_FIELDS:
+            assert getattr(metrics, field) == pytest.approx(getattr(whole, field))
+    # Without a classifier the level fields stay at zero
+    plain = AnalysisService().analyze(request).metrics
+    assert all(getattr(plain, field) == 0.0 for field in LEVEL_FIELDS)
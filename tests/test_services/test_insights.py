@@ -0,0 +1,231 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from app.models.acceleration import ActivityMetrics, ActivityPatterns, InactivityPeriod
+from app.services.insights import (
+    FEATURES,
+    RuleEngine,
+    feature_matrix,
+    generate_insights,
+    generate_recommendations,
+    rule_engine,
+)
+
+
+def make_patterns(count: int) -> ActivityPatterns:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return ActivityPatterns(
+        inactivity_periods=[
+            InactivityPeriod(
+                start_time=start + timedelta(minutes=i),
+                end_time=start + timedelta(minutes=i, seconds=30),
+                duration=30.0,
+            )
+            for i in range(count)
+        ]
+    )
+
+
+def reference_insight_ids(m: ActivityMetrics, inactivity_count: int):
+    """The original if/elif chain, reduced to which branch fires."""
+    ids = []
+    if m.avg_intensity < 0.2:
+        ids.append("activity_level_low")
+    elif m.avg_intensity > 0.7:
+        ids.append("activity_level_high")
+    elif m.avg_intensity > 0.3:
+        ids.append("activity_level_good")
+    else:
+        ids.append("activity_level_moderate")
+    if inactivity_count:
+        ids.append("inactivity_frequent" if inactivity_count > 3 else "inactivity")
+    if m.movement_consistency > 0.7 and m.total_duration > 5.0:
+        ids.append("consistency_high")
+    elif m.movement_consistency < 0.3 and m.total_duration > 5.0:
+        ids.append("consistency_low")
+    return ids
+
+
+def reference_recommendation_ids(m: ActivityMetrics, inactivity_count: int):
+    """The original if/elif chain, reduced to which branch fires."""
+    ids = []
+    if m.avg_intensity < 0.2:
+        ids.append("activity_level_low")
+    elif m.avg_intensity > 0.7:
+        ids.append("activity_level_high")
+    else:
+        ids.append("activity_level_moderate")
+    if inactivity_count:
+        ids.append("inactivity")
+    if m.movement_consistency < 0.3 and m.total_duration > 5.0:
+        ids.append("consistency_low")
+    if m.active_minutes < 5.0 and m.total_duration > 10.0:
+        ids.append("daily_goal_small")
+    elif m.active_minutes > 20.0:
+        ids.append("daily_goal_met")
+    return ids
+
+
+def random_sessions(seed: int, n: int):
+    rng = np.random.default_rng(seed)
+    # Thresholds are hit exactly now and then to check strict comparisons
+    grid = np.array([0.0, 0.2, 0.3, 0.7, 1.0])
+    metrics = [
+        ActivityMetrics(
+            avg_intensity=rng.choice([rng.random(), rng.choice(grid)]),
+            peak_intensity=rng.random(),
+            movement_consistency=rng.choice([rng.random(), rng.choice(grid)]),
+            active_minutes=rng.choice([0.0, 5.0, 20.0, rng.uniform(0, 40)]),
+            total_duration=rng.choice([0.0, 5.0, 10.0, rng.uniform(0, 60)]),
+        )
+        for _ in range(n)
+    ]
+    patterns = [make_patterns(int(rng.integers(0, 6))) for _ in range(n)]
+    return metrics, patterns
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_rule_table_matches_original_chains(seed):
+    """Test that the bundled rule table reproduces the original branches."""
+    for metrics, patterns in zip(*random_sessions(seed, 200)):
+        count = len(patterns.inactivity_periods)
+
+        insights = generate_insights(metrics, patterns)
+        recommendations = generate_recommendations(metrics, patterns)
+
+        assert [i.rule_id for i in insights] == reference_insight_ids(metrics, count)
+        assert [r.rule_id for r in recommendations] == reference_recommendation_ids(
+            metrics, count
+        )
+
+
+def test_evaluate_many_matches_single_evaluation():
+    """Test that one vectorized pass equals evaluating sessions one by one."""
+    metrics, patterns = random_sessions(seed=9, n=500)
+    features = feature_matrix(metrics, patterns)
+
+    batch = rule_engine.insights.generate_many(features)
+
+    expected = [generate_insights(m, p) for m, p in zip(metrics, patterns)]
+    assert [[i.dict(exclude={"id"}) for i in row] for row in batch] == [
+        [i.dict(exclude={"id"}) for i in row] for row in expected
+    ]
+
+
+def test_advice_ids_are_unique():
+    """Test that every response object gets its own id, with its rule's id."""
+    metrics, patterns = random_sessions(seed=4, n=50)
+
+    insights = [i for m, p in zip(metrics, patterns) for i in generate_insights(m, p)]
+
+    assert len({i.id for i in insights}) == len(insights)
+    assert {i.rule_id for i in insights} <= {
+        rule["id"] for rule in rule_engine.insights.rules
+    }
+
+
+def test_messages_are_formatted_from_features():
+    """Test that message templates are filled in with whole-number counts."""
+    metrics = ActivityMetrics(
+        avg_intensity=0.5,
+        peak_intensity=0.9,
+        movement_consistency=0.5,
+        active_minutes=10.0,
+        total_duration=30.0,
+    )
+
+    [_, inactivity] = generate_insights(metrics, make_patterns(5))
+
+    assert inactivity.insight_type == "inactivity"
+    assert inactivity.priority == "high"
+    assert inactivity.message.startswith("I noticed 5 periods of inactivity.")
+
+
+def test_rules_are_added_by_configuration(tmp_path):
+    """Test that a rule file adds rules without code changes."""
+    path = tmp_path / "rules.json"
+    path.write_text(
+        json.dumps(
+            {
+                "insights": [
+                    {
+                        "id": "peak",
+                        "type": "peak",
+                        "when": [["peak_intensity", ">=", 0.9]],
+                        "priority": "high",
+                        "message": "Peak {peak_intensity:.0%}",
+                    },
+                    {
+                        "id": "long",
+                        "type": "duration",
+                        "group": "peak",
+                        "when": [["total_duration", ">", 60]],
+                        "priority": "low",
+                        "message": "Long session",
+                    },
+                ]
+            }
+        )
+    )
+    engine = RuleEngine.from_file(str(path))
+    features = np.array(
+        [
+            [0.1, 0.95, 0.5, 1.0, 90.0, 0],
+            [0.1, 0.5, 0.5, 1.0, 90.0, 0],
+            [0.1, 0.5, 0.5, 1.0, 10.0, 0],
+        ]
+    )
+
+    results = engine.insights.generate_many(features)
+
+    # Rules sharing a group are exclusive, the first match wins
+    assert [[i.message for i in row] for row in results] == [
+        ["Peak 95%"],
+        ["Long session"],
+        [],
+    ]
+    assert engine.recommendations.generate_many(features) == [[], [], []]
+
+
+@pytest.mark.parametrize(
+    "rule",
+    [
+        {"id": "a", "type": "t", "priority": "low", "message": "m"},
+        {"id": "a", "type": "t", "priority": "low", "message": "m", "when": [["x"]]},
+        {
+            "id": "a",
+            "type": "t",
+            "priority": "low",
+            "message": "m",
+            "when": [["unknown", "<", 1]],
+        },
+        {
+            "id": "a",
+            "type": "t",
+            "priority": "low",
+            "message": "m",
+            "when": [["avg_intensity", "~", 1]],
+        },
+        {"id": "a", "type": "t", "priority": "urgent", "message": "m", "when": []},
+        {"id": "a", "type": ["t"], "priority": "low", "message": "m", "when": []},
+    ],
+)
+def test_invalid_rules_are_rejected(rule):
+    """Test that malformed rules fail when the table is compiled."""
+    with pytest.raises(ValueError):
+        RuleEngine({"insights": [rule]})
+
+
+def test_feature_matrix_columns():
+    """Test that features follow the FEATURES column order."""
+    metrics, patterns = random_sessions(seed=1, n=3)
+
+    features = feature_matrix(metrics, patterns)
+
+    assert features.shape == (3, len(FEATURES))
+    assert features[0, FEATURES.index("avg_intensity")] == metrics[0].avg_intensity
+    assert features[2, -1] == len(patterns[2].inactivity_periods)
+    assert feature_matrix([], []).shape == (0, len(FEATURES))
@@ -0,0 +1,237 @@
+import threading
+
+import httpx
+import pytest
+
+from app.core.executors import BoundedExecutor, ExecutorSaturatedError
+from app.models.analysis import AnalysisRequest
+from app.services.analysis import AnalysisService
+from app.services.jobs import (
+    CallbackURLError,
+    JobManager,
+    MemoryJobStore,
+    SqliteJobStore,
+    check_callback_url,
+    create_job_store,
+)
+
+
+def make_request(data) -> AnalysisRequest:
+    return AnalysisRequest(
+        acceleration_data=data, user_id="user-1", include_insights=True
+    )
+
+
+def run_jobs(manager: JobManager) -> None:
+    # Wait for every submitted job to finish
+    manager.executor.shutdown(wait=True)
+
+
+def test_job_runs_and_stores_result(sample_acceleration_data):
+    """Test that a submitted job succeeds with the same result as a direct call."""
+    service = AnalysisService()
+    manager = JobManager(service, MemoryJobStore())
+    request = make_request(sample_acceleration_data)
+
+    job = manager.submit(request)
+    assert job.status == "queued"
+    run_jobs(manager)
+
+    stored = manager.store.get(job.job_id)
+    assert stored.status == "succeeded"
+    assert stored.result.metrics == service.analyze(request).metrics
+    assert stored.error is None
+    assert manager.store.unfinished() == []
+    assert manager.stats()["pending"] == 0
+
+
+def test_failed_job_records_error(sample_acceleration_data, monkeypatch):
+    """Test that an analysis error marks the job as failed."""
+    service = AnalysisService()
+
+    def fail(request):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(service, "analyze", fail)
+    manager = JobManager(service, MemoryJobStore())
+    job = manager.submit(make_request(sample_acceleration_data))
+    run_jobs(manager)
+
+    stored = manager.store.get(job.job_id)
+    assert stored.status == "failed"
+    assert stored.error == "Error analyzing data: boom"
+    assert stored.result is None
+
+
+def test_jobs_run_on_the_analysis_executor(sample_acceleration_data, monkeypatch):
+    """Test that job analyses share the bounded executor of interactive requests."""
+    service = AnalysisService()
+    analyze_signal = service.analyze_signal
+    threads = []
+
+    def record_thread(request, lookup=None):
+        threads.append(threading.current_thread().name)
+        return analyze_signal(request, lookup)
+
+    monkeypatch.setattr(service, "analyze_signal", record_thread)
+    executor = BoundedExecutor("thread", max_workers=1, max_queue=0)
+    manager = JobManager(service, MemoryJobStore(), analysis_executor=executor)
+    try:
+        # Jobs wait for the executor rather than being rejected when it is busy
+        jobs = [
+            manager.submit(make_request(sample_acceleration_data)) for _ in range(3)
+        ]
+        run_jobs(manager)
+    finally:
+        executor.shutdown()
+
+    assert all(manager.store.get(job.job_id).status == "succeeded" for job in jobs)
+    assert len(threads) == 3
+    assert all(name.startswith("analysis_") for name in threads)
+    assert executor.stats()["in_flight"] == 0
+
+
+def test_full_queue_is_rejected(sample_acceleration_data):
+    """Test that submissions beyond the worker and queue limit are refused."""
+    manager = JobManager(AnalysisService(), MemoryJobStore(), max_workers=1)
+    manager.max_queue = 0
+    manager._pending = 1
+
+    with pytest.raises(ExecutorSaturatedError):
+        manager.submit(make_request(sample_acceleration_data))
+    assert manager._pending == 1
+
+
+def test_callback_receives_finished_job(sample_acceleration_data, monkeypatch):
+    """Test that the finished job is POSTed to its callback URL, with retries."""
+    calls = []
+
+    def post(url, content, headers, timeout):
+        calls.append((url, content))
+        status = 500 if len(calls) == 1 else 200
+        return httpx.Response(status, request=httpx.Request("POST", url))
+
+    monkeypatch.setattr(httpx, "post", post)
+    monkeypatch.setattr("app.services.jobs.time.sleep", lambda seconds: None)
+    manager = JobManager(
+        AnalysisService(), MemoryJobStore(), callback_hosts=["hooks.test"]
+    )
+    job = manager.submit(
+        make_request(sample_acceleration_data), callback_url="http://hooks.test/done"
+    )
+    run_jobs(manager)
+
+    assert [url for url, _ in calls] == ["http://hooks.test/done"] * 2
+    assert '"status": "succeeded"' in calls[-1][1]
+    assert manager.store.get(job.job_id).callback_status == "delivered"
+
+
+def test_undeliverable_callback_is_recorded(sample_acceleration_data, monkeypatch):
+    """Test that a callback failing every attempt is reported on the job."""
+
+    def post(url, content, headers, timeout):
+        raise httpx.ConnectError("refused")
+
+    monkeypatch.setattr(httpx, "post", post)
+    monkeypatch.setattr("app.services.jobs.time.sleep", lambda seconds: None)
+    manager = JobManager(
+        AnalysisService(),
+        MemoryJobStore(),
+        callback_retries=2,
+        callback_hosts=["hooks.test"],
+    )
+    job = manager.submit(
+        make_request(sample_acceleration_data), callback_url="http://hooks.test/done"
+    )
+    run_jobs(manager)
+
+    stored = manager.store.get(job.job_id)
+    assert stored.status == "succeeded"
+    assert stored.callback_status == "failed"
+
+
+def test_sqlite_store_resumes_unfinished_jobs(sample_acceleration_data, tmp_path):
+    """Test that queued jobs survive a restart and run on the next manager."""
+    path = str(tmp_path / "jobs.sqlite3")
+    request = make_request(sample_acceleration_data)
+
+    # A manager that never runs its jobs, as if the process stopped
+    stopped = JobManager(AnalysisService(), SqliteJobStore(path))
+    stopped.executor.shutdown()
+    with pytest.raises(RuntimeError):
+        stopped.submit(request)
+
+    store = SqliteJobStore(path)
+    [(job, stored_request)] = store.unfinished()
+    assert job.status == "queued"
+    assert stored_request.acceleration_data.id == sample_acceleration_data.id
+    assert stored_request.include_insights
+
+    manager = JobManager(AnalysisService(), store)
+    assert manager.resume() == 1
+    run_jobs(manager)
+
+    finished = SqliteJobStore(path).get(job.job_id)
+    assert finished.status == "succeeded"
+    assert finished.result.insights
+    assert SqliteJobStore(path).unfinished() == []
+
+
+def test_finished_jobs_expire(sample_acceleration_data, tmp_path):
+    """Test that finished jobs are dropped after the TTL, pending ones are kept."""
+    for store in (
+        MemoryJobStore(ttl_seconds=0),
+        SqliteJobStore(str(tmp_path / "jobs.sqlite3"), ttl_seconds=0),
+    ):
+        manager = JobManager(AnalysisService(), store)
+        finished = manager.submit(make_request(sample_acceleration_data))
+        run_jobs(manager)
+
+        store.add(
+            finished.copy(update={"job_id": "pending"}),
+            make_request(sample_acceleration_data),
+        )
+        assert store.get(finished.job_id) is None
+        assert store.get("pending").status == "queued"
+
+
+def test_create_job_store(tmp_path):
+    """Test that the factory builds each backend and rejects unknown ones."""
+    assert isinstance(create_job_store("memory"), MemoryJobStore)
+    store = create_job_store("sqlite", path=str(tmp_path / "jobs.sqlite3"))
+    assert isinstance(store, SqliteJobStore)
+    with pytest.raises(ValueError):
+        create_job_store("redis")
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "http://127.0.0.1:8000/done",
+        "http://localhost/done",
+        "http://10.1.2.3/done",
+        "http://169.254.169.254/latest/meta-data",
+        "http://[::1]/done",
+        "http://[::ffff:192.168.0.1]/done",
+        "ftp://93.184.216.34/done",
+    ],
+)
+def test_internal_callback_urls_are_refused(url):
+    """Test that callbacks cannot target loopback, private or link-local hosts."""
+    with pytest.raises(CallbackURLError):
+        check_callback_url(url)
+
+
+def test_callback_hosts_allowlist(sample_acceleration_data):
+    """Test that an allowlist replaces the address check."""
+    check_callback_url("http://93.184.216.34/done")
+    check_callback_url("https://Hooks.Test/done", ["hooks.test"])
+    with pytest.raises(CallbackURLError):
+        check_callback_url("http://93.184.216.34/done", ["hooks.test"])
+
+    manager = JobManager(AnalysisService(), MemoryJobStore())
+    with pytest.raises(CallbackURLError):
+        manager.submit(
+            make_request(sample_acceleration_data), callback_url="http://127.0.0.1/"
+        )
+    assert manager.stats()["pending"] == 0
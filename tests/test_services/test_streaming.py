@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from app.models.acceleration import AccelerationChunk, AccelerationData
+from app.models.analysis import AnalysisRequest
+from app.models.streaming import StreamingSessionRequest
+from app.services.analysis import AnalysisService
+from app.services.streaming import StreamingSession
+
+CHUNK = 100
+
+
+def with_repeats_and_swaps(data: AccelerationData, rng) -> AccelerationData:
+    """Columnar copy of ``data`` with repeated and swapped samples.
+
+    Repeats follow their original, with other values, and some start a chunk
+    of ``CHUNK`` samples; swaps stay within a chunk.
+    """
+    arrays = data.to_arrays()
+    columns = [arrays.timestamps, arrays.x, arrays.y, arrays.z]
+    repeated = np.concatenate(
+        ([CHUNK - 2, 3 * CHUNK - 3], rng.choice(len(arrays.x) - 1, 8, replace=False))
+    )
+    columns = [
+        np.insert(column, repeated + 1, column[repeated] * (1 if i == 0 else 1.5))
+        for i, column in enumerate(columns)
+    ]
+    # Swap neighbours away from chunk boundaries
+    for index in (CHUNK + 10, 4 * CHUNK + 50):
+        for column in columns:
+            column[[index, index + 1]] = column[[index + 1, index]]
+    timestamps, x, y, z = columns
+    return AccelerationData(
+        data_type=data.data_type,
+        device_info=data.device_info,
+        sampling_rate_hz=data.sampling_rate_hz,
+        start_time=data.start_time,
+        timestamps=timestamps.view("datetime64[ns]"),
+        x=x,
+        y=y,
+        z=z,
+    )
+
+
+def test_stream_matches_batch_with_repeats(make_synthetic_acceleration_data):
+    """Test that streamed chunks are ordered and deduplicated like a batch."""
+    original = make_synthetic_acceleration_data("mixed", 10, 300, seed=3)
+    data = with_repeats_and_swaps(original, np.random.default_rng(3))
+    expected = AnalysisService().analyze(
+        AnalysisRequest(acceleration_data=data, user_id="test-user")
+    )
+
+    session = StreamingSession(
+        "session",
+        StreamingSessionRequest(
+            data_type=data.data_type,
+            device_info=data.device_info,
+            sampling_rate_hz=data.sampling_rate_hz,
+            start_time=data.start_time,
+            user_id="test-user",
+        ),
+    )
+    arrays = data.to_arrays()
+    for start in range(0, len(arrays.x), CHUNK):
+        session.append(
+            AccelerationChunk(
+                timestamps=arrays.timestamps[start : start + CHUNK].view(
+                    "datetime64[ns]"
+                ),
+                **{
+                    axis: getattr(arrays, axis)[start : start + CHUNK] for axis in "xyz"
+                },
+            )
+        )
+
+    metrics = session.metrics()
+    assert session.samples_received == len(arrays.x)
+    assert metrics.gaps.duplicate_samples == 10
+    assert metrics.gaps.reordered_samples == 2
+    for field, value in expected.metrics.dict().items():
+        if field != "gaps":
+            assert getattr(metrics, field) == pytest.approx(value, abs=1e-9)
+    for field, value in expected.metrics.gaps.dict().items():
+        assert getattr(metrics.gaps, field) == pytest.approx(value, abs=1e-9)
+
+
+def test_stream_drops_samples_before_earlier_chunks(sample_acceleration_data):
+    """Test that samples older than an analyzed chunk are dropped and counted."""
+    arrays = sample_acceleration_data.to_arrays()
+    session = StreamingSession(
+        "session",
+        StreamingSessionRequest(
+            data_type="acceleration",
+            device_info={},
+            sampling_rate_hz=sample_acceleration_data.sampling_rate_hz,
+            start_time=sample_acceleration_data.start_time,
+            user_id="test-user",
+        ),
+    )
+
+    def chunk(indices):
+        return AccelerationChunk(
+            timestamps=arrays.timestamps[indices].view("datetime64[ns]"),
+            **{axis: getattr(arrays, axis)[indices] for axis in "xyz"},
+        )
+
+    session.append(chunk([0, 1, 2, 3]))
+    analyzed = session.append(chunk([1, 3, 4, 5]))
+
+    np.testing.assert_array_equal(analyzed.timestamps, arrays.timestamps[4:6])
+    gaps = session.metrics().gaps
+    assert (gaps.duplicate_samples, gaps.reordered_samples) == (1, 1)
+    assert session.samples_received == 8
+    assert session.accumulator.sample_count == 6
@@ -0,0 +1,59 @@
+import subprocess
+import sys
+
+import pytest
+
+from app.services.classifier import (
+    DEFAULT_MODEL_PATH,
+    ActivityClassifier,
+    load_activity_classifier,
+)
+from app.services.warmup import start_warm_up, warm_up
+from benchmarks.import_time import import_times
+
+HEAVY_MODULES = ("pandas", "scipy", "sklearn", "joblib", "httpx")
+
+
+def test_app_import_leaves_heavy_libraries_out():
+    """Test that importing the application does not load the slow libraries."""
+    code = (
+        "import sys, app.main; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
+
+
+def test_import_times_are_parsed():
+    """Test that the import-time benchmark reads cumulative times per module."""
+    times = import_times("json")
+
+    assert times["json"] >= times["json.decoder"] > 0
+
+
+def test_warm_up_loads_model():
+    """Test that the model is loaded by the warm-up, not the constructor."""
+    classifier = ActivityClassifier(path=DEFAULT_MODEL_PATH)
+    assert classifier._model is None
+
+    warm_up(classifier)
+
+    assert classifier._model is not None
+    assert "scipy.signal" in sys.modules
+
+
+def test_background_warm_up_logs_failures(tmp_path, caplog):
+    """Test that a failing warm-up does not raise in the server."""
+    classifier = ActivityClassifier(path=str(tmp_path / "missing.joblib"))
+
+    start_warm_up(classifier).join(timeout=30)
+
+    assert "Warm-up failed" in caplog.text
+
+
+def test_missing_model_fails_at_load(tmp_path):
+    """Test that a wrong model path is reported at startup, not per request."""
+    with pytest.raises(FileNotFoundError):
+        load_activity_classifier(str(tmp_path / "missing.joblib"))
@@ -0,0 +1,131 @@
+import json
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from app.models.analysis import AnalysisRequest
+from app.utils.binary import (
+    FLAG_COMPRESSED,
+    MAGIC,
+    VERSION,
+    BinaryFormatError,
+    SampleLimitError,
+    decode_analysis_request,
+    encode_analysis_request,
+)
+from app.utils.metrics import calculate_activity_metrics
+from app.utils.patterns import detect_activity_patterns
+
+
+@pytest.fixture
+def analysis_request(make_flipping_acceleration_data):
+    """A request whose samples are exactly representable in float32."""
+    data = make_flipping_acceleration_data(seed=1, n=500)
+    for axis in "xyz":
+        setattr(data, axis, getattr(data, axis).astype(np.float32).astype(np.float64))
+    return AnalysisRequest(
+        acceleration_data=data,
+        user_id="test-user-1",
+        include_insights=False,
+        include_patterns=True,
+    )
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float64"])
+@pytest.mark.parametrize("compress", [False, True])
+def test_binary_round_trip(analysis_request, dtype, compress):
+    """Test that decoding gives back the same request."""
+    decoded = decode_analysis_request(
+        encode_analysis_request(analysis_request, dtype=dtype, compress=compress)
+    )
+
+    original, data = analysis_request.acceleration_data, decoded.acceleration_data
+    assert decoded.user_id == analysis_request.user_id
+    assert decoded.include_insights is False
+    assert decoded.include_patterns is True
+    assert data.sampling_rate_hz == original.sampling_rate_hz
+    assert data.start_time == original.start_time
+    assert data.id == original.id
+    for column, expected in zip(data.to_arrays(), original.to_arrays()):
+        np.testing.assert_array_equal(column, expected)
+
+    assert calculate_activity_metrics(data) == calculate_activity_metrics(original)
+    assert detect_activity_patterns(data) == detect_activity_patterns(original)
+
+
+def test_binary_decoding_is_zero_copy(analysis_request):
+    """Test that decoded columns are views of the uploaded body."""
+    body = encode_analysis_request(analysis_request)
+    data = decode_analysis_request(body).acceleration_data
+
+    buffer = np.frombuffer(body, dtype=np.uint8)
+    for axis in ("timestamps", "x", "y", "z"):
+        assert np.shares_memory(np.asarray(getattr(data, axis)), buffer)
+
+
+def test_binary_without_timestamps(sample_acceleration_data):
+    """Test that timestamps are derived from the header when omitted."""
+    request = AnalysisRequest(
+        acceleration_data=sample_acceleration_data, user_id="test-user-1"
+    )
+    body = encode_analysis_request(request, include_timestamps=False)
+    data = decode_analysis_request(body).acceleration_data
+
+    assert data.timestamps is None
+    assert len(body) < len(encode_analysis_request(request))
+    np.testing.assert_allclose(
+        data.to_arrays().timestamps,
+        sample_acceleration_data.to_arrays().timestamps,
+        rtol=0,
+        atol=1000,
+    )
+
+
+@pytest.mark.parametrize(
+    "corrupt",
+    [
+        lambda body: body[:8],  # truncated preamble
+        lambda body: b"JSON" + body[4:],  # wrong magic
+        lambda body: body[:-4],  # truncated payload
+        lambda body: body[:12] + b"[" + body[13:],  # broken header
+    ],
+)
+def test_binary_rejects_malformed_bodies(analysis_request, corrupt):
+    """Test that malformed uploads raise a format error."""
+    with pytest.raises(BinaryFormatError):
+        decode_analysis_request(corrupt(encode_analysis_request(analysis_request)))
+
+
+def make_body(header, payload=b"", flags=0):
+    """A binary upload with an arbitrary header and payload."""
+    header_bytes = json.dumps(header).encode()
+    preamble = struct.pack("<4sBBHI", MAGIC, VERSION, flags, 0, len(header_bytes))
+    return preamble + header_bytes + payload
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        [1, 2, 3],  # not an object
+        {"sample_count": -1},  # negative count
+        {"sample_count": 0, "x": [0.0]},  # header key clashing with a column
+    ],
+)
+def test_binary_rejects_invalid_headers(header):
+    """Test that headers that cannot describe a request raise a format error."""
+    with pytest.raises(BinaryFormatError, match="header"):
+        decode_analysis_request(make_body(header))
+
+
+def test_binary_limits_samples_before_decompressing():
+    """Test that the declared count is checked first and inflation is bounded."""
+    header = {"sample_count": 10, "sampling_rate_hz": 10, "dtype": "float32"}
+    # A small body that would inflate to 100 MB
+    bomb = zlib.compress(bytes(100 * 1024 * 1024), 9)
+
+    with pytest.raises(SampleLimitError):
+        decode_analysis_request(make_body(header, bomb, FLAG_COMPRESSED), 9)
+    with pytest.raises(BinaryFormatError, match="121 bytes, expected 120"):
+        decode_analysis_request(make_body(header, bomb, FLAG_COMPRESSED))
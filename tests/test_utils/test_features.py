@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from app.utils.features import (
+    WINDOW_FEATURES,
+    feature_window_samples,
+    split_windows,
+    window_features,
+    window_view,
+)
+
+
+def test_window_view_is_strided_view():
+    """Test that windows are back to back views without the partial tail."""
+    values = np.arange(25.0)
+
+    windows = window_view(values, 10)
+
+    assert windows.shape == (2, 10)
+    assert np.shares_memory(windows, values)
+    np.testing.assert_array_equal(windows[1], np.arange(10.0, 20.0))
+    assert window_view(values, 10, step=5).shape == (4, 10)
+    assert window_view(values[:5], 10).shape == (0, 10)
+
+
+@pytest.mark.parametrize("rate_hz", [25, 50, 100])
+def test_features_of_a_sinusoid(rate_hz):
+    """Test features of a 2 Hz oscillation around 1 g."""
+    window = feature_window_samples(rate_hz)
+    t = np.arange(window) / rate_hz
+    windows = (1.0 + 0.5 * np.sin(2 * np.pi * 2.0 * t))[None, :]
+
+    features = dict(zip(WINDOW_FEATURES, window_features(windows, rate_hz)[0]))
+
+    assert features["mean"] == pytest.approx(1.0)
+    assert features["variance"] == pytest.approx(0.125)
+    assert features["p50"] == pytest.approx(1.0, abs=0.01)
+    assert features["p10"] < features["p50"] < features["p90"]
+    assert features["dominant_frequency"] == pytest.approx(2.0)
+    # A sinusoid's power is split between the positive and negative frequency
+    assert features["spectral_energy"] == pytest.approx(0.0625)
+
+
+def test_no_windows():
+    assert window_features(np.empty((0, 500)), 50).shape == (0, len(WINDOW_FEATURES))
+
+
+def test_split_windows_matches_whole_signal():
+    """Test that windows carried across chunks are those of the whole signal."""
+    values = np.random.default_rng(0).random(1037)
+    carry = np.empty(0)
+    chunks = []
+    for chunk in np.array_split(values, [3, 250, 251, 900]):
+        windows, carry = split_windows(chunk, 100, carry)
+        chunks.append(windows)
+
+    np.testing.assert_array_equal(np.concatenate(chunks), window_view(values, 100))
+    np.testing.assert_array_equal(carry, values[1000:])
@@ -75,3 +75,24 @@ def test_calculate_activity_metrics_high_activity():
     assert metrics.avg_intensity > 0.09  # Lower threshold to match actual behavior
     assert metrics.peak_intensity > 0.5  # Verify peak intensity is high
     assert metrics.active_minutes > 0.0  # Should have active minutes
+
+
+def test_epoch_metrics(make_synthetic_acceleration_data):
+    """Test epoch summaries of one active minute followed by rest."""
+    data = make_synthetic_acceleration_data("rest", 10, 120, seed=0)
+    arrays = data.to_arrays()
+    # Lift the first minute 0.5 g above gravity
+    arrays.z[:600] += 0.5
+
+    metrics = calculate_activity_metrics(data, epoch_seconds=(5.0, 60.0, 300.0))
+
+    short, minute, long = metrics.epochs
+    assert (short.epoch_seconds, short.epoch_count, short.active_epochs) == (5, 24, 12)
+    assert short.active_minutes == pytest.approx(1.0)
+    assert minute.epoch_count == 2 and minute.active_epochs == 1
+    assert minute.peak_intensity == pytest.approx(1.0, abs=0.05)
+    assert minute.avg_peak_magnitude > 1.25
+    assert minute.avg_variance < 0.01
+    # Recordings shorter than an epoch have none
+    assert long.epoch_count == 0 and long.peak_intensity == 0.0
+    assert calculate_activity_metrics(data).epochs == []
@@ -1,10 +1,12 @@
 from datetime import datetime, timedelta
 
 import numpy as np
+import pandas as pd
 import pytest
 
-from app.models.acceleration import AccelerationData, AccelerationSample
+from app.models.acceleration import AccelerationData, AccelerationSample, ns_to_datetime
 from app.utils.patterns import detect_activity_patterns
+from app.utils.signal import build_signal_frame
 
 
 def test_detect_activity_patterns_empty_data():
@@ -72,3 +74,43 @@ def test_detect_activity_patterns_with_inactivity(sample_inactive_acceleration_d
         assert period.start_time < period.end_time  # Valid time range
         assert period.duration > 0  # Positive duration
         assert isinstance(period.duration, float)  # Duration is a float
+
+
+def reference_inactivity_periods(frame):
+    """The original pandas groupby implementation, kept as an oracle."""
+    df = pd.DataFrame(
+        {
+            "timestamp": frame.timestamps,
+            "inactive": frame.normalized_magnitude < 0.1,
+        }
+    )
+    df["state_change"] = df["inactive"].ne(df["inactive"].shift(1)).cumsum()
+    inactive_groups = df[df["inactive"] == True].groupby("state_change")
+    min_samples = min(20, len(df) // 5)
+
+    periods = []
+    for _, group in inactive_groups:
+        if len(group) >= min_samples:
+            start_ns = group["timestamp"].min()
+            end_ns = group["timestamp"].max()
+            periods.append((start_ns, end_ns, (end_ns - start_ns) / 1e9))
+    return periods
+
+
+@pytest.mark.parametrize("seed", range(25))
+@pytest.mark.parametrize("n", [10, 57, 400, 5000])
+def test_detect_activity_patterns_matches_reference(
+    seed, n, make_flipping_acceleration_data
+):
+    """Test that run-length detection matches the pandas groupby implementation."""
+    data = make_flipping_acceleration_data(seed, n, shuffle=seed % 5 == 0)
+    frame = build_signal_frame(data)
+
+    expected = reference_inactivity_periods(frame)
+    periods = detect_activity_patterns(data, frame).inactivity_periods
+
+    assert len(periods) == len(expected)
+    for period, (start_ns, end_ns, duration) in zip(periods, expected):
+        assert period.start_time == ns_to_datetime(start_ns)
+        assert period.end_time == ns_to_datetime(end_ns)
+        assert period.duration == duration
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from app.models.acceleration import SampleArrays
+from app.utils.metrics import calculate_activity_metrics
+from app.utils.patterns import detect_activity_patterns
+from app.utils.ragged import (
+    concatenate_frames,
+    ragged_activity_metrics,
+    ragged_activity_patterns,
+    ragged_from_arrays,
+    ragged_from_sessions,
+)
+from app.utils.signal import build_signal_frame
+
+
+def assert_matches_per_session(sessions, metrics, patterns):
+    assert len(metrics) == len(patterns) == len(sessions)
+    for data, session_metrics, session_patterns in zip(sessions, metrics, patterns):
+        expected = calculate_activity_metrics(data)
+        for field, value in expected.dict().items():
+            assert getattr(session_metrics, field) == pytest.approx(value, abs=1e-12)
+        assert session_patterns == detect_activity_patterns(data)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_ragged_matches_per_session_analysis(seed, make_flipping_acceleration_data):
+    """Test that segmented reductions match analyzing each session alone."""
+    rng = np.random.default_rng(seed)
+    # Include empty, tiny and shuffled sessions next to each other
+    sessions = [
+        make_flipping_acceleration_data(
+            seed * 100 + i, int(n), shuffle=bool(rng.integers(2))
+        )
+        for i, n in enumerate(rng.choice([0, 1, 7, 9, 10, 60, 150, 2000], size=40))
+    ]
+
+    ragged = ragged_from_sessions(sessions)
+
+    assert_matches_per_session(
+        sessions, ragged_activity_metrics(ragged), ragged_activity_patterns(ragged)
+    )
+
+
+def test_ragged_respects_per_session_rates(make_synthetic_acceleration_data):
+    """Test that windows follow each session's own sampling rate."""
+    sessions = [
+        make_synthetic_acceleration_data(profile, rate_hz, 300, seed=rate_hz)
+        for profile in ("rest", "walking", "mixed")
+        for rate_hz in (10, 25, 50)
+    ]
+
+    ragged = ragged_from_sessions(sessions)
+
+    assert_matches_per_session(
+        sessions, ragged_activity_metrics(ragged), ragged_activity_patterns(ragged)
+    )
+
+
+def test_ragged_epochs_match_per_session(make_synthetic_acceleration_data):
+    """Test epoch summaries with each session's own epoch length in samples."""
+    sessions = [
+        make_synthetic_acceleration_data("mixed", rate_hz, 600, seed=rate_hz)
+        for rate_hz in (10, 25, 50)
+    ]
+
+    metrics = ragged_activity_metrics(ragged_from_sessions(sessions), (5.0, 60.0))
+
+    for data, session_metrics in zip(sessions, metrics):
+        expected = calculate_activity_metrics(data, epoch_seconds=(5.0, 60.0))
+        assert [epoch.epoch_count for epoch in session_metrics.epochs] == [120, 10]
+        for epoch, expected_epoch in zip(session_metrics.epochs, expected.epochs):
+            assert epoch.dict() == pytest.approx(expected_epoch.dict(), abs=1e-12)
+
+
+def test_concatenate_frames(make_flipping_acceleration_data):
+    """Test that frames concatenate into the same buffer as raw sessions."""
+    sessions = [make_flipping_acceleration_data(seed, 100) for seed in range(3)]
+
+    from_frames = concatenate_frames([build_signal_frame(s) for s in sessions])
+    from_sessions = ragged_from_sessions(sessions)
+
+    np.testing.assert_array_equal(from_frames.offsets, [0, 100, 200, 300])
+    np.testing.assert_array_equal(from_frames.magnitude, from_sessions.magnitude)
+    np.testing.assert_array_equal(from_frames.timestamps, from_sessions.timestamps)
+    assert len(concatenate_frames([])) == 0
+    assert ragged_activity_metrics(concatenate_frames([])) == []
+
+
+def test_ragged_from_arrays_validates_offsets():
+    """Test that offsets must cover the buffer in increasing order."""
+    arrays = SampleArrays(
+        timestamps=np.arange(5, dtype=np.int64),
+        x=np.zeros(5),
+        y=np.zeros(5),
+        z=np.ones(5),
+    )
+
+    assert len(ragged_from_arrays(arrays, [0, 2, 5], 10)) == 2
+    for offsets in ([0, 2, 4], [1, 5], [0, 3, 2, 5]):
+        with pytest.raises(ValueError):
+            ragged_from_arrays(arrays, offsets, 10)
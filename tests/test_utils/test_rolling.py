@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from app.utils.rolling import RollingEngine, RollingWindow, rolling_max
+
+WINDOWS = [
+    RollingWindow(7),
+    RollingWindow(1),
+    RollingWindow(10, step=10),
+    RollingWindow(25, step=3),
+    RollingWindow(4, step=9),
+    RollingWindow(200, stats=("max",)),
+]
+
+
+def naive_stats(values, window):
+    """Statistics of every evaluated window, one slice at a time."""
+    stats = {"mean": [], "var": [], "max": []}
+    for end in range(window.step, len(values) + 1, window.step):
+        segment = values[max(0, end - window.samples) : end]
+        stats["mean"].append(segment.mean())
+        stats["var"].append(segment.var())
+        stats["max"].append(segment.max())
+    return {name: stats[name] for name in window.stats}
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_engine_matches_naive_windows(seed):
+    """Test all windows of one pass against slicing every window."""
+    values = 1.0 + np.random.default_rng(seed).random(1003)
+
+    results = RollingEngine(WINDOWS).update(values)
+
+    for window, stats in zip(WINDOWS, results):
+        for name, expected in naive_stats(values, window).items():
+            np.testing.assert_allclose(stats[name], expected, atol=1e-12)
+
+
+def test_chunked_updates_match_whole():
+    """Test that chunks, including empty ones, give the whole signal's statistics."""
+    values = 1.0 + np.random.default_rng(7).random(1003)
+    engine = RollingEngine(WINDOWS)
+    chunks = [
+        engine.update(chunk)
+        for chunk in np.array_split(values, [0, 1, 2, 50, 51, 700, 700])
+    ]
+
+    for index, window in enumerate(WINDOWS):
+        for name, expected in naive_stats(values, window).items():
+            joined = np.concatenate([chunk[index][name] for chunk in chunks])
+            np.testing.assert_allclose(joined, expected, atol=1e-12)
+    # Only the samples the longest window still needs are kept
+    assert len(engine._tail) == 199
+
+
+def test_rolling_max_partial_windows():
+    values = np.array([3.0, 1.0, 2.0, 5.0, 0.0, 4.0])
+
+    np.testing.assert_array_equal(rolling_max(values, 2), [3, 3, 2, 5, 5, 4])
+    np.testing.assert_array_equal(rolling_max(values, 10), [3, 3, 3, 5, 5, 5])
+    np.testing.assert_array_equal(rolling_max(values, 1), values)
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.utils.metrics import active_mask
+from app.utils.patterns import detect_activity_patterns
+from app.utils.rollups import GRANULARITIES, coarsen, combine_blocks, rollup_session
+from app.utils.signal import SignalFrame, build_signal_frame
+
+SIGNAL_COLUMNS = ("timestamps", "x", "y", "z", "magnitude", "normalized_magnitude")
+
+
+def reference_rollup(frame, active, bucket_seconds):
+    """Straightforward pandas groupby used as the oracle for rollups."""
+    # Samples last until the next one (the data has jitter but no gaps)
+    timestamps = pd.Series(frame.timestamps)
+    period_ns = 1e9 / frame.sampling_rate_hz
+    seconds = (timestamps.shift(-1) - timestamps).fillna(period_ns) / 1e9
+    df = pd.DataFrame(
+        {
+            "bucket": frame.timestamps // (bucket_seconds * 10**9) * bucket_seconds,
+            "magnitude": frame.magnitude,
+            "seconds": seconds,
+            "active_seconds": seconds * active,
+        }
+    )
+    return df.groupby("bucket").agg(
+        sample_count=("magnitude", "size"),
+        magnitude_sum=("magnitude", "sum"),
+        max_magnitude=("magnitude", "max"),
+        recorded_seconds=("seconds", "sum"),
+        active_seconds=("active_seconds", "sum"),
+    )
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+@pytest.mark.parametrize("granularity", ["minute", "hour"])
+def test_rollup_session_matches_groupby(
+    make_flipping_acceleration_data, shuffle, granularity
+):
+    """Test that sorted and unsorted sessions roll up like a groupby."""
+    data = make_flipping_acceleration_data(seed=3, n=5000, shuffle=shuffle)
+    frame = build_signal_frame(data)
+    active = active_mask(frame)
+    bucket_seconds = GRANULARITIES[granularity]
+
+    rollup = rollup_session(frame, active, [], bucket_seconds)
+    expected = reference_rollup(frame, active, bucket_seconds)
+
+    np.testing.assert_array_equal(rollup.bucket_start, expected.index)
+    np.testing.assert_array_equal(rollup.sample_count, expected["sample_count"])
+    np.testing.assert_allclose(rollup.magnitude_sum, expected["magnitude_sum"])
+    np.testing.assert_allclose(rollup.max_magnitude, expected["max_magnitude"])
+    np.testing.assert_allclose(rollup.recorded_seconds, expected["recorded_seconds"])
+    np.testing.assert_allclose(rollup.active_seconds, expected["active_seconds"])
+    assert rollup.inactivity_count.sum() == 0
+
+
+def test_rollup_session_counts_inactivity_in_start_bucket(
+    make_flipping_acceleration_data,
+):
+    """Test that inactivity periods are attributed to the bucket they start in."""
+    data = make_flipping_acceleration_data(seed=5, n=3000)
+    frame = build_signal_frame(data)
+    periods = detect_activity_patterns(data, frame).inactivity_periods
+
+    rollup = rollup_session(frame, active_mask(frame), periods)
+
+    assert rollup.inactivity_count.sum() == len(periods)
+    assert rollup.inactivity_seconds.sum() == pytest.approx(
+        sum(period.duration for period in periods)
+    )
+    first = int(periods[0].start_time.timestamp()) // 60 * 60
+    assert rollup.inactivity_count[rollup.bucket_start == first][0] >= 1
+
+
+def test_coarsen_matches_direct_rollup(make_flipping_acceleration_data):
+    """Test that merging minute buckets equals rolling up hours directly."""
+    data = make_flipping_acceleration_data(seed=7, n=40000)
+    frame = build_signal_frame(data)
+    active = active_mask(frame)
+    periods = detect_activity_patterns(data, frame).inactivity_periods
+
+    minutes = rollup_session(frame, active, periods)
+    hours = rollup_session(frame, active, periods, GRANULARITIES["hour"])
+    merged = coarsen(minutes, GRANULARITIES["hour"])
+
+    assert len(hours) > 1
+    for column in hours._fields:
+        np.testing.assert_allclose(getattr(merged, column), getattr(hours, column))
+
+
+def test_combine_blocks_matches_rollup_session(make_flipping_acceleration_data):
+    """Test that block rollups combine into the rollup of the whole session."""
+    data = make_flipping_acceleration_data(seed=9, n=20000)
+    frame = build_signal_frame(data)
+    active = active_mask(frame)
+    periods = detect_activity_patterns(data, frame).inactivity_periods
+
+    # Block edges that split minute buckets and inactivity periods
+    bounds = [0, 777, 5000, 12345, len(frame)]
+    blocks = [
+        rollup_session(
+            SignalFrame(
+                *(getattr(frame, field)[start:end] for field in SIGNAL_COLUMNS),
+                sampling_rate_hz=frame.sampling_rate_hz,
+                next_ns=frame.timestamps[end] if end < len(frame) else None,
+            ),
+            active[start:end],
+            [],
+        )
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+
+    combined = combine_blocks(blocks, periods)
+    expected = rollup_session(frame, active, periods)
+    for column in expected._fields:
+        np.testing.assert_allclose(getattr(combined, column), getattr(expected, column))
@@ -0,0 +1,132 @@
+import numpy as np
+import pytest
+
+from app.utils.metrics import calculate_activity_metrics
+from app.utils.patterns import detect_activity_patterns
+from app.utils.signal import (
+    GRAVITY_OFFSET,
+    build_signal_frame,
+    decimate_frame,
+    iter_frame_blocks,
+    seconds_to_samples,
+)
+
+
+def test_build_signal_frame(sample_acceleration_data):
+    """Test that the frame holds the columns and derived magnitudes."""
+    frame = build_signal_frame(sample_acceleration_data)
+    sample = sample_acceleration_data.samples[3]
+
+    assert len(frame) == len(sample_acceleration_data.samples)
+    assert frame.sampling_rate_hz == sample_acceleration_data.sampling_rate_hz
+    assert frame.magnitude[3] == np.sqrt(sample.x**2 + sample.y**2 + sample.z**2)
+    np.testing.assert_allclose(
+        frame.normalized_magnitude, np.abs(frame.magnitude - GRAVITY_OFFSET)
+    )
+    assert np.all(np.diff(frame.timestamps) > 0)
+
+
+def test_stages_accept_shared_frame(sample_inactive_acceleration_data):
+    """Test that passing a prebuilt frame gives the same results."""
+    frame = build_signal_frame(sample_inactive_acceleration_data)
+
+    assert calculate_activity_metrics(
+        sample_inactive_acceleration_data, frame
+    ) == calculate_activity_metrics(sample_inactive_acceleration_data)
+    assert detect_activity_patterns(
+        sample_inactive_acceleration_data, frame
+    ) == detect_activity_patterns(sample_inactive_acceleration_data)
+
+
+def test_seconds_to_samples():
+    """Test that windows in seconds scale with the sampling rate."""
+    assert seconds_to_samples(1.0, 10) == 10
+    assert seconds_to_samples(1.0, 50) == 50
+    assert seconds_to_samples(2.0, 12.5) == 25
+    assert seconds_to_samples(0.01, 10) == 1
+    # Unknown rates fall back to the default rate
+    assert seconds_to_samples(1.0, 0) == 10
+
+
+def test_decimate_frame_block_means(make_synthetic_acceleration_data):
+    """Test that decimation averages blocks, including a partial last block."""
+    data = make_synthetic_acceleration_data("walking", 50, 10.1, seed=1)
+    frame = build_signal_frame(data)
+
+    decimated = decimate_frame(frame, 10)
+
+    assert decimated.sampling_rate_hz == 10
+    assert len(decimated) == 101
+    assert decimated.magnitude[0] == pytest.approx(frame.magnitude[:5].mean())
+    assert decimated.magnitude[-1] == pytest.approx(frame.magnitude[-5:].mean())
+    assert decimated.magnitude.mean() == pytest.approx(frame.magnitude.mean())
+    np.testing.assert_array_equal(decimated.timestamps, frame.timestamps[::5])
+
+
+def test_decimate_frame_keeps_slow_frames(sample_acceleration_data):
+    """Test that frames at or below the target rate are not decimated."""
+    frame = build_signal_frame(sample_acceleration_data)
+
+    assert decimate_frame(frame, 10) is frame
+    assert decimate_frame(frame, 50) is frame
+    assert decimate_frame(frame, 0) is frame
+
+
+@pytest.mark.parametrize("profile", ["rest", "walking", "mixed"])
+def test_decimated_metrics_stay_close(profile, make_synthetic_acceleration_data):
+    """Test that analyzing a 50Hz recording decimated to 10Hz barely moves metrics."""
+    data = make_synthetic_acceleration_data(profile, 50, 1800, seed=2)
+    frame = build_signal_frame(data)
+    decimated = decimate_frame(frame, 10)
+
+    full = calculate_activity_metrics(data, frame)
+    reduced = calculate_activity_metrics(data, decimated)
+
+    assert reduced.avg_intensity == pytest.approx(full.avg_intensity, abs=1e-9)
+    assert reduced.active_minutes == pytest.approx(full.active_minutes, abs=0.01)
+    assert reduced.total_duration == pytest.approx(full.total_duration, abs=0.01)
+    assert reduced.peak_intensity <= full.peak_intensity
+
+    full_periods = detect_activity_patterns(data, frame).inactivity_periods
+    reduced_periods = detect_activity_patterns(data, decimated).inactivity_periods
+    assert sum(p.duration for p in reduced_periods) == pytest.approx(
+        sum(p.duration for p in full_periods), rel=0.02, abs=1.0
+    )
+
+
+def test_windows_are_defined_in_seconds(make_synthetic_acceleration_data):
+    """Test that the same movement gives similar results at different rates."""
+    slow = make_synthetic_acceleration_data("mixed", 10, 1800, seed=4)
+    fast = make_synthetic_acceleration_data("mixed", 100, 1800, seed=4)
+
+    slow_metrics = calculate_activity_metrics(slow)
+    fast_metrics = calculate_activity_metrics(fast)
+
+    assert fast_metrics.active_minutes == pytest.approx(
+        slow_metrics.active_minutes, abs=0.01
+    )
+    slow_periods = detect_activity_patterns(slow).inactivity_periods
+    fast_periods = detect_activity_patterns(fast).inactivity_periods
+    assert len(fast_periods) == len(slow_periods)
+
+
+@pytest.mark.parametrize("target_rate_hz", [0.0, 10.0, 15.0])
+def test_iter_frame_blocks_matches_whole_frame(
+    target_rate_hz, make_synthetic_acceleration_data
+):
+    """Test that block frames concatenate to the (decimated) whole frame."""
+    data = make_synthetic_acceleration_data("walking", 50, 60.3, seed=2)
+    frame = build_signal_frame(data)
+    expected = decimate_frame(frame, target_rate_hz) if target_rate_hz else frame
+
+    blocks = list(
+        iter_frame_blocks(data.to_arrays(), 50, 1001, target_rate_hz=target_rate_hz)
+    )
+
+    assert len(blocks) == 4
+    assert all(block.sampling_rate_hz == expected.sampling_rate_hz for block in blocks)
+    for column in ("timestamps", "magnitude", "normalized_magnitude", "x"):
+        np.testing.assert_allclose(
+            np.concatenate([getattr(block, column) for block in blocks]),
+            getattr(expected, column),
+        )
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from app.utils.patterns import detect_activity_patterns
+from app.utils.signal import build_signal_frame
+from app.utils.steps import StepDetector, detect_activity_bouts
+from benchmarks.generators import _CADENCE, activity_codes
+
+
+def test_walking_is_one_bout(make_synthetic_acceleration_data):
+    """Test that steady walking at 1.8 steps/s is one walking bout."""
+    data = make_synthetic_acceleration_data("walking", 50, 120, seed=1)
+
+    [bout] = detect_activity_bouts(build_signal_frame(data))
+
+    assert bout.activity == "walking"
+    assert bout.cadence == pytest.approx(108, abs=1)
+    assert bout.step_count == pytest.approx(216, abs=3)
+    assert bout.duration == pytest.approx(120, abs=2)
+
+
+@pytest.mark.parametrize("rate_hz", [10, 50, 100])
+def test_step_count_matches_gait(rate_hz, make_synthetic_acceleration_data):
+    """Test step counts and labels on a mixed rest/walking/running recording."""
+    data = make_synthetic_acceleration_data("mixed", rate_hz, 7200, seed=3)
+    codes = activity_codes(
+        "mixed", data.sample_count, rate_hz, np.random.default_rng(3)
+    )
+    true_steps = _CADENCE[codes].sum() / rate_hz
+
+    patterns = detect_activity_patterns(data)
+
+    assert patterns.step_count == pytest.approx(true_steps, rel=0.01)
+    assert {bout.activity for bout in patterns.activity_patterns} == {
+        "walking",
+        "running",
+    }
+    for bout in patterns.activity_patterns:
+        expected = "running" if bout.cadence >= 140 else "walking"
+        assert bout.activity == expected
+
+
+def test_no_steps_at_rest_or_low_rates(make_synthetic_acceleration_data):
+    """Test that rest has no bouts and rates too low for gait are skipped."""
+    rest = make_synthetic_acceleration_data("rest", 50, 600, seed=1)
+    walking = make_synthetic_acceleration_data("walking", 5, 600, seed=1)
+
+    assert detect_activity_bouts(build_signal_frame(rest)) == []
+    assert detect_activity_bouts(build_signal_frame(walking)) == []
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_chunked_detection_matches_whole(seed, make_synthetic_acceleration_data):
+    """Test that the filter, lobe and bout state carry across chunk edges."""
+    data = make_synthetic_acceleration_data("mixed", 50, 1800, seed=seed)
+    frame = build_signal_frame(data)
+
+    rng = np.random.default_rng(seed)
+    cuts = np.sort(rng.integers(0, len(frame), size=200))
+    bounds = np.concatenate(([0], cuts, [len(frame)]))
+    detector = StepDetector(frame.sampling_rate_hz)
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        detector.update(frame.timestamps[start:end], frame.magnitude[start:end])
+
+    bouts = detect_activity_bouts(frame)
+    assert bouts
+    assert detector.bouts() == bouts
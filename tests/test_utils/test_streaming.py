@@ -0,0 +1,153 @@
+import numpy as np
+import pytest
+
+from app.models.acceleration import SampleArrays, ns_to_datetime
+from app.utils.metrics import active_mask, calculate_activity_metrics
+from app.utils.patterns import detect_activity_patterns
+from app.utils.signal import SignalFrame, build_signal_frame
+from app.utils.streaming import ActivityAccumulator, SampleRing
+
+
+def split_frame(frame: SignalFrame, bounds):
+    """Split a frame into consecutive chunks at the given indices."""
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        yield SignalFrame(
+            timestamps=frame.timestamps[start:end],
+            x=frame.x[start:end],
+            y=frame.y[start:end],
+            z=frame.z[start:end],
+            magnitude=frame.magnitude[start:end],
+            normalized_magnitude=frame.normalized_magnitude[start:end],
+            sampling_rate_hz=frame.sampling_rate_hz,
+        )
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("n", [0, 7, 60, 150, 3000])
+def test_accumulator_matches_batch(seed, n, make_flipping_acceleration_data):
+    """Test that chunked accumulation matches batch metrics and patterns."""
+    data = make_flipping_acceleration_data(seed, n)
+    frame = build_signal_frame(data)
+
+    # Random chunk sizes, including empty and single-sample chunks
+    rng = np.random.default_rng(seed)
+    cuts = np.sort(rng.integers(0, n + 1, size=rng.integers(1, 30)))
+    bounds = np.concatenate(([0], cuts, [n]))
+
+    accumulator = ActivityAccumulator(data.sampling_rate_hz)
+    for chunk in split_frame(frame, bounds):
+        accumulator.update(chunk)
+
+    expected_metrics = calculate_activity_metrics(data, frame)
+    metrics = accumulator.metrics()
+    assert accumulator.sample_count == n
+    for field, value in expected_metrics.dict().items():
+        assert getattr(metrics, field) == pytest.approx(value, abs=1e-9)
+
+    assert accumulator.patterns() == detect_activity_patterns(data, frame)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_accumulator_epochs_match_batch(seed, make_flipping_acceleration_data):
+    """Test that epochs spanning chunk edges match the batch summary."""
+    data = make_flipping_acceleration_data(seed, 3000)
+    frame = build_signal_frame(data)
+    epoch_seconds = (5.0, 15.0, 60.0)
+
+    accumulator = ActivityAccumulator(data.sampling_rate_hz, epoch_seconds)
+    for chunk in split_frame(frame, list(range(0, 3000, 37)) + [3000]):
+        accumulator.update(chunk)
+
+    expected = calculate_activity_metrics(data, frame, epoch_seconds)
+    epochs = accumulator.metrics().epochs
+    assert len(epochs) == len(expected.epochs) == 3
+    for epoch, expected_epoch in zip(epochs, expected.epochs):
+        assert epoch.dict() == pytest.approx(expected_epoch.dict(), abs=1e-9)
+    assert accumulator.metrics().active_minutes == pytest.approx(
+        expected.active_minutes
+    )
+
+
+def test_accumulator_state_is_bounded(sample_inactive_acceleration_data):
+    """Test that accumulated state does not grow with the number of chunks."""
+    frame = build_signal_frame(sample_inactive_acceleration_data)
+    accumulator = ActivityAccumulator(frame.sampling_rate_hz)
+
+    for _ in range(200):
+        for chunk in split_frame(frame, list(range(0, len(frame) + 1, 7)) + [100]):
+            accumulator.update(chunk)
+
+    assert accumulator.sample_count == 200 * len(frame)
+    assert len(accumulator._rolling._tail) < 10
+    # Only runs long enough to be reported are retained
+    assert all(run[2] >= 20 for run in accumulator._closed_runs)
+
+
+def test_accumulator_matches_batch_at_high_rate(make_synthetic_acceleration_data):
+    """Test that windows in seconds carry across chunks at rates above 10Hz."""
+    data = make_synthetic_acceleration_data("mixed", 50, 900, seed=3)
+    frame = build_signal_frame(data)
+
+    accumulator = ActivityAccumulator(data.sampling_rate_hz)
+    for chunk in split_frame(frame, list(range(0, len(frame), 777)) + [len(frame)]):
+        accumulator.update(chunk)
+
+    expected_metrics = calculate_activity_metrics(data, frame)
+    for field, value in expected_metrics.dict().items():
+        assert getattr(accumulator.metrics(), field) == pytest.approx(value, abs=1e-9)
+    assert accumulator.patterns() == detect_activity_patterns(data, frame)
+
+
+def test_accumulator_returns_active_mask(make_synthetic_acceleration_data):
+    """Test that the per-chunk active masks match the batch active mask."""
+    data = make_synthetic_acceleration_data("mixed", 50, 300, seed=4)
+    frame = build_signal_frame(data)
+
+    accumulator = ActivityAccumulator(data.sampling_rate_hz)
+    masks = [
+        accumulator.update(chunk)
+        for chunk in split_frame(frame, [0, 0, 13, 1000, 5000, len(frame)])
+    ]
+
+    np.testing.assert_array_equal(np.concatenate(masks), active_mask(frame))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_sample_ring_keeps_latest_samples(seed):
+    """Test that the ring holds the last samples in order across wrap-arounds."""
+    rng = np.random.default_rng(seed)
+    ring = SampleRing(50)
+    received = []
+    for size in rng.integers(0, 80, size=20):
+        start = sum(len(chunk) for chunk in received)
+        chunk = np.arange(start, start + size)
+        received.append(chunk)
+        ring.extend(SampleArrays(chunk, chunk * 1.0, chunk * 2.0, chunk * 3.0))
+
+        expected = np.concatenate(received)[-50:]
+        arrays = ring.arrays()
+        assert len(ring) == len(expected)
+        np.testing.assert_array_equal(arrays.timestamps, expected)
+        np.testing.assert_array_equal(arrays.z, expected * 3.0)
+
+
+def test_closed_inactivity_runs_are_final(make_synthetic_acceleration_data):
+    """Test that runs reported while streaming are in the final patterns."""
+    data = make_synthetic_acceleration_data("mixed", 10, 1800, seed=1)
+    frame = build_signal_frame(data)
+
+    accumulator = ActivityAccumulator(data.sampling_rate_hz)
+    reported = []
+    for chunk in split_frame(frame, list(range(0, len(frame), 500)) + [len(frame)]):
+        accumulator.update(chunk)
+        reported.extend(accumulator.take_closed_inactivity_runs())
+
+    periods = accumulator.patterns().inactivity_periods
+    assert reported
+    assert len(set(reported)) == len(reported)
+    # Every period but the one still open at the end was reported once
+    assert len(reported) >= len(periods) - 1
+    assert [run[1] for run in reported] == sorted(run[1] for run in reported)
+    final_ends = {period.end_time for period in periods}
+    for _, end_ns, _ in reported:
+        assert ns_to_datetime(end_ns) in final_ends
@@ -0,0 +1,195 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from app.models.acceleration import AccelerationData, SampleArrays
+from app.utils.metrics import calculate_activity_metrics
+from app.utils.patterns import detect_activity_patterns
+from app.utils.ragged import ragged_activity_metrics, ragged_from_sessions
+from app.utils.signal import build_signal_frame, order_samples
+from app.utils.streaming import ActivityAccumulator
+from app.utils.timestamps import GapTotals, sample_seconds
+
+from .test_streaming import split_frame
+
+
+def make_data(timestamps_ms, magnitude_noise=0.0, seed=0) -> AccelerationData:
+    """Columnar 10Hz data at the given epoch milliseconds."""
+    rng = np.random.default_rng(seed)
+    n = len(timestamps_ms)
+    return AccelerationData(
+        data_type="acceleration",
+        device_info={"device": "test", "model": "unit-test"},
+        sampling_rate_hz=10,
+        start_time=datetime(2023, 11, 14, 22, 13, 20, tzinfo=timezone.utc),
+        timestamps=1_700_000_000_000 + np.asarray(timestamps_ms, dtype=np.int64),
+        x=rng.normal(0.0, magnitude_noise, n),
+        y=rng.normal(0.0, magnitude_noise, n),
+        z=1.0 + rng.normal(0.0, magnitude_noise, n),
+    )
+
+
+def columns(timestamps) -> SampleArrays:
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    values = timestamps.astype(float)
+    return SampleArrays(timestamps, values, -values, values * 2)
+
+
+def test_order_samples_keeps_ordered_input():
+    """Test that already ordered samples are returned without copies."""
+    arrays = columns(np.arange(0, 1000, 100))
+    ordered = order_samples(arrays)
+
+    assert ordered.arrays is arrays
+    assert ordered.offsets.tolist() == [0, 10]
+    assert ordered.reordered_samples.tolist() == [0]
+    assert ordered.duplicate_samples.tolist() == [0]
+
+
+def test_order_samples_sorts_and_dedupes_each_session():
+    """Test that sessions are ordered independently and repeats dropped."""
+    arrays = columns([0, 100, 200, 300, 50, 20, 20, 10, 40, 40, 40])
+    ordered = order_samples(arrays, [0, 4, 8, 11])
+
+    assert ordered.arrays.timestamps.tolist() == [0, 100, 200, 300, 10, 20, 50, 40]
+    assert ordered.offsets.tolist() == [0, 4, 7, 8]
+    assert ordered.reordered_samples.tolist() == [0, 2, 0]
+    assert ordered.duplicate_samples.tolist() == [0, 1, 2]
+    # Columns move with their timestamps
+    np.testing.assert_array_equal(
+        ordered.arrays.x, ordered.arrays.timestamps.astype(float)
+    )
+
+
+def test_build_signal_frame_counts_reordered_samples():
+    """Test that the frame of shuffled data is ordered and keeps the counts."""
+    timestamps = np.arange(0, 5000, 100)
+    shuffled = np.concatenate((timestamps[25:], timestamps[:25], timestamps[:3]))
+    frame = build_signal_frame(make_data(shuffled))
+
+    assert (frame.timestamps // 10**6).tolist() == (
+        1_700_000_000_000 + timestamps
+    ).tolist()
+    assert frame.reordered_samples == 2
+    assert frame.duplicate_samples == 3
+
+
+def test_sample_seconds_weights_jitter_and_gaps():
+    """Test that samples last until the next one, except across gaps."""
+    timestamps = np.array([0, 90, 210, 300, 20_300, 20_400], dtype=np.int64) * 10**6
+    seconds = sample_seconds(timestamps, 10)
+
+    np.testing.assert_allclose(seconds, [0.09, 0.12, 0.09, 0.1, 0.1, 0.1])
+    chunk = sample_seconds(timestamps[:2], 10, next_ns=int(timestamps[2]))
+    np.testing.assert_allclose(chunk, [0.09, 0.12])
+
+
+def test_active_minutes_follow_actual_sampling():
+    """Test that a dropout during activity does not change active minutes."""
+    steady = make_data(np.arange(0, 120_000, 100), magnitude_noise=3.0)
+    # Every other sample dropped: half the samples for the same time
+    sparse = make_data(np.arange(0, 120_000, 200), magnitude_noise=3.0)
+
+    steady_metrics = calculate_activity_metrics(steady)
+    sparse_metrics = calculate_activity_metrics(sparse)
+
+    assert steady_metrics.active_minutes == pytest.approx(2.0, abs=0.01)
+    assert sparse_metrics.active_minutes == pytest.approx(2.0, abs=0.01)
+    assert sparse_metrics.gaps.gap_count == 0
+    assert sparse_metrics.gaps.observed_rate_hz == pytest.approx(5.0)
+
+
+def test_gap_summary():
+    """Test gap counts, durations and jitter of a recording with dropouts."""
+    rng = np.random.default_rng(0)
+    timestamps = np.concatenate(
+        (np.arange(0, 60_000, 100), np.arange(90_000, 100_000, 100))
+    )
+    timestamps = np.concatenate((timestamps, [100_000 + 5_000]))
+    timestamps[1:-1] += rng.integers(-3, 4, size=len(timestamps) - 2)
+    gaps = calculate_activity_metrics(make_data(timestamps)).gaps
+
+    assert gaps.gap_count == 2
+    assert gaps.gap_seconds == pytest.approx(
+        (timestamps[600] - timestamps[599] + 105_000 - timestamps[-2]) / 1000
+    )
+    assert gaps.longest_gap_seconds == pytest.approx(
+        (timestamps[600] - timestamps[599]) / 1000
+    )
+    assert 0.001 < gaps.jitter_ms / 1000 < 0.004
+    assert gaps.observed_rate_hz == pytest.approx(10.0, rel=0.01)
+
+
+def test_inactivity_periods_split_at_gaps():
+    """Test that an inactivity period does not span a sampling gap."""
+    still = make_data(np.arange(0, 600_000, 100))
+    with_gap = make_data(
+        np.concatenate((np.arange(0, 300_000, 100), np.arange(900_000, 1_200_000, 100)))
+    )
+
+    assert len(detect_activity_patterns(still).inactivity_periods) == 1
+    periods = detect_activity_patterns(with_gap).inactivity_periods
+    assert len(periods) == 2
+    assert periods[0].end_time < periods[1].start_time
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_gap_totals_chunked_match_whole(seed):
+    """Test that gap statistics do not depend on how timestamps are chunked."""
+    rng = np.random.default_rng(seed)
+    intervals = rng.choice([100, 101, 99, 3000], size=2000, p=[0.5, 0.2, 0.29, 0.01])
+    timestamps = np.cumsum(intervals) * 10**6
+
+    whole = GapTotals(10)
+    whole_gaps = whole.update(timestamps)
+    chunked = GapTotals(10)
+    cuts = np.sort(rng.integers(0, len(timestamps), size=20))
+    chunked_gaps = np.concatenate(
+        [chunked.update(chunk) for chunk in np.split(timestamps, cuts)]
+    )
+
+    np.testing.assert_array_equal(chunked_gaps, whole_gaps)
+    expected = whole.summary().dict()
+    for field, value in chunked.summary().dict().items():
+        assert value == pytest.approx(expected[field])
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_accumulator_matches_batch_with_gaps(seed):
+    """Test that chunked metrics and patterns match batch across gaps."""
+    rng = np.random.default_rng(seed)
+    intervals = rng.choice(
+        [100, 97, 104, 40_000], size=6000, p=[0.6, 0.2, 0.197, 0.003]
+    )
+    noise = np.repeat(rng.choice([0.0, 0.5], size=60), 100)
+    data = make_data(np.cumsum(intervals), magnitude_noise=noise, seed=seed)
+    frame = build_signal_frame(data)
+
+    accumulator = ActivityAccumulator(data.sampling_rate_hz)
+    cuts = np.sort(rng.integers(0, len(frame), size=25))
+    for chunk in split_frame(frame, np.concatenate(([0], cuts, [len(frame)]))):
+        accumulator.update(chunk)
+
+    expected = calculate_activity_metrics(data, frame)
+    metrics = accumulator.metrics()
+    assert metrics.active_minutes == pytest.approx(expected.active_minutes)
+    for field, value in expected.gaps.dict().items():
+        assert getattr(metrics.gaps, field) == pytest.approx(value)
+    assert accumulator.patterns() == detect_activity_patterns(data, frame)
+
+
+def test_ragged_gap_summaries_match_per_session(make_flipping_acceleration_data):
+    """Test that the segmented gap summaries match each session alone."""
+    sessions = [
+        make_data(np.concatenate((np.arange(0, 5000, 100), [20_000, 20_100]))),
+        make_flipping_acceleration_data(1, 300, shuffle=True),
+        make_data(np.arange(0, 3000, 100)[::-1]),
+    ]
+    metrics = ragged_activity_metrics(ragged_from_sessions(sessions))
+
+    for data, session_metrics in zip(sessions, metrics):
+        expected = calculate_activity_metrics(data)
+        assert session_metrics.active_minutes == pytest.approx(expected.active_minutes)
+        for field, value in expected.gaps.dict().items():
+            assert getattr(session_metrics.gaps, field) == pytest.approx(value)